@@ -0,0 +1,190 @@
+"""
+Admission Control
+Cost-aware scheduling for the image endpoints. Each operation's cost is
+predicted as input megapixels times a per-operation seconds-per-megapixel
+coefficient learned from recent timings (EWMA). Cheap and expensive work run
+in separate lanes with their own concurrency caps, so a burst of matting or
+super-resolution requests cannot starve interactive editing, and requests
+whose predicted queue wait exceeds the client's deadline are rejected
+up front instead of timing out later.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from metrics import QUEUE_WAIT_SECONDS
+from settings import env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+# Prior seconds per megapixel on one core, replaced by measurements as requests complete
+DEFAULT_COSTS = {
+    "process": 4.0,
+    "process-advanced": 5.0,
+    "remove-background": 2.0,
+    "enhance": 3.0,
+    "batch-process": 2.5,
+    "histogram-equalization": 0.03,
+    "adjust-brightness-contrast": 0.02,
+    "spatial-filter": 0.1,
+    "frequency-filter": 0.3,
+    "edge-detection": 0.05,
+    "compare-edge-detectors": 0.2,
+    "segment-threshold": 0.05,
+    "segment-color": 0.05,
+    "segment-kmeans": 1.0,
+    "segment-watershed": 0.3,
+    "morphology": 0.05,
+}
+
+ADMISSION_EWMA_ALPHA = env_float("ADMISSION_EWMA_ALPHA", 0.2)
+# Operations predicted to take longer than this go to the heavy lane
+ADMISSION_HEAVY_SECONDS = env_float("ADMISSION_HEAVY_SECONDS", 1.0)
+ADMISSION_LIGHT_CONCURRENCY = env_int("ADMISSION_LIGHT_CONCURRENCY", max(2, os.cpu_count() or 1))
+ADMISSION_HEAVY_CONCURRENCY = env_int("ADMISSION_HEAVY_CONCURRENCY", max(1, (os.cpu_count() or 1) // 4))
+# Applied when a request sends no deadline header (0 = wait as long as needed)
+ADMISSION_DEFAULT_DEADLINE_MS = env_int("ADMISSION_DEFAULT_DEADLINE_MS", 0)
+# Small inputs still pay fixed decode/encode overhead
+MIN_MEGAPIXELS = 0.1
+
+
+class AdmissionRejected(Exception):
+    """Raised when the predicted queue wait exceeds the request's deadline"""
+
+    def __init__(self, lane: str, predicted_wait: float, deadline: float):
+        super().__init__(f"Predicted wait {predicted_wait:.1f}s in the {lane} lane "
+                         f"exceeds the {deadline:.1f}s deadline")
+        self.lane = lane
+        self.predicted_wait = predicted_wait
+        self.deadline = deadline
+
+
+class Lane:
+    """A concurrency-capped queue of predicted work"""
+
+    def __init__(self, name: str, concurrency: int):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.running: Dict[object, tuple] = {}     # ticket -> (start, predicted seconds)
+        self.waiting: Dict[object, float] = {}     # ticket -> predicted seconds
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created on first use so it binds to the server's event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    def predicted_wait(self) -> float:
+        """Seconds a new request would wait for a slot"""
+        if len(self.running) < self.concurrency and not self.waiting:
+            return 0.0
+        now = time.monotonic()
+        remaining = sum(max(0.0, predicted - (now - start)) for start, predicted in self.running.values())
+        return (remaining + sum(self.waiting.values())) / self.concurrency
+
+    def stats(self) -> Dict:
+        return {
+            "concurrency": self.concurrency,
+            "running": len(self.running),
+            "waiting": len(self.waiting),
+            "predicted_wait_s": round(self.predicted_wait(), 3),
+        }
+
+
+class AdmissionController:
+    """Predicts request cost, picks a lane and gates execution"""
+
+    def __init__(self, costs: Optional[Dict[str, float]] = None,
+                 alpha: float = ADMISSION_EWMA_ALPHA,
+                 heavy_seconds: float = ADMISSION_HEAVY_SECONDS,
+                 light_concurrency: int = ADMISSION_LIGHT_CONCURRENCY,
+                 heavy_concurrency: int = ADMISSION_HEAVY_CONCURRENCY):
+        self.costs = dict(DEFAULT_COSTS if costs is None else costs)
+        self.alpha = alpha
+        self.heavy_seconds = heavy_seconds
+        self.lanes = {
+            "light": Lane("light", light_concurrency),
+            "heavy": Lane("heavy", heavy_concurrency),
+        }
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def estimate(self, operation: str, megapixels: float) -> float:
+        """Predicted seconds for an operation on an input of this size"""
+        coefficient = self.costs.get(operation, self.heavy_seconds)
+        return coefficient * max(megapixels, MIN_MEGAPIXELS)
+
+    def lane_for(self, predicted: float) -> Lane:
+        return self.lanes["heavy" if predicted > self.heavy_seconds else "light"]
+
+    def observe(self, operation: str, megapixels: float, seconds: float) -> None:
+        """Fold a measured run into the operation's seconds-per-megapixel EWMA"""
+        sample = seconds / max(megapixels, MIN_MEGAPIXELS)
+        with self._lock:
+            previous = self.costs.get(operation)
+            self.costs[operation] = sample if previous is None else \
+                (1 - self.alpha) * previous + self.alpha * sample
+
+    async def run(self, operation: str, megapixels: float, fn: Callable, *args,
+                  deadline: Optional[float] = None, **kwargs):
+        """
+        Run fn(*args, **kwargs) in the threadpool once its lane has a slot
+
+        Args:
+            operation: Operation name (key of the cost table)
+            megapixels: Input size
+            fn: Synchronous function doing the work
+            deadline: Longest acceptable queue wait in seconds (None = no limit)
+
+        Returns:
+            fn's return value
+
+        Raises:
+            AdmissionRejected: When the predicted wait exceeds the deadline
+        """
+        predicted = self.estimate(operation, megapixels)
+        lane = self.lane_for(predicted)
+
+        wait = lane.predicted_wait()
+        if deadline is not None and wait > deadline:
+            self.rejected += 1
+            raise AdmissionRejected(lane.name, wait, deadline)
+
+        ticket = object()
+        lane.waiting[ticket] = predicted
+        queued = time.perf_counter()
+        try:
+            async with lane.semaphore:
+                QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued, queue=lane.name)
+                lane.waiting.pop(ticket, None)
+                lane.running[ticket] = (time.monotonic(), predicted)
+                start = time.perf_counter()
+                try:
+                    result = await run_in_threadpool(fn, *args, **kwargs)
+                finally:
+                    lane.running.pop(ticket, None)
+                # Failures (bad uploads, 4xx/5xx) return early and would
+                # drag the learned cost down, so only successes are observed
+                self.observe(operation, megapixels, time.perf_counter() - start)
+                return result
+        finally:
+            lane.waiting.pop(ticket, None)
+
+    def stats(self) -> Dict:
+        """Lane occupancy and learned coefficients (reported by /api/status)"""
+        with self._lock:
+            costs = {op: round(value, 4) for op, value in self.costs.items()}
+        return {
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+            "seconds_per_megapixel": costs,
+            "heavy_seconds": self.heavy_seconds,
+            "rejected": self.rejected,
+        }
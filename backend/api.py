@@ -3,14 +3,26 @@ AI Background Remover + Real-ESRGAN Enhancement API
 FastAPI backend for removing backgrounds and enhancing images with advanced AI features
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.responses import Response, JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
+from fastapi.responses import Response, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
 from PIL import Image, ImageFilter, ImageEnhance
 from typing import Optional, List
 import io
-import torch
-from rembg import remove, new_session
+import math
+from rembg import remove
+# torch is only needed for the torch Real-ESRGAN runtime; ONNX-only images omit it
+try:
+    import torch
+    from torch_inference import prepare_upsampler, torch_profile
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+    torch = None
+    prepare_upsampler = None
+    torch_profile = None
 try:
     from basicsr.archs.rrdbnet_arch import RRDBNet
     from realesrgan import RealESRGANer
@@ -25,7 +37,32 @@ import logging
 import os
 from scipy import ndimage
 from scipy.ndimage import zoom
+import asyncio
 import base64
+import json
+import hmac
+import threading
+import time
+import uuid
+
+from admission import ADMISSION_DEFAULT_DEADLINE_MS, AdmissionController, AdmissionRejected
+from archive_stream import ARCHIVE_MEDIA_TYPES, ArchiveStream
+from fake_models import FAKE_MODELS, FakeRembgSession, FakeUpsampler
+from fake_models import describe as describe_fake_models
+from jobs import SUCCEEDED, TERMINAL_STATES, JobQueue, JobQueueFull
+from matting import MATTING_PRESETS, remove_background_adaptive, resolve_preset, upscale_alpha_guided
+from memory import MemoryBudgetExceeded, MemoryTracker, budget_size
+from metrics import (INPUT_MEGAPIXELS, REQUEST_SECONDS, Gauge, record_cache, register,
+                     request_context, span, timed)
+from metrics import render as render_metrics
+from onnx_sessions import U2NET_VARIANTS, create_variant_session, session_profile
+from phash_cache import PHASH_CACHE, NearDuplicateMaskCache
+from profiling import (ADMIN_TOKEN, PROFILE_MAX_SECONDS, ProfileStore, StackSampler,
+                       profiled, request_profile)
+from settings import env_flag, env_int, env_str
+from singleflight import SINGLEFLIGHT, SingleFlight, request_key
+from super_resolution import SR_BACKEND_PRIORITY, default_backend_name, load_backends
+from warmup import WARMUP_ENABLED, run_warmup
 
 # Import advanced image processing functions
 from image_processing import (
@@ -45,7 +82,9 @@ from image_processing import (
     # Morphological operations
     morphology_dilate, morphology_erode, morphology_opening, morphology_closing,
     morphology_gradient, morphology_tophat, morphology_blackhat,
-    apply_morphological_operations
+    apply_morphological_operations,
+    # Alpha-aware ROI processing
+    alpha_bbox, process_alpha_roi
 )
 
 # Configure logging
@@ -61,27 +100,80 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Memory-Peak-Bytes", "X-Profile-Id", "X-Tile-Order"],
 )
 
+# Alpha-aware processing: run expensive RGBA stages on the subject's bounding box only
+ROI_PROCESSING = env_flag("ROI_PROCESSING", True)
+ROI_PADDING = env_int("ROI_PADDING", 16)
+
+# Fallback enhancement engine: 'fast' filters at source resolution and upsamples
+# once, 'legacy' upsamples first and filters the 4x-area image
+ENHANCE_MODES = ("fast", "legacy")
+ENHANCE_MODE = env_str("ENHANCE_MODE", "fast")
+
+# Alpha upscaling for RGBA enhancement: 'guided' follows the enhanced RGB edges,
+# 'linear' is plain bilinear resizing
+ALPHA_UPSCALE_MODES = ("guided", "linear")
+ALPHA_UPSCALE = env_str("ALPHA_UPSCALE", "guided")
+
+# Real-ESRGAN runtime: 'torch', 'onnx' (export_realesrgan_onnx.py) or 'auto'
+# (onnx when the exported model exists, torch otherwise)
+REALESRGAN_RUNTIME = env_str("REALESRGAN_RUNTIME", "auto")
+REALESRGAN_MODEL_PATH = os.path.join(os.path.dirname(__file__), "models", "RealESRGAN_x2plus.pth")
+REALESRGAN_ONNX_PATH = os.path.join(os.path.dirname(__file__), "models", "RealESRGAN_x2plus.onnx")
+
+# /api/batch-process limits: JSON responses hold every result in memory,
+# archive (zip/tar) responses stream one result at a time
+BATCH_MAX_FILES = env_int("BATCH_MAX_FILES", 10)
+BATCH_ARCHIVE_MAX_FILES = env_int("BATCH_ARCHIVE_MAX_FILES", 100)
+
 # Global variables for models
+U2NET_MODEL = env_str("U2NET_MODEL", "u2net")
 rembg_session = None
+rembg_sessions = {}
+rembg_sessions_lock = threading.Lock()
 upsampler = None
+sr_backends = {}
+default_sr_backend = None
+service_ready = False
+warmup_timings = {}
+job_queue = JobQueue()
+admission = AdmissionController()
+profile_store = ProfileStore()
+memory_tracker = MemoryTracker()
+remove_background_flight = SingleFlight("remove-background")
+mask_cache = NearDuplicateMaskCache() if PHASH_CACHE else None
+profile_lock = asyncio.Lock()
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize AI models on startup"""
-    global rembg_session, upsampler
+def load_models():
+    """Load the U2Net session, the Real-ESRGAN upsampler and the SR backends"""
+    global rembg_session, upsampler, sr_backends, default_sr_backend
     
     try:
-        # Initialize rembg session with U2Net model
-        logger.info("Loading U2Net model for background removal...")
-        rembg_session = new_session("u2net")
+        # Initialize rembg session with the deployment's U2Net variant
+        logger.info(f"Loading U2Net model ({U2NET_MODEL}) for background removal...")
+        rembg_session = get_rembg_session(U2NET_MODEL)
         logger.info("✓ U2Net model loaded successfully")
         
         # Initialize Real-ESRGAN model (optional)
-        if REALESRGAN_AVAILABLE:
+        realesrgan_onnx = None
+        use_onnx = REALESRGAN_RUNTIME == "onnx" or (
+            REALESRGAN_RUNTIME == "auto" and os.path.exists(REALESRGAN_ONNX_PATH))
+        if FAKE_MODELS:
+            logger.warning("FAKE_MODELS is set: using stand-in models (load testing only)")
+            upsampler = FakeUpsampler()
+        elif use_onnx:
+            if os.path.exists(REALESRGAN_ONNX_PATH):
+                logger.info("Loading Real-ESRGAN (onnxruntime) for enhancement...")
+                realesrgan_onnx = REALESRGAN_ONNX_PATH
+            else:
+                logger.warning(f"Real-ESRGAN ONNX model not found at {REALESRGAN_ONNX_PATH}")
+                logger.warning("Create it with: python export_realesrgan_onnx.py --verify")
+            upsampler = None
+        elif REALESRGAN_AVAILABLE and TORCH_AVAILABLE:
             logger.info("Loading Real-ESRGAN model for enhancement...")
-            model_path = os.path.join(os.path.dirname(__file__), "models", "RealESRGAN_x2plus.pth")
+            model_path = REALESRGAN_MODEL_PATH
             
             # Check if model file exists
             if not os.path.exists(model_path):
@@ -90,29 +182,273 @@ async def startup_event():
                 logger.info("API will work without enhancement feature")
                 upsampler = None
             else:
-                # Create RRDBNet model
-                model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32, scale=2)
-                
-                # Initialize upsampler
-                upsampler = RealESRGANer(
-                    scale=2,
-                    model_path=model_path,
-                    model=model,
-                    tile=0,
-                    tile_pad=10,
-                    pre_pad=0,
-                    half=False  # Set to True if you have GPU
-                )
+                upsampler = create_upsampler(model_path)
                 logger.info("✓ Real-ESRGAN model loaded successfully")
         else:
-            logger.warning("Real-ESRGAN not available (basicsr import failed)")
+            logger.warning("Real-ESRGAN not available (torch/basicsr import failed)")
             logger.info("API will work with background removal only")
             upsampler = None
         
+        # Super-resolution backends selectable per request (sr_backend)
+        sr_backends = load_backends(upsampler, heuristic_fn=enhance_image_advanced,
+                                    realesrgan_onnx=realesrgan_onnx)
+        default_sr_backend = default_backend_name(sr_backends)
+        logger.info(f"✓ Super-resolution backends: {', '.join(sr_backends)} "
+                    f"(default: {default_sr_backend})")
+        
     except Exception as e:
         logger.error(f"Error loading models: {str(e)}")
         logger.info("API will run with limited functionality")
 
+def create_upsampler(model_path: str, profile: Optional[dict] = None, optimize: bool = True):
+    """
+    Build the Real-ESRGAN x2 upsampler with the torch CPU inference profile
+    
+    Args:
+        model_path: Path to RealESRGAN_x2plus.pth
+        profile: Torch profile (torch_profile() if None)
+        optimize: Apply the profile (False keeps plain eager mode)
+        
+    Returns:
+        RealESRGANer instance
+    """
+    # Create RRDBNet model
+    model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32, scale=2)
+    
+    # Initialize upsampler
+    upsampler = RealESRGANer(
+        scale=2,
+        model_path=model_path,
+        model=model,
+        tile=0,
+        tile_pad=10,
+        pre_pad=0,
+        half=False  # Set to True if you have GPU
+    )
+    return prepare_upsampler(upsampler, profile) if optimize else upsampler
+
+def get_rembg_session(model: Optional[str] = None):
+    """
+    Get the rembg session for a U2Net variant, loading it on first use
+    
+    Args:
+        model: Variant name from U2NET_VARIANTS (deployment default if None)
+        
+    Returns:
+        rembg session
+    """
+    name = model or U2NET_MODEL
+    if name not in U2NET_VARIANTS:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown model '{name}'. Available: {', '.join(U2NET_VARIANTS)}")
+    
+    with rembg_sessions_lock:
+        record_cache("rembg_session", name in rembg_sessions)
+        if name not in rembg_sessions:
+            try:
+                rembg_sessions[name] = FakeRembgSession(name) if FAKE_MODELS else create_variant_session(name)
+                logger.info(f"✓ Loaded model variant: {name}")
+            except FileNotFoundError as e:
+                raise HTTPException(status_code=503, detail=str(e))
+        return rembg_sessions[name]
+
+def get_sr_backend(name: Optional[str] = None):
+    """
+    Get a loaded super-resolution backend
+    
+    Args:
+        name: Backend name (realesrgan, onnx, fsrcnn, espcn, heuristic);
+            SR_BACKEND / first available if None
+        
+    Returns:
+        SuperResolutionBackend instance
+    """
+    if name is None:
+        name = default_sr_backend
+    if name not in SR_BACKEND_PRIORITY:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown sr_backend '{name}'. Available: {', '.join(sr_backends)}")
+    if name not in sr_backends:
+        raise HTTPException(status_code=503, detail=f"Super-resolution backend '{name}' not loaded")
+    return sr_backends[name]
+
+def learned_sr_available() -> bool:
+    """True when the default SR backend is a model rather than the heuristic path"""
+    name = default_sr_backend
+    return name is not None and sr_backends[name].learned
+
+def warm_up_models():
+    """
+    Run synthetic inputs through every loaded model
+    
+    U2Net and alpha matting run at all WARMUP_RESOLUTIONS; super-resolution
+    backends only need one small input to initialize.
+    """
+    stages = {}
+    if rembg_session is not None:
+        stages["u2net"] = (lambda img: remove(img, session=rembg_session), None)
+        stages["alpha_matting"] = (remove_background, None)
+    for name, backend in sr_backends.items():
+        stages[f"sr_{name}"] = (backend.enhance, [(128, 128)])
+    
+    logger.info("Warming up models...")
+    return run_warmup(stages)
+
+@app.on_event("startup")
+async def startup_event():
+    """Initialize AI models on startup"""
+    global service_ready, warmup_timings
+    
+    load_models()
+    
+    # Warm up before reporting ready so the first request runs at steady-state speed
+    if WARMUP_ENABLED:
+        warmup_timings = warm_up_models()
+    job_queue.start()
+    service_ready = True
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the job workers"""
+    job_queue.stop()
+
+# ==================== METRICS ====================
+
+def _pool_in_use() -> dict:
+    samples = {("admission", name): len(lane.running) for name, lane in admission.lanes.items()}
+    for job_type, running in job_queue.stats()["running"].items():
+        samples[("jobs", job_type)] = running
+    for name, backend in sr_backends.items():
+        if not backend.thread_safe:
+            samples[("sr", name)] = int(backend._lock.locked())
+    return samples
+
+def _pool_capacity() -> dict:
+    samples = {("admission", name): lane.concurrency for name, lane in admission.lanes.items()}
+    for job_type, limit in job_queue.concurrency.items():
+        samples[("jobs", job_type)] = limit
+    for name, backend in sr_backends.items():
+        if not backend.thread_safe:
+            samples[("sr", name)] = 1
+    return samples
+
+register(Gauge("stellarion_pool_in_use", "Busy slots per worker pool", ("pool", "slot"), _pool_in_use))
+register(Gauge("stellarion_pool_capacity", "Slots per worker pool", ("pool", "slot"), _pool_capacity))
+register(Gauge("stellarion_queue_depth", "Requests waiting for a slot", ("pool", "slot"),
+               lambda: {**{("admission", name): len(lane.waiting) for name, lane in admission.lanes.items()},
+                        ("jobs", "all"): job_queue.stats()["queued"]}))
+
+def route_path(request: Request) -> str:
+    """Route template for a request (keeps job IDs out of metric labels)"""
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Record request latency and report stage timings in the Server-Timing header"""
+    endpoint = route_path(request)
+    if endpoint == "/metrics":
+        return await call_next(request)
+    
+    start = time.perf_counter()
+    with request_context(endpoint) as timings:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, status=response.status_code)
+    response.headers["Server-Timing"] = timings.server_timing(elapsed)
+    return response
+
+@app.middleware("http")
+async def memory_middleware(request: Request, call_next):
+    """Record each request's peak RSS increase (and allocation sites with MEMORY_DEBUG)"""
+    if request.method == "GET":
+        return await call_next(request)
+    with memory_tracker.track(route_path(request)) as usage:
+        response = await call_next(request)
+    response.headers["X-Memory-Peak-Bytes"] = str(usage.peak_bytes)
+    return response
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics (text exposition format)"""
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
+
+# ==================== PROFILING (ADMIN) ====================
+
+def is_admin(request: Request) -> bool:
+    """True when ADMIN_TOKEN is set and the request carries it in X-Admin-Token"""
+    token = request.headers.get("x-admin-token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    """Sample the processing threads of requests sent with X-Debug-Profile: 1"""
+    if request.headers.get("x-debug-profile", "").lower() not in ("1", "true", "yes"):
+        return await call_next(request)
+    if not is_admin(request):
+        return JSONResponse(status_code=403, content={"detail": "X-Debug-Profile requires an admin token"})
+    
+    with request_profile(route_path(request)) as profile:
+        response = await call_next(request)
+    profile_store.add(profile)
+    response.headers["X-Profile-Id"] = profile.id
+    return response
+
+@app.get("/api/admin/profile")
+async def api_admin_profile(request: Request, seconds: float = 10.0, interval_ms: int = 5,
+                            include_idle: bool = False):
+    """
+    Sample every thread of this worker for a while
+    
+    Args:
+        seconds: Sampling duration (at most PROFILE_MAX_SECONDS)
+        interval_ms: Time between samples
+        include_idle: Keep threads parked in wait/select calls
+        
+    Returns:
+        Collapsed stacks (flamegraph.pl / speedscope input)
+    """
+    require_admin(request)
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS}]")
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already being recorded")
+    
+    async with profile_lock:
+        sampler = StackSampler(interval=max(1, interval_ms) / 1000.0, include_idle=include_idle).start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+    logger.info(f"✓ Profiled {seconds:.1f}s ({sampler.samples} samples)")
+    return Response(content=sampler.collapsed(), media_type="text/plain",
+                    headers={"X-Profile-Samples": str(sampler.samples)})
+
+@app.get("/api/admin/profiles")
+async def api_admin_profiles(request: Request):
+    """Recent per-request profiles"""
+    require_admin(request)
+    return {"profiles": profile_store.list()}
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def api_admin_request_profile(request: Request, profile_id: str):
+    """Collapsed stacks of one profiled request"""
+    require_admin(request)
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=profile.collapsed(), media_type="text/plain")
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -122,7 +458,7 @@ async def root():
         "version": "2.0.0",
         "models": {
             "u2net": rembg_session is not None,
-            "realesrgan": upsampler is not None
+            "realesrgan": "realesrgan" in sr_backends
         },
         "features": [
             "background_removal",
@@ -138,28 +474,46 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
+    if not service_ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    
     return {
         "status": "healthy",
         "models_loaded": {
             "background_removal": rembg_session is not None,
-            "enhancement": upsampler is not None
-        }
+            "enhancement": learned_sr_available()
+        },
+        "warmup": warmup_timings
     }
 
 @app.get("/api/status")
 async def api_status():
     """Frontend API status check"""
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    enhancement_method = "Real-ESRGAN" if upsampler is not None else "Advanced (Lanczos + CLAHE)"
+    device = "cuda" if TORCH_AVAILABLE and torch.cuda.is_available() else "cpu"
+    enhancement_method = "Advanced (Lanczos + CLAHE)" if not learned_sr_available() \
+        else default_sr_backend
     
     return {
         "api_status": "online",
         "device": device,
         "models": {
             "u2net": "loaded" if rembg_session is not None else "not_loaded",
-            "realesrgan": "loaded" if upsampler is not None else "not_loaded",
-            "enhancement": enhancement_method
+            "u2net_variant": U2NET_MODEL,
+            "u2net_variants_loaded": sorted(rembg_sessions),
+            "realesrgan": "loaded" if "realesrgan" in sr_backends else "not_loaded",
+            "enhancement": enhancement_method,
+            "sr_backend": default_sr_backend,
+            "sr_backends": {name: backend.info() for name, backend in sr_backends.items()}
         },
+        "onnx_session": session_profile(),
+        "fake_models": describe_fake_models() if FAKE_MODELS else None,
+        "torch_profile": torch_profile() if TORCH_AVAILABLE else None,
+        "matting_presets": list(MATTING_PRESETS),
+        "jobs": job_queue.stats(),
+        "admission": admission.stats(),
+        "memory": memory_tracker.stats(),
+        "singleflight": {"remove-background": remove_background_flight.stats()},
+        "phash_cache": mask_cache.stats() if mask_cache is not None else None,
         "features_available": {
             "background_removal": True,
             "enhancement": True,
@@ -182,29 +536,43 @@ async def api_status():
         "morphology_operations": ["dilate", "erode", "opening", "closing", "gradient", "tophat", "blackhat"]
     }
 
-def remove_background(image: Image.Image) -> Image.Image:
+def remove_background(image: Image.Image, model: Optional[str] = None,
+                      preset: Optional[str] = None,
+                      foreground_threshold: int = 240,
+                      background_threshold: int = 10,
+                      erode_size: int = 10) -> Image.Image:
     """
     Remove background from image using rembg with U2Net (Enhanced)
     
     Args:
         image: PIL Image object
+        model: U2Net variant (deployment default if None)
+        preset: Quality/speed preset - 'fast', 'balanced', 'quality' or 'full'
+            (MATTING_PRESET if None)
+        foreground_threshold: Alpha matting foreground threshold
+        background_threshold: Alpha matting background threshold
+        erode_size: Alpha matting trimap erosion size
         
     Returns:
         PIL Image with transparent background
     """
     try:
+        try:
+            preset = resolve_preset(preset)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
         # Convert to RGB if needed
         if image.mode != 'RGB':
             image = image.convert('RGB')
         
-        # Remove background using rembg with enhanced settings
-        output = remove(
-            image,
-            session=rembg_session,
-            alpha_matting=True,
-            alpha_matting_foreground_threshold=240,
-            alpha_matting_background_threshold=10,
-            alpha_matting_erode_size=10
+        # Coarse mask at model resolution, alpha matting only inside the
+        # trimap's unknown band (at an intermediate resolution unless preset is 'full')
+        output = remove_background_adaptive(
+            image, get_rembg_session(model), preset,
+            foreground_threshold=foreground_threshold,
+            background_threshold=background_threshold,
+            erode_size=erode_size
         )
         
         # Convert to RGBA if not already
@@ -213,10 +581,39 @@ def remove_background(image: Image.Image) -> Image.Image:
         
         return output
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Background removal error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Background removal failed: {str(e)}")
 
+def _refine_alpha(img_array: np.ndarray, strength: int) -> np.ndarray:
+    """Edge refinement of the alpha channel of an RGBA array (modified in place)"""
+    alpha = img_array[:, :, 3]
+    
+    # Step 1: Apply bilateral filter for edge-preserving smoothing
+    alpha_smooth = cv2.bilateralFilter(alpha, 9, 75, 75)
+    
+    # Step 2: Apply guided filter for better edge preservation
+    alpha_smooth = cv2.ximgproc.guidedFilter(alpha, alpha_smooth, radius=4, eps=50)
+    
+    # Step 3: Morphological operations for solid edges
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (strength, strength))
+    
+    # Close small holes
+    alpha_closed = cv2.morphologyEx(alpha_smooth, cv2.MORPH_CLOSE, kernel)
+    
+    # Remove small noise
+    alpha_opened = cv2.morphologyEx(alpha_closed, cv2.MORPH_OPEN, kernel)
+    
+    # Step 4: Final smoothing for natural edges
+    alpha_final = cv2.GaussianBlur(alpha_opened, (3, 3), 0.5)
+    
+    # Replace alpha channel
+    img_array[:, :, 3] = alpha_final
+    return img_array
+
+@timed("refine_edges")
 def refine_edges(image: Image.Image, strength: int = 3) -> Image.Image:
     """
     Refine edges using advanced AI-based edge detection and smoothing
@@ -235,28 +632,13 @@ def refine_edges(image: Image.Image, strength: int = 3) -> Image.Image:
         
         # Convert to numpy array
         img_array = np.array(image)
-        alpha = img_array[:, :, 3]
-        
-        # Step 1: Apply bilateral filter for edge-preserving smoothing
-        alpha_smooth = cv2.bilateralFilter(alpha, 9, 75, 75)
-        
-        # Step 2: Apply guided filter for better edge preservation
-        alpha_smooth = cv2.ximgproc.guidedFilter(alpha, alpha_smooth, radius=4, eps=50)
-        
-        # Step 3: Morphological operations for solid edges
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (strength, strength))
         
-        # Close small holes
-        alpha_closed = cv2.morphologyEx(alpha_smooth, cv2.MORPH_CLOSE, kernel)
-        
-        # Remove small noise
-        alpha_opened = cv2.morphologyEx(alpha_closed, cv2.MORPH_OPEN, kernel)
-        
-        # Step 4: Final smoothing for natural edges
-        alpha_final = cv2.GaussianBlur(alpha_opened, (3, 3), 0.5)
-        
-        # Replace alpha channel
-        img_array[:, :, 3] = alpha_final
+        # Only the subject's bounding box has non-zero alpha worth refining
+        if ROI_PROCESSING:
+            img_array = process_alpha_roi(img_array, lambda crop: _refine_alpha(crop, strength),
+                                          padding=ROI_PADDING)
+        else:
+            img_array = _refine_alpha(img_array, strength)
         
         return Image.fromarray(img_array, 'RGBA')
         
@@ -274,6 +656,7 @@ def refine_edges(image: Image.Image, strength: int = 3) -> Image.Image:
         except:
             return image
 
+@timed("auto_crop")
 def auto_crop_subject(image: Image.Image, padding: int = 20) -> Image.Image:
     """
     Automatically crop to subject bounds with padding
@@ -292,22 +675,18 @@ def auto_crop_subject(image: Image.Image, padding: int = 20) -> Image.Image:
         # Get alpha channel
         alpha = np.array(image.split()[-1])
         
-        # Find non-transparent pixels
-        rows = np.any(alpha > 0, axis=1)
-        cols = np.any(alpha > 0, axis=0)
-        
-        if not rows.any() or not cols.any():
+        # Bounding box of non-transparent pixels
+        bbox = alpha_bbox(alpha)
+        if bbox is None:
             return image
         
-        # Get bounding box
-        top, bottom = np.where(rows)[0][[0, -1]]
-        left, right = np.where(cols)[0][[0, -1]]
-        
-        # Add padding
-        top = max(0, top - padding)
-        bottom = min(image.height, bottom + padding)
+        # Add padding (right/bottom end `padding` pixels past the last opaque
+        # row/column, as auto-crop always has)
+        left, top, right, bottom = bbox
         left = max(0, left - padding)
-        right = min(image.width, right + padding)
+        top = max(0, top - padding)
+        right = min(image.width, right - 1 + padding)
+        bottom = min(image.height, bottom - 1 + padding)
         
         # Crop
         return image.crop((left, top, right, bottom))
@@ -375,111 +754,188 @@ def add_background_color(image: Image.Image, color: tuple) -> Image.Image:
         logger.error(f"Add background error: {str(e)}")
         return image
 
-def enhance_image(image: Image.Image) -> Image.Image:
+def upscale_alpha(alpha: np.ndarray, rgb: np.ndarray, rgb_enhanced: np.ndarray,
+                  mode: Optional[str] = None) -> np.ndarray:
+    """
+    Upscale an alpha channel to the size of the enhanced RGB
+    
+    Args:
+        alpha: Original alpha channel
+        rgb: Original RGB
+        rgb_enhanced: Enhanced RGB
+        mode: 'guided' or 'linear' (ALPHA_UPSCALE if None)
+        
+    Returns:
+        Upscaled alpha channel
+    """
+    if (mode or ALPHA_UPSCALE) == "guided":
+        return upscale_alpha_guided(alpha, np.ascontiguousarray(rgb), rgb_enhanced)
+    return cv2.resize(alpha, (rgb_enhanced.shape[1], rgb_enhanced.shape[0]), interpolation=cv2.INTER_LINEAR)
+
+def enhance_image(image: Image.Image, sr_backend: Optional[str] = None,
+                  alpha_mode: Optional[str] = None) -> Image.Image:
     """
-    Enhance image quality using Real-ESRGAN or fallback methods
+    Enhance image quality using a super-resolution backend or fallback methods
+    
+    RGBA input only runs super-resolution inside the alpha bounding box
+    (when ROI_PROCESSING is on), and the alpha channel is upscaled from the
+    enhanced RGB instead of being sent through the model.
     
     Args:
         image: PIL Image object
+        sr_backend: Backend name (realesrgan, onnx, fsrcnn, espcn, heuristic);
+            SR_BACKEND / first available if None
+        alpha_mode: Alpha upscaling, 'guided' or 'linear' (ALPHA_UPSCALE if None)
         
     Returns:
         Enhanced PIL Image
     """
+    if alpha_mode is not None and alpha_mode not in ALPHA_UPSCALE_MODES:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown alpha mode '{alpha_mode}'. Available: {', '.join(ALPHA_UPSCALE_MODES)}")
+    backend = get_sr_backend(sr_backend) if sr_backend or sr_backends else None
     try:
-        # Try Real-ESRGAN first if available
-        if upsampler is not None:
-            logger.info("Using Real-ESRGAN for enhancement")
-            # Convert PIL to numpy array
-            img_np = np.array(image)
+        if backend is not None and backend.learned:
+            logger.info(f"Using {backend.name} for enhancement")
+            if image.mode != 'RGBA':
+                return backend.enhance(image)
             
-            # Handle RGBA images
-            if img_np.shape[2] == 4:
-                # Separate RGB and alpha
-                rgb = img_np[:, :, :3]
-                alpha = img_np[:, :, 3]
-                
-                # Enhance RGB channels
-                enhanced_rgb, _ = upsampler.enhance(rgb, outscale=2)
-                
-                # Resize alpha to match enhanced size
-                alpha_resized = cv2.resize(alpha, (enhanced_rgb.shape[1], enhanced_rgb.shape[0]), 
-                                          interpolation=cv2.INTER_LINEAR)
-                
-                # Combine back
-                enhanced_np = np.dstack([enhanced_rgb, alpha_resized])
-            else:
-                # Enhance RGB image
-                enhanced_np, _ = upsampler.enhance(img_np, outscale=2)
+            def enhance_rgba(rgba: np.ndarray) -> np.ndarray:
+                rgb = rgba[:, :, :3]
+                rgb_enhanced = backend.upscale_rgb(rgb)
+                return np.dstack([rgb_enhanced, upscale_alpha(rgba[:, :, 3], rgb, rgb_enhanced, alpha_mode)])
             
-            # Convert back to PIL
-            enhanced_image = Image.fromarray(enhanced_np)
-            return enhanced_image
+            img_array = np.array(image)
+            if ROI_PROCESSING:
+                enhanced = process_alpha_roi(img_array, enhance_rgba, padding=ROI_PADDING, scale=2)
+            else:
+                enhanced = enhance_rgba(img_array)
+            return Image.fromarray(enhanced, 'RGBA')
         
         # Fallback: Advanced AI-inspired enhancement using OpenCV and PIL
         logger.info("Using advanced fallback enhancement")
-        return enhance_image_advanced(image)
+        return enhance_image_advanced(image, alpha_mode=alpha_mode)
         
     except Exception as e:
         logger.error(f"Enhancement error: {str(e)}")
         # Return enhanced version using fallback
-        return enhance_image_advanced(image)
+        return enhance_image_advanced(image, alpha_mode=alpha_mode)
+
+def _enhance_rgb_legacy(rgb: np.ndarray, new_size: tuple) -> np.ndarray:
+    """Original engine: upscale first, then filter the 4x-area image"""
+    # 1. Upscale using Lanczos (high-quality interpolation)
+    rgb_pil = Image.fromarray(rgb)
+    rgb_upscaled = rgb_pil.resize(new_size, Image.Resampling.LANCZOS)
+    rgb_enhanced = np.array(rgb_upscaled)
+    
+    # 2. Apply unsharp masking for sharpness
+    gaussian = cv2.GaussianBlur(rgb_enhanced, (0, 0), 2.0)
+    rgb_enhanced = cv2.addWeighted(rgb_enhanced, 1.5, gaussian, -0.5, 0)
+    
+    # 3. Denoise while preserving edges
+    rgb_enhanced = cv2.bilateralFilter(rgb_enhanced, 9, 75, 75)
+    
+    # 4. Enhance details using CLAHE (Contrast Limited Adaptive Histogram Equalization)
+    lab = cv2.cvtColor(rgb_enhanced, cv2.COLOR_RGB2LAB)
+    l, a, b = cv2.split(lab)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    l = clahe.apply(l)
+    rgb_enhanced = cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2RGB)
+    
+    # 5. Enhance colors slightly
+    return cv2.convertScaleAbs(rgb_enhanced, alpha=1.1, beta=5)
+
+def _enhance_rgb_fast(rgb: np.ndarray, new_size: tuple) -> np.ndarray:
+    """
+    Reordered engine: denoise and contrast at source resolution, upsample
+    once, then only a light sharpening pass at output size
+    """
+    # 1. Denoise while preserving edges (d=5 at 1x covers the old d=9 at 2x)
+    rgb_enhanced = cv2.bilateralFilter(rgb, 5, 75, 75)
+    
+    # 2. CLAHE on lightness (tile grid scales with the image, so 1x matches 2x)
+    lab = cv2.cvtColor(rgb_enhanced, cv2.COLOR_RGB2LAB)
+    l, a, b = cv2.split(lab)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    l = clahe.apply(l)
+    rgb_enhanced = cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2RGB)
+    
+    # 3. Brightness/contrast and a slight saturation boost (point operations)
+    rgb_enhanced = cv2.convertScaleAbs(rgb_enhanced, alpha=1.1, beta=5)
+    gray = cv2.cvtColor(cv2.cvtColor(rgb_enhanced, cv2.COLOR_RGB2GRAY), cv2.COLOR_GRAY2RGB)
+    rgb_enhanced = cv2.addWeighted(rgb_enhanced, 1.05, gray, -0.05, 0)
+    
+    # 4. Single high-quality upsample
+    rgb_enhanced = cv2.resize(rgb_enhanced, new_size, interpolation=cv2.INTER_LANCZOS4)
+    
+    # 5. Light unsharp mask at output size
+    gaussian = cv2.GaussianBlur(rgb_enhanced, (0, 0), 1.0)
+    return cv2.addWeighted(rgb_enhanced, 1.6, gaussian, -0.6, 0)
 
-def enhance_image_advanced(image: Image.Image) -> Image.Image:
+@timed("enhance_heuristic")
+def enhance_image_advanced(image: Image.Image, roi: Optional[bool] = None,
+                           mode: Optional[str] = None, alpha_mode: Optional[str] = None) -> Image.Image:
     """
     Advanced image enhancement without Real-ESRGAN
     Uses super-resolution techniques with OpenCV and PIL
     
     Args:
         image: PIL Image object
+        roi: For RGBA input, enhance only the subject's bounding box and
+            paste it into a transparent 2x canvas (ROI_PROCESSING if None)
+        mode: 'fast' (filter at source resolution, upsample once) or
+            'legacy' (upsample first, filter at 2x) - ENHANCE_MODE if None
+        alpha_mode: Alpha upscaling in fast mode, 'guided' or 'linear'
+            (ALPHA_UPSCALE if None); legacy mode keeps Lanczos
         
     Returns:
         Enhanced PIL Image
     """
     try:
+        mode = mode or ENHANCE_MODE
+        if mode not in ENHANCE_MODES:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown enhance mode '{mode}'. Available: {', '.join(ENHANCE_MODES)}")
+        
+        if image.mode == 'RGBA' and (ROI_PROCESSING if roi is None else roi):
+            enhanced = process_alpha_roi(
+                np.array(image),
+                lambda crop: np.array(enhance_image_advanced(Image.fromarray(crop, 'RGBA'), roi=False,
+                                                             mode=mode, alpha_mode=alpha_mode)),
+                padding=ROI_PADDING, scale=2
+            )
+            return Image.fromarray(enhanced, 'RGBA')
+        
         # Convert to numpy
         img_array = np.array(image)
         has_alpha = img_array.shape[2] == 4 if len(img_array.shape) == 3 else False
         
         # Separate alpha if present
         if has_alpha:
-            rgb = img_array[:, :, :3]
+            rgb = np.ascontiguousarray(img_array[:, :, :3])
             alpha = img_array[:, :, 3]
         else:
             rgb = img_array
             alpha = None
         
-        # 1. Upscale using Lanczos (high-quality interpolation)
         original_size = (rgb.shape[1], rgb.shape[0])
         new_size = (original_size[0] * 2, original_size[1] * 2)
         
-        # Use PIL for high-quality upscaling
-        rgb_pil = Image.fromarray(rgb)
-        rgb_upscaled = rgb_pil.resize(new_size, Image.Resampling.LANCZOS)
-        rgb_enhanced = np.array(rgb_upscaled)
-        
-        # 2. Apply unsharp masking for sharpness
-        gaussian = cv2.GaussianBlur(rgb_enhanced, (0, 0), 2.0)
-        rgb_enhanced = cv2.addWeighted(rgb_enhanced, 1.5, gaussian, -0.5, 0)
-        
-        # 3. Denoise while preserving edges
-        rgb_enhanced = cv2.bilateralFilter(rgb_enhanced, 9, 75, 75)
-        
-        # 4. Enhance details using CLAHE (Contrast Limited Adaptive Histogram Equalization)
-        lab = cv2.cvtColor(rgb_enhanced, cv2.COLOR_RGB2LAB)
-        l, a, b = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        l = clahe.apply(l)
-        rgb_enhanced = cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2RGB)
-        
-        # 5. Enhance colors slightly
-        rgb_enhanced = cv2.convertScaleAbs(rgb_enhanced, alpha=1.1, beta=5)
+        if mode == "legacy":
+            rgb_enhanced = _enhance_rgb_legacy(rgb, new_size)
+        else:
+            rgb_enhanced = _enhance_rgb_fast(rgb, new_size)
         
-        # 6. Handle alpha channel
+        # Handle alpha channel
         if has_alpha:
-            # Upscale alpha with high quality
-            alpha_pil = Image.fromarray(alpha)
-            alpha_upscaled = alpha_pil.resize(new_size, Image.Resampling.LANCZOS)
-            alpha_enhanced = np.array(alpha_upscaled)
+            if mode == "legacy":
+                # Upscale alpha with high quality
+                alpha_pil = Image.fromarray(alpha)
+                alpha_upscaled = alpha_pil.resize(new_size, Image.Resampling.LANCZOS)
+                alpha_enhanced = np.array(alpha_upscaled)
+            else:
+                # Edges follow the enhanced RGB
+                alpha_enhanced = upscale_alpha(alpha, rgb, rgb_enhanced, alpha_mode)
             
             # Combine
             enhanced_array = np.dstack([rgb_enhanced, alpha_enhanced])
@@ -489,28 +945,266 @@ def enhance_image_advanced(image: Image.Image) -> Image.Image:
         # Convert back to PIL
         enhanced_image = Image.fromarray(enhanced_array.astype(np.uint8))
         
-        # 7. Final PIL enhancements
-        enhancer = ImageEnhance.Sharpness(enhanced_image)
-        enhanced_image = enhancer.enhance(1.2)
-        
-        enhancer = ImageEnhance.Color(enhanced_image)
-        enhanced_image = enhancer.enhance(1.05)
+        # Final PIL enhancements (the fast engine folds these into its own passes)
+        if mode == "legacy":
+            enhancer = ImageEnhance.Sharpness(enhanced_image)
+            enhanced_image = enhancer.enhance(1.2)
+            
+            enhancer = ImageEnhance.Color(enhanced_image)
+            enhanced_image = enhancer.enhance(1.05)
         
         logger.info("✓ Advanced enhancement complete")
         return enhanced_image
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Advanced enhancement error: {str(e)}")
         # Last resort: simple upscale
         return image.resize((image.width * 2, image.height * 2), Image.Resampling.LANCZOS)
 
+# ==================== ADMISSION CONTROL ====================
+
+def image_megapixels(image: Image.Image) -> float:
+    return image.width * image.height / 1e6
+
+def request_deadline(request: Request) -> Optional[float]:
+    """
+    Queue-wait budget in seconds from the X-Deadline-Ms header
+    (ADMISSION_DEFAULT_DEADLINE_MS when absent, None for no limit)
+    """
+    value = request.headers.get("x-deadline-ms")
+    try:
+        deadline_ms = int(value) if value else ADMISSION_DEFAULT_DEADLINE_MS
+    except ValueError:
+        raise HTTPException(status_code=400, detail="X-Deadline-Ms must be an integer")
+    return deadline_ms / 1000.0 if deadline_ms > 0 else None
+
+async def enforce_memory_budget(operation: str, image: Image.Image) -> Image.Image:
+    """
+    Apply MEMORY_BUDGET_MB to an input (downsized, or 413 when MEMORY_BUDGET_ACTION=reject)
+    
+    The size check only reads the header; decoding and resizing an
+    over-budget upload run in the threadpool so they do not block the loop.
+    """
+    try:
+        size = budget_size(operation, image)
+    except MemoryBudgetExceeded as e:
+        logger.warning(f"Rejected {operation} ({image.width}x{image.height}): {str(e)}")
+        raise HTTPException(status_code=413, detail=str(e))
+    if size is None:
+        return image
+    return await run_in_threadpool(image.resize, size, Image.Resampling.LANCZOS)
+
+async def _admit_and_run(request: Request, operation: str, megapixels: float, fn, *args, **kwargs):
+    """
+    Run a synchronous stage in the threadpool under admission control
+    
+    Args:
+        request: Incoming request (for the deadline header)
+        operation: Cost-table operation name
+        megapixels: Input size used for the cost prediction
+        fn: Function doing the work; remaining arguments are passed to it
+        
+    Returns:
+        fn's return value
+    """
+    INPUT_MEGAPIXELS.observe(megapixels, endpoint=operation)
+    try:
+        return await admission.run(operation, megapixels, profiled(fn), *args,
+                                   deadline=request_deadline(request), **kwargs)
+    except AdmissionRejected as e:
+        logger.warning(f"Rejected {operation} ({megapixels:.1f} MP): {str(e)}")
+        raise HTTPException(status_code=429, detail=str(e),
+                            headers={"Retry-After": str(max(1, math.ceil(e.predicted_wait)))})
+
+# ==================== PROCESSING PIPELINES ====================
+# Synchronous pipelines shared by the HTTP endpoints and the job queue.
+# `checkpoint` is called between stages; job workers pass Job.checkpoint so a
+# cancelled job stops at the next stage boundary.
+
+def _no_checkpoint():
+    pass
+
+def decode_image(image: Image.Image) -> Image.Image:
+    """Decode a lazily opened upload (timed as the 'decode' stage)"""
+    with span("decode"):
+        image.load()
+    return image
+
+def encode_image(image: Image.Image, format: str = 'PNG', **params) -> bytes:
+    """Encode an image to bytes (timed as the 'encode' stage)"""
+    with span("encode"):
+        output_buffer = io.BytesIO()
+        image.save(output_buffer, format=format, **params)
+        return output_buffer.getvalue()
+
+def run_process(image: Image.Image, model: Optional[str] = None, preset: Optional[str] = None,
+                sr_backend: Optional[str] = None, checkpoint=_no_checkpoint) -> tuple:
+    """
+    Remove the background and enhance (the /process pipeline)
+    
+    Returns:
+        (PNG bytes, media type)
+    """
+    decode_image(image)
+    
+    # Step 1: Remove background
+    logger.info("Removing background...")
+    processed_image = remove_background(image, model, preset)
+    logger.info("✓ Background removed")
+    checkpoint()
+    
+    # Step 2: Enhance quality (default: only when a learned SR model is loaded)
+    if sr_backend or learned_sr_available():
+        logger.info("Enhancing image quality...")
+        processed_image = enhance_image(processed_image, sr_backend)
+        logger.info("✓ Image enhanced")
+    else:
+        logger.info("Skipping enhancement (model not available)")
+    checkpoint()
+    
+    # Convert to PNG bytes
+    return encode_image(processed_image, 'PNG', optimize=True, quality=95), "image/png"
+
+def run_remove_background(image: Image.Image, refine: bool = True, auto_crop: bool = False,
+                          edge_strength: int = 2, model: Optional[str] = None,
+                          preset: Optional[str] = None, checkpoint=_no_checkpoint,
+                          mask_cache: Optional[NearDuplicateMaskCache] = None) -> tuple:
+    """
+    Remove the background with optional edge refinement and auto-crop
+    
+    Args:
+        mask_cache: Near-duplicate cache; a hit reuses a cached alpha instead
+            of running U2Net, matting and edge refinement. Not used for
+            presets that estimate the foreground: a hit would pair the
+            cached alpha with the upload's original (undecontaminated) colors
+    
+    Returns:
+        (PNG bytes, media type)
+    """
+    decode_image(image)
+    
+    if mask_cache is not None:
+        try:
+            preset = resolve_preset(preset)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if MATTING_PRESETS[preset]["estimate_foreground"]:
+            mask_cache = None
+    
+    alpha = None
+    if mask_cache is not None:
+        cache_params = (model or U2NET_MODEL, preset, refine, edge_strength)
+        rgb = np.array(image.convert('RGB'))
+        with span("phash_lookup"):
+            alpha = mask_cache.lookup(rgb, cache_params)
+    
+    if alpha is not None:
+        processed_image = Image.fromarray(np.dstack([rgb, alpha]), 'RGBA')
+        logger.info("✓ Reused near-duplicate mask")
+    else:
+        # Remove background
+        processed_image = remove_background(image, model, preset)
+        logger.info("✓ Background removed")
+        checkpoint()
+        
+        # Apply edge refinement if requested
+        if refine:
+            processed_image = refine_edges(processed_image, edge_strength)
+            logger.info("✓ Edges refined")
+        
+        if mask_cache is not None:
+            mask_cache.store(rgb, np.array(processed_image)[:, :, 3], cache_params)
+    
+    # Auto-crop if requested
+    if auto_crop:
+        processed_image = auto_crop_subject(processed_image)
+        logger.info("✓ Auto-cropped")
+    
+    # Convert to PNG
+    return encode_image(processed_image, 'PNG', optimize=True, quality=95), "image/png"
+
+def run_enhance(image: Image.Image, sr_backend: Optional[str] = None) -> tuple:
+    """
+    Enhance only (the /enhance-only pipeline)
+    
+    Returns:
+        (PNG bytes, media type)
+    """
+    enhanced_image = enhance_image(decode_image(image), sr_backend)
+    return encode_image(enhanced_image, 'PNG', optimize=True, quality=95), "image/png"
+
+def run_process_advanced(image: Image.Image, auto_crop: bool = True, add_bg_color: bool = False,
+                         bg_color: str = "255,255,255", model: Optional[str] = None,
+                         preset: Optional[str] = None, checkpoint=_no_checkpoint) -> tuple:
+    """
+    Maximum-quality background removal (the /api/process-advanced pipeline)
+    
+    Returns:
+        (PNG or JPEG bytes, media type)
+    """
+    decode_image(image)
+    
+    # Step 1: Remove background with enhanced alpha matting
+    logger.info("Step 1: Removing background (enhanced alpha matting)...")
+    processed_image = remove_background(
+        image, model, preset,
+        foreground_threshold=250,  # Higher for better quality
+        background_threshold=5,    # Lower for cleaner removal
+        erode_size=15              # Larger for smoother edges
+    )
+    logger.info("✓ Background removed")
+    checkpoint()
+    
+    # Step 2: Apply MAXIMUM edge refinement (strength=3 for solid edges)
+    logger.info("Step 2: Refining edges (maximum quality)...")
+    processed_image = refine_edges(processed_image, strength=3)
+    logger.info("✓ Edges refined")
+    checkpoint()
+    
+    # Step 3: Auto-crop if requested
+    if auto_crop:
+        logger.info("Step 3: Auto-cropping subject...")
+        processed_image = auto_crop_subject(processed_image, padding=30)
+        logger.info("✓ Auto-cropped")
+    
+    # Step 4: Add background color if requested
+    if add_bg_color:
+        try:
+            r, g, b = map(int, bg_color.split(','))
+            processed_image = add_background_color(processed_image, (r, g, b))
+            logger.info(f"✓ Background color added: {bg_color}")
+        except:
+            logger.warning("Invalid background color format")
+    
+    # Convert to appropriate format
+    if processed_image.mode == 'RGBA':
+        content = encode_image(processed_image, 'PNG', optimize=True, quality=100)
+        media_type = "image/png"
+    else:
+        content = encode_image(processed_image, 'JPEG', optimize=True, quality=100)
+        media_type = "image/jpeg"
+    
+    logger.info(f"  Output size: {processed_image.width}x{processed_image.height}")
+    return content, media_type
+
 @app.post("/process")
-async def process_image(file: UploadFile = File(...)):
+async def process_image(
+    request: Request,
+    file: UploadFile = File(...),
+    model: Optional[str] = Form(None),
+    preset: Optional[str] = Form(None),
+    sr_backend: Optional[str] = Form(None)
+):
     """
     Main endpoint: Remove background and enhance image
     
     Args:
         file: Uploaded image file
+        model: U2Net variant (u2net, u2net_int8, u2netp, silueta)
+        preset: Matting preset (fast, balanced, quality, full)
+        sr_backend: Super-resolution backend (realesrgan, onnx, fsrcnn, espcn, heuristic)
         
     Returns:
         Processed PNG image with transparent background
@@ -524,31 +1218,16 @@ async def process_image(file: UploadFile = File(...)):
         logger.info(f"Processing image: {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
+        image = await enforce_memory_budget("process", image)
         
-        # Step 1: Remove background
-        logger.info("Removing background...")
-        processed_image = remove_background(image)
-        logger.info("✓ Background removed")
-        
-        # Step 2: Enhance quality
-        if upsampler is not None:
-            logger.info("Enhancing image quality...")
-            processed_image = enhance_image(processed_image)
-            logger.info("✓ Image enhanced")
-        else:
-            logger.info("Skipping enhancement (model not available)")
-        
-        # Convert to PNG bytes
-        output_buffer = io.BytesIO()
-        processed_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
-        
+        content, media_type = await _admit_and_run(request, "process", image_megapixels(image),
+                                                   run_process, image, model, preset, sr_backend)
         logger.info(f"✓ Processing complete for {file.filename}")
         
         # Return PNG image
         return Response(
-            content=output_buffer.getvalue(),
-            media_type="image/png",
+            content=content,
+            media_type=media_type,
             headers={
                 "Content-Disposition": f'attachment; filename="processed_{file.filename}"'
             }
@@ -562,10 +1241,13 @@ async def process_image(file: UploadFile = File(...)):
 
 @app.post("/remove-background")
 async def remove_background_only(
+    request: Request,
     file: UploadFile = File(...),
     refine_edges: bool = Form(True),
     auto_crop: bool = Form(False),
-    edge_strength: int = Form(2)
+    edge_strength: int = Form(2),
+    model: Optional[str] = Form(None),
+    preset: Optional[str] = Form(None)
 ):
     """
     Remove background with advanced options
@@ -575,6 +1257,8 @@ async def remove_background_only(
         refine_edges: Apply edge refinement
         auto_crop: Auto-crop to subject
         edge_strength: Edge refinement strength (1-5)
+        model: U2Net variant (u2net, u2net_int8, u2netp, silueta)
+        preset: Matting preset (fast, balanced, quality, full)
         
     Returns:
         PNG image with transparent background
@@ -588,50 +1272,44 @@ async def remove_background_only(
         logger.info(f"Removing background from: {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
+        image = await enforce_memory_budget("remove-background", image)
         
-        # Remove background
-        processed_image = remove_background(image)
-        logger.info("✓ Background removed")
-        
-        # Apply edge refinement if requested
-        if refine_edges:
-            processed_image = refine_edges(processed_image, edge_strength)
-            logger.info("✓ Edges refined")
-        
-        # Auto-crop if requested
-        if auto_crop:
-            processed_image = auto_crop_subject(processed_image)
-            logger.info("✓ Auto-cropped")
-        
-        # Convert to PNG
-        output_buffer = io.BytesIO()
-        processed_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
+        content, media_type = await _admit_and_run(
+            request, "remove-background", image_megapixels(image),
+            run_remove_background, image, refine_edges, auto_crop, edge_strength, model, preset
+        )
         
         logger.info(f"✓ Processing complete for {file.filename}")
         
         return Response(
-            content=output_buffer.getvalue(),
-            media_type="image/png"
+            content=content,
+            media_type=media_type
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/enhance-only")
-async def enhance_only(file: UploadFile = File(...)):
+async def enhance_only(
+    request: Request,
+    file: UploadFile = File(...),
+    sr_backend: Optional[str] = Form(None)
+):
     """
     Enhance image quality only (no background removal)
     
     Args:
         file: Uploaded image file
+        sr_backend: Super-resolution backend (realesrgan, onnx, fsrcnn, espcn, heuristic)
         
     Returns:
         Enhanced PNG image
     """
     try:
-        if upsampler is None:
+        if not sr_backend and not learned_sr_available():
             raise HTTPException(status_code=503, detail="Enhancement model not available")
         
         # Validate file type
@@ -642,29 +1320,31 @@ async def enhance_only(file: UploadFile = File(...)):
         logger.info(f"Enhancing: {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
+        image = await enforce_memory_budget("enhance", image)
         
         # Enhance
-        enhanced_image = enhance_image(image)
-        
-        # Convert to PNG
-        output_buffer = io.BytesIO()
-        enhanced_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
+        content, media_type = await _admit_and_run(request, "enhance", image_megapixels(image),
+                                                   run_enhance, image, sr_backend)
         
         logger.info(f"✓ Enhanced {file.filename}")
         
         return Response(
-            content=output_buffer.getvalue(),
-            media_type="image/png"
+            content=content,
+            media_type=media_type
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/remove-background")
 async def api_remove_background(
-    file: UploadFile = File(...)
+    request: Request,
+    file: UploadFile = File(...),
+    model: Optional[str] = Form(None),
+    preset: Optional[str] = Form(None)
 ):
     """
     Enhanced background removal endpoint for frontend
@@ -672,6 +1352,8 @@ async def api_remove_background(
     
     Args:
         file: Uploaded image file
+        model: U2Net variant (u2net, u2net_int8, u2netp, silueta)
+        preset: Matting preset (fast, balanced, quality, full)
         
     Returns:
         PNG image with transparent background and refined edges
@@ -682,45 +1364,62 @@ async def api_remove_background(
         
         logger.info(f"Processing: {file.filename}")
         contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        
-        # Remove background
-        processed_image = remove_background(image)
-        logger.info("✓ Background removed")
-        
-        # Apply automatic edge refinement
-        processed_image = refine_edges(processed_image, strength=2)
-        logger.info("✓ Edges refined")
+        try:
+            preset = resolve_preset(preset)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # Convert to PNG
-        output_buffer = io.BytesIO()
-        processed_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
+        async def compute():
+            image = Image.open(io.BytesIO(contents))
+            image = await enforce_memory_budget("remove-background", image)
+            
+            # Remove background with automatic edge refinement
+            return await _admit_and_run(
+                request, "remove-background", image_megapixels(image),
+                run_remove_background, image, True, False, 2, model, preset, mask_cache=mask_cache
+            )
+        
+        # Identical uploads arriving while one is being processed share its
+        # result; admission rejections depend on the leader's own deadline, so
+        # followers are admitted separately instead of sharing them
+        if SINGLEFLIGHT:
+            key = request_key(contents, model or U2NET_MODEL, preset, mask_cache is not None)
+            content, media_type = await remove_background_flight.do(
+                key, compute, retry_if=lambda e: isinstance(e, HTTPException) and e.status_code == 429)
+        else:
+            content, media_type = await compute()
         
         logger.info(f"✓ Complete: {file.filename}")
         
         return Response(
-            content=output_buffer.getvalue(),
-            media_type="image/png"
+            content=content,
+            media_type=media_type
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/enhance-image")
-async def api_enhance_image(file: UploadFile = File(...)):
+async def api_enhance_image(
+    request: Request,
+    file: UploadFile = File(...),
+    sr_backend: Optional[str] = Form(None)
+):
     """
     Enhanced image quality enhancement endpoint for frontend
     
     Args:
         file: Uploaded image file
+        sr_backend: Super-resolution backend (realesrgan, onnx, fsrcnn, espcn, heuristic)
         
     Returns:
         Enhanced PNG image
     """
     try:
-        if upsampler is None:
+        if not sr_backend and not learned_sr_available():
             raise HTTPException(status_code=503, detail="Enhancement model not available")
         
         if not file.content_type.startswith('image/'):
@@ -729,32 +1428,34 @@ async def api_enhance_image(file: UploadFile = File(...)):
         logger.info(f"Enhancing: {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
+        image = await enforce_memory_budget("enhance", image)
         
         # Enhance
-        enhanced_image = enhance_image(image)
-        
-        # Convert to PNG
-        output_buffer = io.BytesIO()
-        enhanced_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
+        content, media_type = await _admit_and_run(request, "enhance", image_megapixels(image),
+                                                   run_enhance, image, sr_backend)
         
         logger.info(f"✓ Enhanced: {file.filename}")
         
         return Response(
-            content=output_buffer.getvalue(),
-            media_type="image/png"
+            content=content,
+            media_type=media_type
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/process-advanced")
 async def api_process_advanced(
+    request: Request,
     file: UploadFile = File(...),
     auto_crop: bool = Form(True),
     add_bg_color: bool = Form(False),
-    bg_color: str = Form("255,255,255")
+    bg_color: str = Form("255,255,255"),
+    model: Optional[str] = Form(None),
+    preset: Optional[str] = Form(None)
 ):
     """
     Advanced processing with MAXIMUM QUALITY settings
@@ -768,6 +1469,8 @@ async def api_process_advanced(
         auto_crop: Auto-crop to subject (default: True)
         add_bg_color: Add colored background
         bg_color: Background color as "r,g,b" string
+        model: U2Net variant (u2net, u2net_int8, u2netp, silueta)
+        preset: Matting preset (fast, balanced, quality, full)
         
     Returns:
         Processed image with maximum quality
@@ -779,124 +1482,157 @@ async def api_process_advanced(
         logger.info(f"High-quality processing: {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
+        image = await enforce_memory_budget("process-advanced", image)
         
-        # Step 1: Remove background with enhanced alpha matting
-        logger.info("Step 1: Removing background (enhanced alpha matting)...")
-        processed_image = remove(
-            image,
-            session=rembg_session,
-            alpha_matting=True,
-            alpha_matting_foreground_threshold=250,  # Higher for better quality
-            alpha_matting_background_threshold=5,     # Lower for cleaner removal
-            alpha_matting_erode_size=15               # Larger for smoother edges
+        content, media_type = await _admit_and_run(
+            request, "process-advanced", image_megapixels(image),
+            run_process_advanced, image, auto_crop, add_bg_color, bg_color, model, preset
         )
-        if processed_image.mode != 'RGBA':
-            processed_image = processed_image.convert('RGBA')
-        logger.info("✓ Background removed")
-        
-        # Step 2: Apply MAXIMUM edge refinement (strength=3 for solid edges)
-        logger.info("Step 2: Refining edges (maximum quality)...")
-        processed_image = refine_edges(processed_image, strength=3)
-        logger.info("✓ Edges refined")
-        
-        # Step 3: Auto-crop if requested
-        if auto_crop:
-            logger.info("Step 3: Auto-cropping subject...")
-            processed_image = auto_crop_subject(processed_image, padding=30)
-            logger.info("✓ Auto-cropped")
-        
-        # Step 4: Add background color if requested
-        if add_bg_color:
-            try:
-                r, g, b = map(int, bg_color.split(','))
-                processed_image = add_background_color(processed_image, (r, g, b))
-                logger.info(f"✓ Background color added: {bg_color}")
-            except:
-                logger.warning("Invalid background color format")
-        
-        # Convert to appropriate format
-        output_buffer = io.BytesIO()
-        if processed_image.mode == 'RGBA':
-            processed_image.save(output_buffer, format='PNG', optimize=True, quality=100)
-            media_type = "image/png"
-        else:
-            processed_image.save(output_buffer, format='JPEG', optimize=True, quality=100)
-            media_type = "image/jpeg"
-        output_buffer.seek(0)
         
         logger.info(f"✓ High-quality processing complete: {file.filename}")
-        logger.info(f"  Output size: {processed_image.width}x{processed_image.height}")
         
         return Response(
-            content=output_buffer.getvalue(),
+            content=content,
             media_type=media_type
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _batch_item(request: Request, file: UploadFile, model: Optional[str],
+                      preset: Optional[str]) -> tuple:
+    """
+    Process one batch upload
+    
+    Returns:
+        (result entry, PNG bytes or None on error); admission rejections
+        (429) are raised
+    """
+    try:
+        if not file.content_type.startswith('image/'):
+            return {"filename": file.filename, "status": "error", "error": "Not an image file"}, None
+        
+        # Process image
+        contents = await file.read()
+        image = Image.open(io.BytesIO(contents))
+        image = await enforce_memory_budget("batch-process", image)
+        
+        # Remove background with edge refinement
+        content, _ = await _admit_and_run(
+            request, "batch-process", image_megapixels(image),
+            run_remove_background, image, True, False, 2, model, preset
+        )
+        width, height = Image.open(io.BytesIO(content)).size
+        return {"filename": file.filename, "status": "success", "width": width, "height": height}, content
+        
+    except HTTPException as e:
+        if e.status_code == 429:
+            raise
+        return {"filename": file.filename, "status": "error", "error": e.detail}, None
+    except Exception as e:
+        logger.error(f"Error processing {file.filename}: {str(e)}")
+        return {"filename": file.filename, "status": "error", "error": str(e)}, None
+
+def batch_entry_name(filename: Optional[str], idx: int, used: set) -> str:
+    """Unique archive entry name for a processed upload"""
+    stem = os.path.splitext(os.path.basename(filename or ""))[0] or "image"
+    name = f"processed_{stem}.png"
+    suffix = idx + 1
+    while name in used:
+        name = f"processed_{stem}_{suffix}.png"
+        suffix += 1
+    used.add(name)
+    return name
+
+def stream_batch_archive(request: Request, files: List[UploadFile], model: Optional[str],
+                         preset: Optional[str], format: str) -> StreamingResponse:
+    """
+    Stream batch results as a ZIP or TAR archive
+    
+    Each image is written into the archive as soon as it is processed, so
+    only one result is held in memory at a time. manifest.json, the last
+    entry, has the per-file results (status, size, entry name or error).
+    The status line is sent before processing starts, so failures,
+    including admission rejections, are reported in the manifest.
+    """
+    archive = ArchiveStream(format)
+    
+    # The uploads are closed with the request scope, after the body is sent
+    async def body():
+        results, used = [], set()
+        for idx, file in enumerate(files):
+            try:
+                entry, content = await _batch_item(request, file, model, preset)
+            except HTTPException as e:
+                entry, content = {"filename": file.filename, "status": "error", "error": e.detail}, None
+            if content is not None:
+                entry["entry"] = batch_entry_name(file.filename, idx, used)
+                yield archive.add(entry["entry"], content)
+                logger.info(f"✓ Processed {idx + 1}/{len(files)}: {file.filename}")
+            results.append(entry)
+        
+        successful = sum(1 for r in results if r["status"] == "success")
+        logger.info(f"✓ Batch archive complete: {successful}/{len(files)} successful")
+        manifest = {
+            "total": len(files),
+            "successful": successful,
+            "failed": len(files) - successful,
+            "results": results
+        }
+        yield archive.add("manifest.json", json.dumps(manifest, indent=2).encode())
+        yield archive.close()
+    
+    return StreamingResponse(
+        body(),
+        media_type=archive.media_type,
+        headers={"Content-Disposition": f'attachment; filename="batch.{format}"'}
+    )
+
 @app.post("/api/batch-process")
-async def api_batch_process(files: List[UploadFile] = File(...)):
+async def api_batch_process(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    model: Optional[str] = Form(None),
+    preset: Optional[str] = Form(None),
+    output: str = Form("json")
+):
     """
     Batch process multiple images
     
     Args:
         files: List of uploaded image files
+        model: U2Net variant (u2net, u2net_int8, u2netp, silueta)
+        preset: Matting preset (fast, balanced, quality, full)
+        output: 'json' (base64 data URIs), or 'zip' / 'tar' to stream an
+            archive of PNGs plus manifest.json
         
     Returns:
-        JSON with processing results and image URLs
+        JSON with processing results and image URLs, or the archive stream
     """
     try:
-        if len(files) > 10:
-            raise HTTPException(status_code=400, detail="Maximum 10 images per batch")
+        if output not in ("json", *ARCHIVE_MEDIA_TYPES):
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown output '{output}'. Available: json, {', '.join(ARCHIVE_MEDIA_TYPES)}")
+        max_files = BATCH_MAX_FILES if output == "json" else BATCH_ARCHIVE_MAX_FILES
+        if len(files) > max_files:
+            raise HTTPException(status_code=400, detail=f"Maximum {max_files} images per batch")
         
-        logger.info(f"Batch processing {len(files)} images")
-        results = []
+        logger.info(f"Batch processing {len(files)} images ({output})")
+        if output != "json":
+            return stream_batch_archive(request, files, model, preset, output)
         
+        results = []
         for idx, file in enumerate(files):
-            try:
-                if not file.content_type.startswith('image/'):
-                    results.append({
-                        "filename": file.filename,
-                        "status": "error",
-                        "error": "Not an image file"
-                    })
-                    continue
-                
-                # Process image
-                contents = await file.read()
-                image = Image.open(io.BytesIO(contents))
-                
-                # Remove background with edge refinement
-                processed_image = remove_background(image)
-                processed_image = refine_edges(processed_image, strength=2)
-                
-                # Convert to PNG bytes
-                output_buffer = io.BytesIO()
-                processed_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-                output_buffer.seek(0)
-                
+            entry, content = await _batch_item(request, file, model, preset)
+            if content is not None:
                 # For batch processing, we return base64 encoded images
-                image_base64 = base64.b64encode(output_buffer.getvalue()).decode('utf-8')
-                
-                results.append({
-                    "filename": file.filename,
-                    "status": "success",
-                    "image": f"data:image/png;base64,{image_base64}",
-                    "width": processed_image.width,
-                    "height": processed_image.height
-                })
-                
+                image_base64 = base64.b64encode(content).decode('utf-8')
+                entry["image"] = f"data:image/png;base64,{image_base64}"
                 logger.info(f"✓ Processed {idx + 1}/{len(files)}: {file.filename}")
-                
-            except Exception as e:
-                logger.error(f"Error processing {file.filename}: {str(e)}")
-                results.append({
-                    "filename": file.filename,
-                    "status": "error",
-                    "error": str(e)
-                })
+            results.append(entry)
         
         successful = sum(1 for r in results if r["status"] == "success")
         logger.info(f"✓ Batch complete: {successful}/{len(files)} successful")
@@ -908,15 +1644,169 @@ async def api_batch_process(files: List[UploadFile] = File(...)):
             "results": results
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Batch processing error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ==================== JOB QUEUE ENDPOINTS ====================
+
+JOB_TYPES = ("process", "process-advanced")
+
+def job_status(job) -> dict:
+    """Status payload for a job, with links and queue position"""
+    status = job.to_dict()
+    status["queue_position"] = job_queue.position(job.id)
+    status["status_url"] = f"/api/jobs/{job.id}"
+    status["events_url"] = f"/api/jobs/{job.id}/events"
+    status["result_url"] = f"/api/jobs/{job.id}/result"
+    return status
+
+def get_job_or_404(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@app.post("/api/jobs", status_code=202)
+async def api_submit_job(
+    file: UploadFile = File(...),
+    job_type: str = Form("process"),
+    priority: int = Form(0),
+    model: Optional[str] = Form(None),
+    preset: Optional[str] = Form(None),
+    sr_backend: Optional[str] = Form(None),
+    auto_crop: bool = Form(True),
+    add_bg_color: bool = Form(False),
+    bg_color: str = Form("255,255,255")
+):
+    """
+    Submit a long-running processing job
+    
+    Args:
+        file: Uploaded image file
+        job_type: 'process' (/process pipeline) or 'process-advanced'
+            (/api/process-advanced pipeline)
+        priority: Higher runs first (-10 to 10)
+        model, preset, sr_backend: As on /process
+        auto_crop, add_bg_color, bg_color: As on /api/process-advanced
+        
+    Returns:
+        Job status with status, events (SSE) and result URLs
+    """
+    try:
+        if not file.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail="File must be an image")
+        if job_type not in JOB_TYPES:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown job_type '{job_type}'. Available: {', '.join(JOB_TYPES)}")
+        
+        # Validate options now rather than failing inside the worker
+        if model is not None and model not in U2NET_VARIANTS:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown model '{model}'. Available: {', '.join(U2NET_VARIANTS)}")
+        try:
+            resolve_preset(preset)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if sr_backend:
+            get_sr_backend(sr_backend)
+        
+        contents = await file.read()
+        image = Image.open(io.BytesIO(contents))
+        image.load()
+        image = await enforce_memory_budget(job_type, image)
+        
+        if job_type == "process":
+            def run(job):
+                return run_process(image, model, preset, sr_backend, checkpoint=job.checkpoint)
+        else:
+            def run(job):
+                return run_process_advanced(image, auto_crop, add_bg_color, bg_color, model, preset,
+                                            checkpoint=job.checkpoint)
+        
+        job = job_queue.submit(job_type, run, priority=max(-10, min(10, priority)),
+                               filename=file.filename)
+        logger.info(f"✓ Job {job.id} queued ({job_type}): {file.filename}")
+        return JSONResponse(status_code=202, content=job_status(job))
+        
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Job submission error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/jobs/{job_id}")
+async def api_job_status(job_id: str):
+    """Poll a job's status"""
+    return job_status(get_job_or_404(job_id))
+
+@app.get("/api/jobs/{job_id}/events")
+async def api_job_events(job_id: str):
+    """
+    Stream a job's status as Server-Sent Events
+    
+    A 'status' event is sent on every state change; the stream ends after
+    the job reaches succeeded, failed or cancelled.
+    """
+    get_job_or_404(job_id)
+    
+    async def events():
+        last_version = -1
+        last_sent = asyncio.get_event_loop().time()
+        while True:
+            job = job_queue.get(job_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'detail': 'Job expired'})}\n\n"
+                return
+            now = asyncio.get_event_loop().time()
+            if job.version != last_version:
+                last_version, last_sent = job.version, now
+                yield f"event: status\ndata: {json.dumps(job_status(job))}\n\n"
+                if job.status in TERMINAL_STATES:
+                    return
+            elif now - last_sent > 15:
+                # Comment line keeps proxies from closing an idle stream
+                last_sent = now
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(0.25)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/jobs/{job_id}/result")
+async def api_job_result(job_id: str):
+    """Fetch a finished job's output image"""
+    job = get_job_or_404(job_id)
+    if job.status != SUCCEEDED:
+        detail = job.error if job.error else f"Job is {job.status}"
+        raise HTTPException(status_code=409, detail=detail)
+    
+    name = os.path.splitext(job.filename or "image")[0]
+    extension = "png" if job.media_type == "image/png" else "jpg"
+    return Response(
+        content=job.result,
+        media_type=job.media_type,
+        headers={"Content-Disposition": f'attachment; filename="processed_{name}.{extension}"'}
+    )
+
+@app.delete("/api/jobs/{job_id}")
+async def api_cancel_job(job_id: str):
+    """Cancel a job; queued jobs never run, running jobs stop at the next stage"""
+    get_job_or_404(job_id)
+    job = job_queue.cancel(job_id)
+    return job_status(job)
+
+
 # ==================== HISTOGRAM PROCESSING ENDPOINTS ====================
 
 @app.post("/api/histogram-equalization")
 async def api_histogram_equalization(
+    request: Request,
     file: UploadFile = File(...),
     method: str = Form('clahe')
 ):
@@ -937,26 +1827,31 @@ async def api_histogram_equalization(
         logger.info(f"Applying histogram equalization ({method}): {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
-        img_array = np.array(image)
+        image = await enforce_memory_budget("histogram-equalization", image)
         
-        # Apply histogram equalization
-        result = histogram_equalization(img_array, method=method)
-        
-        # Convert back to PIL
-        result_image = Image.fromarray(result)
+        def work():
+            img_array = np.array(decode_image(image))
+            
+            # Apply histogram equalization
+            result = histogram_equalization(img_array, method=method)
+            
+            # Convert back to PIL
+            result_image = Image.fromarray(result)
+            
+            # Return image
+            return encode_image(result_image, 'PNG', optimize=True, quality=95)
         
-        # Return image
-        output_buffer = io.BytesIO()
-        result_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
+        content = await _admit_and_run(request, "histogram-equalization", image_megapixels(image), work)
         
         logger.info(f"✓ Histogram equalization complete: {file.filename}")
         
         return Response(
-            content=output_buffer.getvalue(),
+            content=content,
             media_type="image/png"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -964,6 +1859,7 @@ async def api_histogram_equalization(
 
 @app.post("/api/adjust-brightness-contrast")
 async def api_adjust_brightness_contrast(
+    request: Request,
     file: UploadFile = File(...),
     brightness: int = Form(0),
     contrast: float = Form(1.0),
@@ -988,27 +1884,32 @@ async def api_adjust_brightness_contrast(
         logger.info(f"Adjusting brightness/contrast: {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
-        img_array = np.array(image)
-        
-        # Apply adjustments
-        result = adjust_brightness_contrast(img_array, brightness, contrast)
-        if gamma != 1.0:
-            result = gamma_correction(result, gamma)
+        image = await enforce_memory_budget("adjust-brightness-contrast", image)
         
-        # Convert back to PIL
-        result_image = Image.fromarray(result)
+        def work():
+            img_array = np.array(decode_image(image))
+            
+            # Apply adjustments
+            result = adjust_brightness_contrast(img_array, brightness, contrast)
+            if gamma != 1.0:
+                result = gamma_correction(result, gamma)
+            
+            # Convert back to PIL
+            result_image = Image.fromarray(result)
+            
+            return encode_image(result_image, 'PNG', optimize=True, quality=95)
         
-        output_buffer = io.BytesIO()
-        result_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
+        content = await _admit_and_run(request, "adjust-brightness-contrast", image_megapixels(image), work)
         
         logger.info(f"✓ Adjustments complete: {file.filename}")
         
         return Response(
-            content=output_buffer.getvalue(),
+            content=content,
             media_type="image/png"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1018,6 +1919,7 @@ async def api_adjust_brightness_contrast(
 
 @app.post("/api/spatial-filter")
 async def api_spatial_filter(
+    request: Request,
     file: UploadFile = File(...),
     filter_type: str = Form('gaussian'),
     kernel_size: int = Form(5),
@@ -1042,40 +1944,45 @@ async def api_spatial_filter(
         logger.info(f"Applying {filter_type} filter: {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
-        img_array = np.array(image)
-        
-        # Apply filter
-        if filter_type == 'mean':
-            result = apply_mean_filter(img_array, kernel_size)
-        elif filter_type == 'median':
-            result = apply_median_filter(img_array, kernel_size)
-        elif filter_type == 'gaussian':
-            result = apply_gaussian_filter(img_array, kernel_size, sigma)
-        elif filter_type == 'bilateral':
-            result = apply_bilateral_filter(img_array)
-        elif filter_type == 'laplacian':
-            result = apply_laplacian_sharpening(img_array)
-        elif filter_type == 'unsharp':
-            result = apply_unsharp_mask(img_array, kernel_size, sigma)
-        elif filter_type == 'highpass':
-            result = apply_highpass_filter(img_array, kernel_size)
-        else:
-            raise HTTPException(status_code=400, detail="Invalid filter type")
+        image = await enforce_memory_budget("spatial-filter", image)
         
-        # Convert back to PIL
-        result_image = Image.fromarray(result)
+        def work():
+            img_array = np.array(decode_image(image))
+            
+            # Apply filter
+            if filter_type == 'mean':
+                result = apply_mean_filter(img_array, kernel_size)
+            elif filter_type == 'median':
+                result = apply_median_filter(img_array, kernel_size)
+            elif filter_type == 'gaussian':
+                result = apply_gaussian_filter(img_array, kernel_size, sigma)
+            elif filter_type == 'bilateral':
+                result = apply_bilateral_filter(img_array)
+            elif filter_type == 'laplacian':
+                result = apply_laplacian_sharpening(img_array)
+            elif filter_type == 'unsharp':
+                result = apply_unsharp_mask(img_array, kernel_size, sigma)
+            elif filter_type == 'highpass':
+                result = apply_highpass_filter(img_array, kernel_size)
+            else:
+                raise HTTPException(status_code=400, detail="Invalid filter type")
+            
+            # Convert back to PIL
+            result_image = Image.fromarray(result)
+            
+            return encode_image(result_image, 'PNG', optimize=True, quality=95)
         
-        output_buffer = io.BytesIO()
-        result_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
+        content = await _admit_and_run(request, "spatial-filter", image_megapixels(image), work)
         
         logger.info(f"✓ Filter applied: {file.filename}")
         
         return Response(
-            content=output_buffer.getvalue(),
+            content=content,
             media_type="image/png"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1085,6 +1992,7 @@ async def api_spatial_filter(
 
 @app.post("/api/frequency-filter")
 async def api_frequency_filter(
+    request: Request,
     file: UploadFile = File(...),
     filter_type: str = Form('lowpass'),
     cutoff: float = Form(30.0),
@@ -1113,26 +2021,31 @@ async def api_frequency_filter(
         logger.info(f"Applying {filter_type} frequency filter: {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
-        img_array = np.array(image)
-        
-        # Apply frequency filter
-        result = apply_frequency_filter(img_array, filter_type, cutoff, order, 
-                                       low_cutoff, high_cutoff)
+        image = await enforce_memory_budget("frequency-filter", image)
         
-        # Convert back to PIL
-        result_image = Image.fromarray(result)
+        def work():
+            img_array = np.array(decode_image(image))
+            
+            # Apply frequency filter
+            result = apply_frequency_filter(img_array, filter_type, cutoff, order, 
+                                           low_cutoff, high_cutoff)
+            
+            # Convert back to PIL
+            result_image = Image.fromarray(result)
+            
+            return encode_image(result_image, 'PNG', optimize=True, quality=95)
         
-        output_buffer = io.BytesIO()
-        result_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
+        content = await _admit_and_run(request, "frequency-filter", image_megapixels(image), work)
         
         logger.info(f"✓ Frequency filter applied: {file.filename}")
         
         return Response(
-            content=output_buffer.getvalue(),
+            content=content,
             media_type="image/png"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1142,6 +2055,7 @@ async def api_frequency_filter(
 
 @app.post("/api/edge-detection")
 async def api_edge_detection(
+    request: Request,
     file: UploadFile = File(...),
     method: str = Form('canny'),
     threshold1: int = Form(50),
@@ -1168,79 +2082,144 @@ async def api_edge_detection(
         logger.info(f"Detecting edges ({method}): {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
-        img_array = np.array(image)
-        
-        # Apply edge detection
-        if method == 'sobel':
-            result = detect_edges_sobel(img_array, kernel_size)
-        elif method == 'prewitt':
-            result = detect_edges_prewitt(img_array)
-        elif method == 'canny':
-            result = detect_edges_canny(img_array, threshold1, threshold2, kernel_size)
-        elif method == 'laplacian':
-            result = detect_edges_laplacian(img_array, kernel_size)
-        else:
-            raise HTTPException(status_code=400, detail="Invalid edge detection method")
+        image = await enforce_memory_budget("edge-detection", image)
         
-        # Convert back to PIL
-        result_image = Image.fromarray(result)
+        def work():
+            img_array = np.array(decode_image(image))
+            
+            # Apply edge detection
+            if method == 'sobel':
+                result = detect_edges_sobel(img_array, kernel_size)
+            elif method == 'prewitt':
+                result = detect_edges_prewitt(img_array)
+            elif method == 'canny':
+                result = detect_edges_canny(img_array, threshold1, threshold2, kernel_size)
+            elif method == 'laplacian':
+                result = detect_edges_laplacian(img_array, kernel_size)
+            else:
+                raise HTTPException(status_code=400, detail="Invalid edge detection method")
+            
+            # Convert back to PIL
+            result_image = Image.fromarray(result)
+            
+            return encode_image(result_image, 'PNG', optimize=True, quality=95)
         
-        output_buffer = io.BytesIO()
-        result_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
+        content = await _admit_and_run(request, "edge-detection", image_megapixels(image), work)
         
         logger.info(f"✓ Edge detection complete: {file.filename}")
         
         return Response(
-            content=output_buffer.getvalue(),
+            content=content,
             media_type="image/png"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+EDGE_COMPARE_FORMATS = ("json", "multipart", "stacked")
+# Tile of each detector in format=stacked, row-major in a 2x2 grid
+# (top-left, top-right, bottom-left, bottom-right)
+EDGE_TILE_ORDER = ("sobel", "prewitt", "canny", "laplacian")
+
+def multipart_mixed(parts: List[tuple]) -> tuple:
+    """
+    Build a multipart/mixed body of PNG parts
+    
+    Args:
+        parts: (name, PNG bytes) pairs
+        
+    Returns:
+        (body bytes, Content-Type header value with the boundary)
+    """
+    boundary = uuid.uuid4().hex
+    chunks = []
+    for name, content in parts:
+        chunks.append(
+            f"--{boundary}\r\n"
+            f"Content-Type: image/png\r\n"
+            f'Content-Disposition: inline; name="{name}"; filename="{name}.png"\r\n'
+            f"Content-Length: {len(content)}\r\n\r\n".encode()
+        )
+        chunks.append(content)
+        chunks.append(b"\r\n")
+    chunks.append(f"--{boundary}--\r\n".encode())
+    return b"".join(chunks), f"multipart/mixed; boundary={boundary}"
+
 @app.post("/api/compare-edge-detectors")
-async def api_compare_edge_detectors(file: UploadFile = File(...)):
+async def api_compare_edge_detectors(
+    request: Request,
+    file: UploadFile = File(...),
+    format: str = Form("json")
+):
     """
     Compare different edge detection methods
     
     Args:
         file: Input image
+        format: 'json' (base64 PNGs), 'multipart' (multipart/mixed, one PNG
+            part per method) or 'stacked' (one grayscale PNG, a 2x2 mosaic
+            of the methods in the X-Tile-Order header's row-major order)
         
     Returns:
-        JSON with base64-encoded results for each method
+        Results for each method in the requested format
     """
     try:
         if not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
+        if format not in EDGE_COMPARE_FORMATS:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown format '{format}'. Available: {', '.join(EDGE_COMPARE_FORMATS)}")
         
         logger.info(f"Comparing edge detectors: {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
-        img_array = np.array(image)
+        image = await enforce_memory_budget("compare-edge-detectors", image)
         
-        # Get all edge detection results
-        results_dict = compare_edge_detectors(img_array)
+        def work():
+            img_array = np.array(decode_image(image))
+            
+            # Get all edge detection results
+            results_dict = compare_edge_detectors(img_array)
+            
+            if format == "stacked":
+                # All detectors are single-channel uint8: tile them into one
+                # grayscale image (no alpha channel for clients to premultiply)
+                tiles = [results_dict[method] for method in EDGE_TILE_ORDER]
+                mosaic = np.vstack([np.hstack(tiles[:2]), np.hstack(tiles[2:])])
+                return encode_image(Image.fromarray(mosaic, 'L'), 'PNG')
+            if format == "multipart":
+                return multipart_mixed([(method, encode_image(Image.fromarray(result_array), 'PNG'))
+                                        for method, result_array in results_dict.items()])
+            
+            # Convert to base64
+            encoded_results = {}
+            for method, result_array in results_dict.items():
+                encoded = base64.b64encode(encode_image(Image.fromarray(result_array), 'PNG')).decode('utf-8')
+                encoded_results[method] = f"data:image/png;base64,{encoded}"
+            return encoded_results
         
-        # Convert to base64
-        encoded_results = {}
-        for method, result_array in results_dict.items():
-            result_image = Image.fromarray(result_array)
-            buffer = io.BytesIO()
-            result_image.save(buffer, format='PNG')
-            buffer.seek(0)
-            encoded = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            encoded_results[method] = f"data:image/png;base64,{encoded}"
+        encoded_results = await _admit_and_run(request, "compare-edge-detectors", image_megapixels(image), work)
         
         logger.info(f"✓ Edge detector comparison complete: {file.filename}")
         
+        if format == "stacked":
+            return Response(content=encoded_results, media_type="image/png",
+                            headers={"X-Tile-Order": ",".join(EDGE_TILE_ORDER)})
+        if format == "multipart":
+            body, content_type = encoded_results
+            return Response(content=body, media_type=content_type)
+        
         return JSONResponse(content={
             "filename": file.filename,
             "results": encoded_results
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1250,6 +2229,7 @@ async def api_compare_edge_detectors(file: UploadFile = File(...)):
 
 @app.post("/api/segment-threshold")
 async def api_segment_threshold(
+    request: Request,
     file: UploadFile = File(...),
     method: str = Form('otsu'),
     block_size: int = Form(11),
@@ -1274,31 +2254,36 @@ async def api_segment_threshold(
         logger.info(f"Segmenting with {method} threshold: {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
-        img_array = np.array(image)
-        
-        # Apply segmentation
-        if method == 'otsu':
-            result, threshold_value = segment_otsu_threshold(img_array)
-            logger.info(f"Otsu threshold value: {threshold_value}")
-        elif method == 'adaptive':
-            result = segment_adaptive_threshold(img_array, 'gaussian', block_size, C)
-        else:
-            raise HTTPException(status_code=400, detail="Invalid threshold method")
+        image = await enforce_memory_budget("segment-threshold", image)
         
-        # Convert back to PIL
-        result_image = Image.fromarray(result)
+        def work():
+            img_array = np.array(decode_image(image))
+            
+            # Apply segmentation
+            if method == 'otsu':
+                result, threshold_value = segment_otsu_threshold(img_array)
+                logger.info(f"Otsu threshold value: {threshold_value}")
+            elif method == 'adaptive':
+                result = segment_adaptive_threshold(img_array, 'gaussian', block_size, C)
+            else:
+                raise HTTPException(status_code=400, detail="Invalid threshold method")
+            
+            # Convert back to PIL
+            result_image = Image.fromarray(result)
+            
+            return encode_image(result_image, 'PNG', optimize=True, quality=95)
         
-        output_buffer = io.BytesIO()
-        result_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
+        content = await _admit_and_run(request, "segment-threshold", image_megapixels(image), work)
         
         logger.info(f"✓ Segmentation complete: {file.filename}")
         
         return Response(
-            content=output_buffer.getvalue(),
+            content=content,
             media_type="image/png"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1306,6 +2291,7 @@ async def api_segment_threshold(
 
 @app.post("/api/segment-color")
 async def api_segment_color(
+    request: Request,
     file: UploadFile = File(...),
     color_space: str = Form('hsv'),
     lower_h: int = Form(0),
@@ -1334,27 +2320,32 @@ async def api_segment_color(
         logger.info(f"Color-based segmentation ({color_space}): {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
-        img_array = np.array(image)
-        
-        # Apply color segmentation
-        lower_bound = (lower_h, lower_s, lower_v)
-        upper_bound = (upper_h, upper_s, upper_v)
-        result = segment_color_based(img_array, color_space, lower_bound, upper_bound)
+        image = await enforce_memory_budget("segment-color", image)
         
-        # Convert back to PIL
-        result_image = Image.fromarray(result)
+        def work():
+            img_array = np.array(decode_image(image))
+            
+            # Apply color segmentation
+            lower_bound = (lower_h, lower_s, lower_v)
+            upper_bound = (upper_h, upper_s, upper_v)
+            result = segment_color_based(img_array, color_space, lower_bound, upper_bound)
+            
+            # Convert back to PIL
+            result_image = Image.fromarray(result)
+            
+            return encode_image(result_image, 'PNG', optimize=True, quality=95)
         
-        output_buffer = io.BytesIO()
-        result_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
+        content = await _admit_and_run(request, "segment-color", image_megapixels(image), work)
         
         logger.info(f"✓ Color segmentation complete: {file.filename}")
         
         return Response(
-            content=output_buffer.getvalue(),
+            content=content,
             media_type="image/png"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1362,6 +2353,7 @@ async def api_segment_color(
 
 @app.post("/api/segment-kmeans")
 async def api_segment_kmeans(
+    request: Request,
     file: UploadFile = File(...),
     k: int = Form(3)
 ):
@@ -1382,32 +2374,40 @@ async def api_segment_kmeans(
         logger.info(f"K-means segmentation (k={k}): {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
-        img_array = np.array(image)
-        
-        # Apply K-means segmentation
-        result = segment_kmeans(img_array, k)
+        image = await enforce_memory_budget("segment-kmeans", image)
         
-        # Convert back to PIL
-        result_image = Image.fromarray(result)
+        def work():
+            img_array = np.array(decode_image(image))
+            
+            # Apply K-means segmentation
+            result = segment_kmeans(img_array, k)
+            
+            # Convert back to PIL
+            result_image = Image.fromarray(result)
+            
+            return encode_image(result_image, 'PNG', optimize=True, quality=95)
         
-        output_buffer = io.BytesIO()
-        result_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
+        content = await _admit_and_run(request, "segment-kmeans", image_megapixels(image), work)
         
         logger.info(f"✓ K-means segmentation complete: {file.filename}")
         
         return Response(
-            content=output_buffer.getvalue(),
+            content=content,
             media_type="image/png"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/segment-watershed")
-async def api_segment_watershed(file: UploadFile = File(...)):
+async def api_segment_watershed(
+    request: Request,
+    file: UploadFile = File(...)
+):
     """
     Segment image using watershed algorithm
     
@@ -1424,25 +2424,30 @@ async def api_segment_watershed(file: UploadFile = File(...)):
         logger.info(f"Watershed segmentation: {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
-        img_array = np.array(image)
+        image = await enforce_memory_budget("segment-watershed", image)
         
-        # Apply watershed segmentation
-        result = segment_watershed(img_array)
-        
-        # Convert back to PIL
-        result_image = Image.fromarray(result)
+        def work():
+            img_array = np.array(decode_image(image))
+            
+            # Apply watershed segmentation
+            result = segment_watershed(img_array)
+            
+            # Convert back to PIL
+            result_image = Image.fromarray(result)
+            
+            return encode_image(result_image, 'PNG', optimize=True, quality=95)
         
-        output_buffer = io.BytesIO()
-        result_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
+        content = await _admit_and_run(request, "segment-watershed", image_megapixels(image), work)
         
         logger.info(f"✓ Watershed segmentation complete: {file.filename}")
         
         return Response(
-            content=output_buffer.getvalue(),
+            content=content,
             media_type="image/png"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1452,6 +2457,7 @@ async def api_segment_watershed(file: UploadFile = File(...)):
 
 @app.post("/api/morphology")
 async def api_morphology(
+    request: Request,
     file: UploadFile = File(...),
     operation: str = Form('opening'),
     kernel_size: int = Form(5),
@@ -1476,46 +2482,51 @@ async def api_morphology(
         logger.info(f"Applying {operation} morphology: {file.filename}")
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
-        img_array = np.array(image)
-        
-        # Convert to grayscale if needed for morphology
-        if len(img_array.shape) == 3:
-            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = img_array
-        
-        # Apply morphological operation
-        if operation == 'dilate':
-            result = morphology_dilate(gray, kernel_size, iterations)
-        elif operation == 'erode':
-            result = morphology_erode(gray, kernel_size, iterations)
-        elif operation == 'opening':
-            result = morphology_opening(gray, kernel_size)
-        elif operation == 'closing':
-            result = morphology_closing(gray, kernel_size)
-        elif operation == 'gradient':
-            result = morphology_gradient(gray, kernel_size)
-        elif operation == 'tophat':
-            result = morphology_tophat(gray, kernel_size)
-        elif operation == 'blackhat':
-            result = morphology_blackhat(gray, kernel_size)
-        else:
-            raise HTTPException(status_code=400, detail="Invalid morphological operation")
+        image = await enforce_memory_budget("morphology", image)
         
-        # Convert back to PIL
-        result_image = Image.fromarray(result)
+        def work():
+            img_array = np.array(decode_image(image))
+            
+            # Convert to grayscale if needed for morphology
+            if len(img_array.shape) == 3:
+                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+            else:
+                gray = img_array
+            
+            # Apply morphological operation
+            if operation == 'dilate':
+                result = morphology_dilate(gray, kernel_size, iterations)
+            elif operation == 'erode':
+                result = morphology_erode(gray, kernel_size, iterations)
+            elif operation == 'opening':
+                result = morphology_opening(gray, kernel_size)
+            elif operation == 'closing':
+                result = morphology_closing(gray, kernel_size)
+            elif operation == 'gradient':
+                result = morphology_gradient(gray, kernel_size)
+            elif operation == 'tophat':
+                result = morphology_tophat(gray, kernel_size)
+            elif operation == 'blackhat':
+                result = morphology_blackhat(gray, kernel_size)
+            else:
+                raise HTTPException(status_code=400, detail="Invalid morphological operation")
+            
+            # Convert back to PIL
+            result_image = Image.fromarray(result)
+            
+            return encode_image(result_image, 'PNG', optimize=True, quality=95)
         
-        output_buffer = io.BytesIO()
-        result_image.save(output_buffer, format='PNG', optimize=True, quality=95)
-        output_buffer.seek(0)
+        content = await _admit_and_run(request, "morphology", image_megapixels(image), work)
         
         logger.info(f"✓ Morphology complete: {file.filename}")
         
         return Response(
-            content=output_buffer.getvalue(),
+            content=content,
             media_type="image/png"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,74 @@
+"""
+Streaming Archives
+Writes ZIP or TAR archives incrementally for StreamingResponse: every entry
+added returns the archive bytes it produced, so a response can send each
+file as soon as it is ready and never holds the whole archive in memory.
+"""
+
+import io
+import tarfile
+import time
+import zipfile
+from typing import List
+
+ARCHIVE_MEDIA_TYPES = {
+    "zip": "application/zip",
+    "tar": "application/x-tar",
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable write target that collects written bytes until drained"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ArchiveStream:
+    """
+    Incremental ZIP or TAR writer
+
+    ZIP entries are stored uncompressed (the images are already compressed
+    PNGs) with data descriptors, which is what zipfile writes to an
+    unseekable stream.
+    """
+
+    def __init__(self, format: str):
+        if format not in ARCHIVE_MEDIA_TYPES:
+            raise ValueError(f"Unknown archive format '{format}'. Available: {', '.join(ARCHIVE_MEDIA_TYPES)}")
+        self.format = format
+        self.media_type = ARCHIVE_MEDIA_TYPES[format]
+        self._sink = _ChunkSink()
+        if format == "zip":
+            self._archive = zipfile.ZipFile(self._sink, mode="w", compression=zipfile.ZIP_STORED)
+        else:
+            self._archive = tarfile.open(fileobj=self._sink, mode="w|")
+
+    def add(self, name: str, data: bytes) -> bytes:
+        """Add a file; returns the archive bytes to send"""
+        if self.format == "zip":
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            self._archive.writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self._archive.addfile(info, io.BytesIO(data))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        """Finish the archive (central directory / end blocks); returns the final bytes"""
+        self._archive.close()
+        return self._sink.drain()
@@ -0,0 +1,247 @@
+"""
+Offline Batch Processing
+Runs the API's background removal / refinement / enhancement chain over a
+directory, zip archive or tar stream without going through HTTP, for catalog
+runs of thousands of images.
+
+Inputs are read in order by one reader, decoded by a pool of prefetching
+decoder threads and processed by a worker pool; at most --workers + --prefetch
+images are held in memory at once. Every finished image is recorded in a
+progress file (JSON lines) after its output has been written, so an
+interrupted run started again with the same output directory skips the
+completed files.
+
+Usage (from the backend directory):
+    python batch_cli.py ../image -o out/
+    python batch_cli.py catalog.zip -o out/ --workers 4 --decoders 2 --auto-crop
+    tar -cf - photos/ | python batch_cli.py - -o out/ --enhance --sr-backend onnx
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Callable, Iterator, Set, Tuple
+
+from PIL import Image
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff"}
+PROGRESS_FILE = ".progress.jsonl"
+
+
+# ==================== INPUTS ====================
+
+def is_image_name(name: str) -> bool:
+    path = PurePosixPath(name)
+    return path.suffix.lower() in IMAGE_SUFFIXES and not any(part.startswith(".") for part in path.parts)
+
+
+def iter_inputs(source: str) -> Iterator[Tuple[str, Callable[[], bytes]]]:
+    """
+    Yield (relative name, reader) for every image in a directory, zip or tar
+
+    '-' reads a tar stream from stdin. Tar members must be read in order, so
+    readers are called by the consumer before it asks for the next item.
+    """
+    if source == "-":
+        with tarfile.open(fileobj=sys.stdin.buffer, mode="r|*") as archive:
+            yield from _iter_tar(archive)
+        return
+
+    path = Path(source)
+    if path.is_dir():
+        for file_path in sorted(p for p in path.rglob("*") if p.is_file()):
+            name = file_path.relative_to(path).as_posix()
+            if is_image_name(name):
+                yield name, file_path.read_bytes
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in sorted(archive.infolist(), key=lambda item: item.filename):
+                if not info.is_dir() and is_image_name(info.filename):
+                    yield info.filename, lambda info=info: archive.read(info)
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path, mode="r|*") as archive:
+            yield from _iter_tar(archive)
+    else:
+        raise ValueError(f"{source} is not a directory, zip or tar archive")
+
+
+def _iter_tar(archive: tarfile.TarFile) -> Iterator[Tuple[str, Callable[[], bytes]]]:
+    for member in archive:
+        if member.isfile() and is_image_name(member.name):
+            yield member.name, lambda member=member: archive.extractfile(member).read()
+
+
+def output_path(output_dir: Path, name: str) -> Path:
+    """
+    Output location mirroring the input layout (archive paths are sanitized)
+
+    The input suffix is kept (a.jpg -> a.jpg.png) so a.jpg and a.png in
+    the same folder do not overwrite each other.
+    """
+    parts = [part for part in PurePosixPath(name).parts if part not in ("", ".", "..", "/")]
+    path = output_dir.joinpath(*parts)
+    return path.with_name(path.name + ".png")
+
+
+# ==================== PROGRESS ====================
+
+class Progress:
+    """Append-only JSON-lines record of finished files"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done: Set[str] = set()
+        if path.exists():
+            for line in path.read_text().splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue    # a line cut short by an interruption
+                if entry.get("status") == "done":
+                    self.done.add(entry["name"])
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+
+    def record(self, name: str, status: str, **fields) -> None:
+        with self._lock:
+            self._file.write(json.dumps({"name": name, "status": status, **fields}) + "\n")
+            self._file.flush()
+            if status == "done":
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+
+# ==================== PROCESSING ====================
+
+def decode(data: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def process(api, image: Image.Image, args) -> bytes:
+    """The API's processing chain, called directly"""
+    if not args.no_remove_background:
+        image = api.remove_background(image, args.model, args.preset)
+        if args.edge_strength > 0:
+            image = api.refine_edges(image, args.edge_strength)
+        if args.auto_crop:
+            image = api.auto_crop_subject(image)
+    if args.enhance:
+        image = api.enhance_image(image, args.sr_backend)
+    return api.encode_image(image, 'PNG', optimize=args.optimize)
+
+
+def write_atomic(path: Path, content: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+
+
+def run(args) -> int:
+    """Process every input; returns the number of failures"""
+    # Imported here so --help works without the model stack installed
+    import api
+
+    api.load_models()
+    if args.enhance:
+        api.get_sr_backend(args.sr_backend)    # fail fast on an unknown/unloaded backend
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    progress = Progress(args.progress or args.output / PROGRESS_FILE)
+    if progress.done:
+        logger.info(f"Resuming: {len(progress.done)} files already done")
+
+    in_flight = threading.BoundedSemaphore(args.workers + args.prefetch)
+    skipped = 0
+    start = time.perf_counter()
+
+    def process_one(name: str, image: Image.Image) -> None:
+        began = time.perf_counter()
+        try:
+            path = output_path(args.output, name)
+            write_atomic(path, process(api, image, args))
+            progress.record(name, "done", output=str(path.relative_to(args.output)),
+                            seconds=round(time.perf_counter() - began, 3))
+            total = progress.completed + progress.failed
+            if total % args.log_every == 0:
+                rate = total / (time.perf_counter() - start)
+                logger.info(f"✓ {total} processed ({rate:.2f} images/s, {progress.failed} failed)")
+        except Exception as e:
+            logger.error(f"Failed {name}: {getattr(e, 'detail', str(e))}")
+            progress.record(name, "failed", error=str(getattr(e, "detail", e)))
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(args.workers, thread_name_prefix="process") as workers:
+        def on_decoded(name: str, future) -> None:
+            try:
+                image = future.result()
+            except Exception as e:
+                logger.error(f"Cannot decode {name}: {str(e)}")
+                progress.record(name, "failed", error=f"decode: {e}")
+                in_flight.release()
+                return
+            workers.submit(process_one, name, image)
+
+        with ThreadPoolExecutor(args.decoders, thread_name_prefix="decode") as decoders:
+            for name, read in iter_inputs(args.input):
+                if name in progress.done:
+                    skipped += 1
+                    continue
+                in_flight.acquire()
+                future = decoders.submit(decode, read())
+                future.add_done_callback(lambda f, name=name: on_decoded(name, f))
+
+    elapsed = time.perf_counter() - start
+    progress.close()
+    logger.info(f"✓ Done: {progress.completed} processed, {progress.failed} failed, {skipped} skipped "
+                f"in {elapsed:.1f}s ({progress.completed / max(elapsed, 1e-6):.2f} images/s)")
+    return progress.failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Directory, .zip, .tar[.gz], or '-' for a tar stream on stdin")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="Output directory")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Processing threads")
+    parser.add_argument("--decoders", type=int, default=2, help="Prefetching decoder threads")
+    parser.add_argument("--prefetch", type=int, default=8, help="Decoded images buffered ahead of the workers")
+    parser.add_argument("--progress", type=Path, help=f"Progress file (default: OUTPUT/{PROGRESS_FILE})")
+    parser.add_argument("--model", help="U2Net variant (U2NET_MODEL if omitted)")
+    parser.add_argument("--preset", help="Matting preset: fast, balanced, quality, full")
+    parser.add_argument("--edge-strength", type=int, default=2, help="Edge refinement strength (0 = off)")
+    parser.add_argument("--auto-crop", action="store_true", help="Crop to the subject")
+    parser.add_argument("--enhance", action="store_true", help="Run super-resolution enhancement")
+    parser.add_argument("--sr-backend", help="Super-resolution backend (SR_BACKEND if omitted)")
+    parser.add_argument("--no-remove-background", action="store_true", help="Skip background removal")
+    parser.add_argument("--optimize", action="store_true", help="Smaller PNGs at a higher encode cost")
+    parser.add_argument("--log-every", type=int, default=25, help="Log progress every N images")
+    args = parser.parse_args()
+
+    failed = run(args)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
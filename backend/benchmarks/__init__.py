@@ -0,0 +1,6 @@
+"""
+Offline benchmarks for the backend
+
+Run from the backend directory so the service modules are importable, e.g.:
+    python -m benchmarks.onnx_threads
+"""
@@ -0,0 +1,152 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+
+import math
+import os
+import statistics
+import time
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+
+def synthetic_rgb(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """
+    Deterministic RGB test image: smooth gradients plus seeded texture noise
+
+    Args:
+        width: Image width
+        height: Image height
+        seed: Random seed for the texture component
+
+    Returns:
+        uint8 array of shape (height, width, 3)
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([
+        128 + 100 * np.sin(xx / max(width, 1) * np.pi * 3),
+        128 + 100 * np.cos(yy / max(height, 1) * np.pi * 2),
+        128 + 60 * np.sin((xx + yy) / max(width + height, 1) * np.pi * 5)
+    ], axis=-1)
+    noise = rng.normal(0, 12, size=(height, width, 3))
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def time_call(fn: Callable[[], object], repeat: int = 5, warmup: int = 1) -> Dict[str, float]:
+    """
+    Time a callable
+
+    Args:
+        fn: Zero-argument callable to time
+        repeat: Number of timed runs
+        warmup: Untimed runs before measuring
+
+    Returns:
+        Dictionary with mean, median, min and max in milliseconds
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "mean_ms": statistics.mean(samples),
+        "median_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "max_ms": max(samples),
+    }
+
+
+def peak_traced_bytes(fn: Callable[[], object]) -> int:
+    """
+    Peak Python/NumPy heap allocation while running fn, via tracemalloc
+
+    Buffers allocated by NumPy (including OpenCV outputs, which are NumPy
+    arrays) are traced; memory held privately by native libraries is not.
+    """
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def psnr(a: np.ndarray, b: np.ndarray) -> float:
+    """Peak signal-to-noise ratio between two uint8 images in dB"""
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    if mse == 0:
+        return float("inf")
+    return float(10 * np.log10(255.0 ** 2 / mse))
+
+
+def ssim(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Mean structural similarity between two uint8 images
+
+    Gaussian-windowed SSIM (sigma 1.5) on the luma channel, with the usual
+    constants K1=0.01 and K2=0.03.
+    """
+    import cv2
+
+    def luma(img):
+        img = img[..., :3] if img.ndim == 3 else img
+        if img.ndim == 3:
+            img = cv2.cvtColor(np.ascontiguousarray(img), cv2.COLOR_RGB2GRAY)
+        return img.astype(np.float64)
+
+    x, y = luma(a), luma(b)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    def blur(img):
+        return cv2.GaussianBlur(img, (11, 11), 1.5)
+
+    mu_x, mu_y = blur(x), blur(y)
+    var_x = blur(x * x) - mu_x ** 2
+    var_y = blur(y * y) - mu_y ** 2
+    cov = blur(x * y) - mu_x * mu_y
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * cov + c2)) / ((mu_x ** 2 + mu_y ** 2 + c1) * (var_x + var_y + c2))
+    return float(ssim_map.mean())
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process in bytes (0 if unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss
+        except ImportError:
+            return 0
+
+
+def print_table(rows: List[Dict], columns: List[str]) -> None:
+    """Print rows as an aligned plain-text table"""
+    def fmt(value):
+        return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+    widths = [max(len(col), *(len(fmt(row.get(col, ""))) for row in rows)) for col in columns]
+    print("  ".join(col.ljust(width) for col, width in zip(columns, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in rows:
+        print("  ".join(fmt(row.get(col, "")).ljust(width) for col, width in zip(columns, widths)))
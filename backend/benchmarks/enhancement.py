@@ -0,0 +1,81 @@
+"""
+Fallback enhancement benchmark for api.enhance_image_advanced
+
+Compares the 'fast' engine (denoise and contrast at source resolution, one
+upsample, light sharpening at output size) with the 'legacy' engine (upsample
+first, filter the 4x-area image): median latency plus PSNR/SSIM of the fast
+output against the legacy output. Optionally a reference PSNR/SSIM is added
+for each mode by downscaling the image first and comparing the 2x result with
+the original.
+
+Usage (from the backend directory):
+    python -m benchmarks.enhancement
+    python -m benchmarks.enhancement --sizes 512x512,2000x1500 --modes rgb,rgba
+"""
+
+import argparse
+
+import numpy as np
+from PIL import Image
+
+from api import enhance_image_advanced
+from benchmarks.common import print_table, psnr, ssim, synthetic_rgb, time_call
+from warmup import synthetic_image
+
+
+def make_input(width: int, height: int, kind: str) -> Image.Image:
+    """Synthetic RGB texture or RGBA product cutout"""
+    if kind == "rgba":
+        image = synthetic_image(width, height, "RGBA")
+        rgb = synthetic_rgb(width, height)
+        alpha = np.array(image)[:, :, 3:]
+        return Image.fromarray(np.concatenate([rgb, alpha], axis=2), "RGBA")
+    return Image.fromarray(synthetic_rgb(width, height), "RGB")
+
+
+def enhance(image: Image.Image, mode: str) -> np.ndarray:
+    return np.array(enhance_image_advanced(image, mode=mode))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="512x512,1024x768,2000x1500", help="Input sizes WxH")
+    parser.add_argument("--modes", default="rgb,rgba", help="Input kinds: rgb, rgba")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per size")
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes.split(","):
+        w, h = map(int, size.lower().split("x"))
+        for kind in args.modes.split(","):
+            image = make_input(w, h, kind)
+
+            legacy = time_call(lambda: enhance(image, "legacy"), repeat=args.repeat)
+            fast = time_call(lambda: enhance(image, "fast"), repeat=args.repeat)
+            legacy_out = enhance(image, "legacy")
+            fast_out = enhance(image, "fast")
+
+            # Reference quality: enhance a half-size copy and compare with the original
+            half = image.resize((w // 2, h // 2), Image.Resampling.LANCZOS)
+            original = np.array(image)[: (h // 2) * 2, : (w // 2) * 2]
+            legacy_ref = enhance(half, "legacy")
+            fast_ref = enhance(half, "fast")
+
+            rows.append({
+                "size": size,
+                "input": kind,
+                "legacy_ms": legacy["median_ms"],
+                "fast_ms": fast["median_ms"],
+                "speedup": legacy["median_ms"] / max(fast["median_ms"], 1e-6),
+                "psnr_vs_legacy": psnr(legacy_out, fast_out),
+                "ssim_vs_legacy": ssim(legacy_out, fast_out),
+                "legacy_ref_ssim": ssim(original, legacy_ref),
+                "fast_ref_ssim": ssim(original, fast_ref),
+            })
+
+    print_table(rows, ["size", "input", "legacy_ms", "fast_ms", "speedup", "psnr_vs_legacy",
+                       "ssim_vs_legacy", "legacy_ref_ssim", "fast_ref_ssim"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Finishing-chain benchmark for main_simple's /api/remove-background
+
+Compares the fused uint8 finish_rgb stage with the previous float32
+scipy + ImageEnhance chain: median latency, peak traced allocation, and
+PSNR between the two outputs.
+
+Usage (from the backend directory):
+    python -m benchmarks.finishing
+    python -m benchmarks.finishing --sizes 1024x1024,4000x3000 --min-psnr 32
+
+Exits non-zero when the PSNR between the two chains falls below --min-psnr.
+"""
+
+import argparse
+import sys
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from main_simple import finish_rgb
+from benchmarks.common import peak_traced_bytes, print_table, psnr, synthetic_rgb, time_call
+
+
+def finish_rgb_reference(rgb: np.ndarray) -> np.ndarray:
+    """The original float32 finishing chain"""
+    from scipy.ndimage import median_filter, gaussian_filter
+
+    img_array = rgb.astype(np.float32) / 255.0
+    for i in range(3):
+        img_array[:, :, i] = median_filter(img_array[:, :, i], size=3)
+    for i in range(3):
+        img_array[:, :, i] = gaussian_filter(img_array[:, :, i], sigma=0.8)
+
+    blurred = gaussian_filter(img_array, sigma=2.0)
+    img_array = np.clip(img_array + 2.5 * (img_array - blurred), 0, 1)
+
+    for i in range(3):
+        channel = img_array[:, :, i]
+        p2, p98 = np.percentile(channel, (2, 98))
+        if p98 > p2:
+            img_array[:, :, i] = np.clip((channel - p2) / (p98 - p2), 0, 1)
+
+    img_array = np.power(img_array, 0.95)
+    out = Image.fromarray((img_array * 255).astype(np.uint8))
+    out = ImageEnhance.Sharpness(out).enhance(1.3)
+    out = ImageEnhance.Color(out).enhance(1.15)
+    out = ImageEnhance.Contrast(out).enhance(1.08)
+    return np.array(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="640x480,1920x1080,4000x3000", help="Image sizes WxH")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per size")
+    parser.add_argument("--min-psnr", type=float, default=30.0,
+                        help="Exit non-zero if the fused chain's PSNR against the reference falls below this (dB)")
+    args = parser.parse_args()
+
+    rows, failed = [], False
+    for size in args.sizes.split(","):
+        w, h = map(int, size.lower().split("x"))
+        rgb = synthetic_rgb(w, h)
+
+        before = time_call(lambda: finish_rgb_reference(rgb), repeat=args.repeat)
+        after = time_call(lambda: finish_rgb(rgb.copy()), repeat=args.repeat)
+        rows.append({
+            "size": size,
+            "before_ms": before["median_ms"],
+            "after_ms": after["median_ms"],
+            "speedup": before["median_ms"] / max(after["median_ms"], 1e-6),
+            "before_peak_mb": peak_traced_bytes(lambda: finish_rgb_reference(rgb)) / 2 ** 20,
+            "after_peak_mb": peak_traced_bytes(lambda: finish_rgb(rgb.copy())) / 2 ** 20,
+            "psnr_db": psnr(finish_rgb_reference(rgb), finish_rgb(rgb.copy())),
+        })
+        if rows[-1]["psnr_db"] < args.min_psnr:
+            failed = True
+
+    print_table(rows, ["size", "before_ms", "after_ms", "speedup",
+                       "before_peak_mb", "after_peak_mb", "psnr_db"])
+    if failed:
+        print(f"\n✗ Fused finishing chain fell below --min-psnr {args.min_psnr}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
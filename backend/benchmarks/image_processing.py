@@ -0,0 +1,263 @@
+"""
+Benchmark suite for every public function in image_processing.py
+
+Times each function across input sizes, channel layouts (gray, RGB, RGBA) and
+dtypes (uint8, uint16, float32) on deterministic synthetic inputs. Results can
+be saved as a baseline JSON and later runs compared against it; the run exits
+with status 1 when a case is slower than the baseline by more than the
+tolerance, or when a case that used to run now raises.
+
+Combinations a function does not support (e.g. YCrCb equalization of float32
+input) are recorded as errors rather than skipped, so a function that starts
+or stops accepting an input shows up in the comparison.
+
+Baselines are machine-specific and none is committed: record one with
+--save-baseline on the machine (and profile) that will run --compare, and
+re-record it after intentional performance changes. --compare exits 1 when
+there is no baseline yet.
+
+Usage (from the backend directory):
+    python -m benchmarks.image_processing
+    python -m benchmarks.image_processing --profile quick --save-baseline   # bootstrap, once per machine
+    python -m benchmarks.image_processing --profile full --save-baseline
+    python -m benchmarks.image_processing --compare
+    python -m benchmarks.image_processing --functions segment_kmeans,apply_frequency_filter --sizes 12
+"""
+
+import argparse
+import inspect
+import json
+import platform
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+import image_processing as ip
+from benchmarks.common import print_table, synthetic_rgb, time_call
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "image_processing.json"
+
+# Megapixels -> (width, height), 4:3
+SIZES = {
+    "0.3": (640, 480),
+    "2": (1632, 1224),
+    "12": (4000, 3000),
+    "48": (8000, 6000),
+}
+KINDS = ("gray", "rgb", "rgba")
+DTYPES = ("uint8", "uint16", "float32")
+
+PROFILES = {
+    "quick": {"sizes": ("0.3", "2"), "kinds": KINDS, "dtypes": ("uint8",)},
+    "standard": {"sizes": ("0.3", "2", "12"), "kinds": KINDS, "dtypes": DTYPES},
+    "full": {"sizes": tuple(SIZES), "kinds": KINDS, "dtypes": DTYPES},
+}
+
+# Timings below this are dominated by noise and never count as regressions
+NOISE_FLOOR_MS = 1.0
+
+
+def make_input(megapixels: str, kind: str, dtype: str, seed: int = 0) -> np.ndarray:
+    """
+    Deterministic synthetic input
+
+    RGBA inputs get a centred elliptical subject in the alpha channel so the
+    alpha-aware functions see a realistic bounding box. uint16 spans the full
+    16-bit range and float32 is scaled to [0, 1].
+    """
+    width, height = SIZES[megapixels]
+    rgb = synthetic_rgb(width, height, seed)
+    if kind == "gray":
+        image = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    elif kind == "rgba":
+        alpha = np.zeros((height, width), dtype=np.uint8)
+        cv2.ellipse(alpha, (width // 2, height // 2), (width // 3, height // 3), 0, 0, 360, 255, -1)
+        image = np.dstack([rgb, alpha])
+    else:
+        image = rgb
+
+    if dtype == "uint16":
+        return image.astype(np.uint16) * 257
+    if dtype == "float32":
+        return image.astype(np.float32) / 255.0
+    return image
+
+
+def _roi_fn(roi: np.ndarray) -> np.ndarray:
+    return cv2.GaussianBlur(roi, (5, 5), 0)
+
+
+# Function name -> callable(image, reference) running it with representative arguments
+CASES: Dict[str, Callable[[np.ndarray, np.ndarray], object]] = {
+    "histogram_equalization": lambda img, ref: ip.histogram_equalization(img, "clahe"),
+    "histogram_matching": lambda img, ref: ip.histogram_matching(img, ref),
+    "adjust_brightness_contrast": lambda img, ref: ip.adjust_brightness_contrast(img, 20, 20),
+    "gamma_correction": lambda img, ref: ip.gamma_correction(img, 1.5),
+    "apply_mean_filter": lambda img, ref: ip.apply_mean_filter(img, 5),
+    "apply_median_filter": lambda img, ref: ip.apply_median_filter(img, 5),
+    "apply_gaussian_filter": lambda img, ref: ip.apply_gaussian_filter(img, 5),
+    "apply_bilateral_filter": lambda img, ref: ip.apply_bilateral_filter(img),
+    "apply_laplacian_sharpening": lambda img, ref: ip.apply_laplacian_sharpening(img),
+    "apply_unsharp_mask": lambda img, ref: ip.apply_unsharp_mask(img),
+    "apply_highpass_filter": lambda img, ref: ip.apply_highpass_filter(img),
+    "create_lowpass_filter": lambda img, ref: ip.create_lowpass_filter(img.shape[:2], 30),
+    "create_highpass_filter": lambda img, ref: ip.create_highpass_filter(img.shape[:2], 30),
+    "create_bandpass_filter": lambda img, ref: ip.create_bandpass_filter(img.shape[:2], 20, 60),
+    "create_butterworth_lowpass": lambda img, ref: ip.create_butterworth_lowpass(img.shape[:2], 30),
+    "apply_frequency_filter": lambda img, ref: ip.apply_frequency_filter(img, "butterworth_lowpass"),
+    "detect_edges_sobel": lambda img, ref: ip.detect_edges_sobel(img),
+    "detect_edges_prewitt": lambda img, ref: ip.detect_edges_prewitt(img),
+    "detect_edges_canny": lambda img, ref: ip.detect_edges_canny(img),
+    "detect_edges_laplacian": lambda img, ref: ip.detect_edges_laplacian(img),
+    "compare_edge_detectors": lambda img, ref: ip.compare_edge_detectors(img),
+    "segment_otsu_threshold": lambda img, ref: ip.segment_otsu_threshold(img),
+    "segment_adaptive_threshold": lambda img, ref: ip.segment_adaptive_threshold(img),
+    "segment_region_growing": lambda img, ref: ip.segment_region_growing(
+        img, (img.shape[1] // 2, img.shape[0] // 2)),
+    "segment_watershed": lambda img, ref: ip.segment_watershed(img),
+    "segment_color_based": lambda img, ref: ip.segment_color_based(img),
+    "segment_kmeans": lambda img, ref: ip.segment_kmeans(img, 3),
+    "morphology_dilate": lambda img, ref: ip.morphology_dilate(img),
+    "morphology_erode": lambda img, ref: ip.morphology_erode(img),
+    "morphology_opening": lambda img, ref: ip.morphology_opening(img),
+    "morphology_closing": lambda img, ref: ip.morphology_closing(img),
+    "morphology_gradient": lambda img, ref: ip.morphology_gradient(img),
+    "morphology_tophat": lambda img, ref: ip.morphology_tophat(img),
+    "morphology_blackhat": lambda img, ref: ip.morphology_blackhat(img),
+    "apply_morphological_operations": lambda img, ref: ip.apply_morphological_operations(
+        img, [{"type": "opening", "kernel_size": 5}, {"type": "closing", "kernel_size": 5}]),
+    "alpha_bbox": lambda img, ref: ip.alpha_bbox(img[:, :, 3] if img.ndim == 3 and img.shape[2] == 4 else img),
+    "process_alpha_roi": lambda img, ref: ip.process_alpha_roi(img, _roi_fn),
+}
+
+
+def public_functions() -> List[str]:
+    """Public functions defined in image_processing (the suite must cover all of them)"""
+    return sorted(name for name, obj in inspect.getmembers(ip, inspect.isfunction)
+                  if not name.startswith("_") and inspect.unwrap(obj).__module__ == ip.__name__)
+
+
+def case_key(function: str, megapixels: str, kind: str, dtype: str) -> str:
+    return f"{function}|{megapixels}MP|{kind}|{dtype}"
+
+
+def run_case(function: str, image: np.ndarray, reference: np.ndarray, repeat: int) -> Dict:
+    """Time one case; unsupported inputs are reported with the exception type"""
+    fn = CASES[function]
+    try:
+        timing = time_call(lambda: fn(image, reference), repeat=repeat)
+    except Exception as e:
+        return {"status": "error", "error": f"{type(e).__name__}: {str(e).splitlines()[0][:120]}"}
+    return {"status": "ok", "median_ms": round(timing["median_ms"], 3), "min_ms": round(timing["min_ms"], 3)}
+
+
+def machine_info() -> Dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict, tolerance: float) -> List[Dict]:
+    """
+    Cases that regressed against the baseline
+
+    A case regresses when its median is over baseline * (1 + tolerance) and
+    the difference exceeds NOISE_FLOOR_MS, or when it errors where the
+    baseline ran.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline["results"].get(key)
+        if base is None or base["status"] != "ok":
+            continue
+        if result["status"] != "ok":
+            regressions.append({"case": key, "baseline_ms": base["median_ms"], "current_ms": None,
+                                "change": result["error"]})
+            continue
+        limit = base["median_ms"] * (1 + tolerance)
+        if result["median_ms"] > limit and result["median_ms"] - base["median_ms"] > NOISE_FLOOR_MS:
+            regressions.append({"case": key, "baseline_ms": base["median_ms"],
+                                "current_ms": result["median_ms"],
+                                "change": f"+{(result['median_ms'] / base['median_ms'] - 1) * 100:.0f}%"})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=list(PROFILES), default="quick",
+                        help="Preset sizes/kinds/dtypes (overridden by the options below)")
+    parser.add_argument("--sizes", help=f"Megapixel sizes from {', '.join(SIZES)}")
+    parser.add_argument("--kinds", help="Channel layouts: gray, rgb, rgba")
+    parser.add_argument("--dtypes", help="Dtypes: uint8, uint16, float32")
+    parser.add_argument("--functions", help="Only these functions (default: all public functions)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline JSON path")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="Fail on regressions against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    sizes = args.sizes.split(",") if args.sizes else list(profile["sizes"])
+    kinds = args.kinds.split(",") if args.kinds else list(profile["kinds"])
+    dtypes = args.dtypes.split(",") if args.dtypes else list(profile["dtypes"])
+
+    missing = [name for name in public_functions() if name not in CASES]
+    if missing:
+        print(f"No benchmark case for: {', '.join(missing)}", file=sys.stderr)
+        sys.exit(1)
+    functions = args.functions.split(",") if args.functions else sorted(CASES)
+
+    results: Dict[str, Dict] = {}
+    rows = []
+    for megapixels in sizes:
+        for kind in kinds:
+            for dtype in dtypes:
+                image = make_input(megapixels, kind, dtype)
+                reference = make_input(megapixels, kind, dtype, seed=1)
+                for function in functions:
+                    result = run_case(function, image, reference, args.repeat)
+                    results[case_key(function, megapixels, kind, dtype)] = result
+                    rows.append({"function": function, "mp": megapixels, "kind": kind, "dtype": dtype,
+                                 "median_ms": result.get("median_ms", "-"),
+                                 "status": result["status"] if result["status"] == "ok" else result["error"]})
+
+    print_table(rows, ["function", "mp", "kind", "dtype", "median_ms", "status"])
+
+    baseline: Optional[Dict] = None
+    if args.compare:
+        if not args.baseline.exists():
+            print(f"\nNo baseline at {args.baseline}; record one on this machine with "
+                  f"--profile {args.profile} --save-baseline first", file=sys.stderr)
+            sys.exit(1)
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("machine") != machine_info():
+            print("\nWarning: baseline was recorded on a different machine/library set", file=sys.stderr)
+
+    if args.save_baseline:
+        previous = json.loads(args.baseline.read_text()) if args.baseline.exists() else {"results": {}}
+        merged = {**previous.get("results", {}), **results}
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({"machine": machine_info(), "repeat": args.repeat,
+                                             "results": dict(sorted(merged.items()))}, indent=1) + "\n")
+        print(f"\n✓ Baseline written to {args.baseline} ({len(results)} cases)")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s) against {args.baseline}:")
+            print_table(regressions, ["case", "baseline_ms", "current_ms", "change"])
+            sys.exit(1)
+        print(f"\n✓ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
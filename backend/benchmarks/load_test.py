@@ -0,0 +1,270 @@
+"""
+HTTP load test for api.py and main_simple.py
+
+Drives the image endpoints at each requested concurrency level and reports
+throughput, p50/p95/p99 latency, error rate and 429 (admission/queue)
+rejections per endpoint. Jobs submitted to /api/jobs are timed from
+submission until their result has been downloaded.
+
+With --spawn the server is started here with FAKE_MODELS=True, so /process
+and the enhancement endpoints run on the deterministic stand-ins in
+fake_models.py (tune FAKE_U2NET_MS, FAKE_SR_MS_PER_MP and FAKE_MODEL_MODE in
+the environment) and no model weights are needed.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test --spawn api --concurrency 1,4,16 --duration 20
+    python -m benchmarks.load_test --spawn main_simple --endpoints remove-background
+    python -m benchmarks.load_test --url http://localhost:8000 --app api --mode mix --duration 60
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+from PIL import Image
+
+from benchmarks.common import percentile, print_table, synthetic_rgb
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+@dataclass
+class Endpoint:
+    """One endpoint and the request it is driven with"""
+
+    name: str
+    path: str
+    data: Dict = field(default_factory=dict)     # form fields
+    params: Dict = field(default_factory=dict)   # query parameters
+    files: int = 1                               # uploads per request (batch)
+    job: bool = False                            # /api/jobs: submit, poll, download
+
+
+ENDPOINTS = {
+    "api": [
+        Endpoint("process", "/process"),
+        Endpoint("remove-background", "/remove-background"),
+        Endpoint("enhance-only", "/enhance-only"),
+        Endpoint("api-remove-background", "/api/remove-background"),
+        Endpoint("api-enhance-image", "/api/enhance-image"),
+        Endpoint("process-advanced", "/api/process-advanced"),
+        Endpoint("batch-process", "/api/batch-process", files=3),
+        Endpoint("job-process", "/api/jobs", data={"job_type": "process"}, job=True),
+        Endpoint("histogram-equalization", "/api/histogram-equalization", data={"method": "clahe"}),
+        Endpoint("adjust-brightness-contrast", "/api/adjust-brightness-contrast",
+                 data={"brightness": 10, "contrast": 1.1}),
+        Endpoint("spatial-filter", "/api/spatial-filter", data={"filter_type": "gaussian"}),
+        Endpoint("frequency-filter", "/api/frequency-filter", data={"filter_type": "lowpass"}),
+        Endpoint("edge-detection", "/api/edge-detection", data={"method": "canny"}),
+        Endpoint("compare-edge-detectors", "/api/compare-edge-detectors"),
+        Endpoint("segment-threshold", "/api/segment-threshold", data={"method": "otsu"}),
+        Endpoint("segment-color", "/api/segment-color"),
+        Endpoint("segment-kmeans", "/api/segment-kmeans", data={"k": 3}),
+        Endpoint("segment-watershed", "/api/segment-watershed"),
+        Endpoint("morphology", "/api/morphology", data={"operation": "opening"}),
+    ],
+    "main_simple": [
+        Endpoint("remove-background", "/api/remove-background"),
+        Endpoint("enhance-image", "/api/enhance-image", params={"scale": 2}),
+        Endpoint("process-all", "/api/process-all"),
+    ],
+}
+READY_PATHS = {"api": "/health", "main_simple": "/api/status"}
+
+
+def make_payload(width: int, height: int) -> bytes:
+    """Deterministic PNG upload"""
+    buffer = io.BytesIO()
+    Image.fromarray(synthetic_rgb(width, height), "RGB").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# ==================== REQUESTS ====================
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def send(base_url: str, endpoint: Endpoint, payload: bytes, timeout: float) -> int:
+    """Issue one request (or run one job to completion) and return the final status code"""
+    session = _session()
+    field_name = "files" if endpoint.files > 1 else "file"
+    files = [(field_name, (f"load_{idx}.png", payload, "image/png")) for idx in range(endpoint.files)]
+    response = session.post(base_url + endpoint.path, data=endpoint.data, params=endpoint.params,
+                            files=files, timeout=timeout)
+    if not endpoint.job or response.status_code != 202:
+        return response.status_code
+
+    job_url = f"{base_url}/api/jobs/{response.json()['job_id']}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = session.get(job_url, timeout=timeout).json()["status"]
+        if status == "succeeded":
+            return session.get(job_url + "/result", timeout=timeout).status_code
+        if status in ("failed", "cancelled"):
+            return 500
+        time.sleep(0.1)
+    return 504
+
+
+def run_level(base_url: str, endpoints: List[Endpoint], payload: bytes, concurrency: int,
+              duration: float, max_requests: Optional[int], timeout: float) -> Dict[str, Dict]:
+    """
+    Keep `concurrency` requests in flight for `duration` seconds (or until
+    max_requests have completed), cycling through the endpoints
+
+    Returns:
+        Per-endpoint latencies (seconds) and status codes
+    """
+    samples = defaultdict(lambda: {"latencies": [], "statuses": defaultdict(int)})
+    lock = threading.Lock()
+    cycle = itertools.cycle(endpoints)
+    issued = itertools.count()
+    stop_at = time.monotonic() + duration
+
+    def client():
+        while time.monotonic() < stop_at:
+            with lock:
+                if max_requests is not None and next(issued) >= max_requests:
+                    return
+                endpoint = next(cycle)
+            start = time.perf_counter()
+            try:
+                status = send(base_url, endpoint, payload, timeout)
+            except requests.RequestException:
+                status = 0
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[endpoint.name]["latencies"].append(elapsed)
+                samples[endpoint.name]["statuses"][status] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    wall = time.perf_counter() - started
+    return {name: {**result, "wall": wall} for name, result in samples.items()}
+
+
+def summarize(name: str, concurrency: int, result: Dict) -> Dict:
+    latencies = result["latencies"]
+    statuses = result["statuses"]
+    total = len(latencies)
+    ok = sum(count for status, count in statuses.items() if 200 <= status < 300)
+    return {
+        "endpoint": name,
+        "concurrency": concurrency,
+        "requests": total,
+        "rps": ok / result["wall"] if result["wall"] else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "error_pct": 100.0 * (total - ok) / total if total else 0.0,
+        "rejected_429": statuses.get(429, 0),
+        "statuses": dict(statuses),
+    }
+
+
+# ==================== SERVER ====================
+
+def spawn_server(app: str, port: int, fake: bool) -> subprocess.Popen:
+    """Start uvicorn for api.py or main_simple.py (with fake models unless disabled)"""
+    env = dict(os.environ)
+    if fake:
+        env["FAKE_MODELS"] = "True"
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", f"{app}:app", "--host", "127.0.0.1",
+                             "--port", str(port), "--log-level", "warning"],
+                            cwd=str(BACKEND_DIR), env=env)
+
+
+def wait_ready(base_url: str, app: str, timeout: float, server: Optional[subprocess.Popen]) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server exited with status {server.returncode}")
+        try:
+            if requests.get(base_url + READY_PATHS[app], timeout=5).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} not ready after {timeout:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", choices=list(ENDPOINTS), default="api", help="Server whose endpoints to drive")
+    parser.add_argument("--spawn", choices=list(ENDPOINTS), help="Start this server locally (implies --app)")
+    parser.add_argument("--real-models", action="store_true", help="With --spawn, do not set FAKE_MODELS")
+    parser.add_argument("--url", default=None, help="Base URL of a running server")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --spawn")
+    parser.add_argument("--endpoints", help="Comma-separated endpoint names (default: all)")
+    parser.add_argument("--mode", choices=("each", "mix"), default="each",
+                        help="'each' loads one endpoint at a time, 'mix' interleaves all of them")
+    parser.add_argument("--concurrency", default="1,4,16", help="Concurrency levels")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per level")
+    parser.add_argument("--requests", type=int, default=None, help="Stop a level after this many requests")
+    parser.add_argument("--size", default="1024x768", help="Upload size WxH")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--json", type=Path, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    app = args.spawn or args.app
+    endpoints = ENDPOINTS[app]
+    if args.endpoints:
+        wanted = args.endpoints.split(",")
+        unknown = set(wanted) - {endpoint.name for endpoint in endpoints}
+        if unknown:
+            parser.error(f"Unknown endpoints for {app}: {', '.join(sorted(unknown))}")
+        endpoints = [endpoint for endpoint in endpoints if endpoint.name in wanted]
+
+    server = spawn_server(app, args.port, not args.real_models) if args.spawn else None
+    base_url = (args.url or f"http://127.0.0.1:{args.port}").rstrip("/")
+    try:
+        wait_ready(base_url, app, timeout=600 if server else 10, server=server)
+        width, height = map(int, args.size.lower().split("x"))
+        payload = make_payload(width, height)
+
+        groups = [[endpoint] for endpoint in endpoints] if args.mode == "each" else [endpoints]
+        rows = []
+        for concurrency in map(int, args.concurrency.split(",")):
+            for group in groups:
+                results = run_level(base_url, group, payload, concurrency, args.duration,
+                                    args.requests, args.timeout)
+                for name, result in results.items():
+                    rows.append(summarize(name, concurrency, result))
+                    row = rows[-1]
+                    print(f"  {name} @ {concurrency}: {row['rps']:.2f} req/s, "
+                          f"p99 {row['p99_ms']:.0f} ms, errors {row['error_pct']:.1f}%")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print()
+    print_table(rows, ["endpoint", "concurrency", "requests", "rps", "p50_ms", "p95_ms", "p99_ms",
+                       "error_pct", "rejected_429"])
+    if args.json:
+        args.json.write_text(json.dumps({"app": app, "size": args.size, "mode": args.mode,
+                                         "results": rows}, indent=1) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Mask refinement benchmark and equivalence check for main_simple
+
+Compares main_simple.refine_mask (uint8 OpenCV morphology, box-approximated
+blur, histogram threshold) against the previous scipy implementation on
+synthetic U2Net-like outputs, and times both.
+
+Usage (from the backend directory):
+    python -m benchmarks.mask_refinement
+    python -m benchmarks.mask_refinement --sizes 1024x768,6000x4000 --seeds 10
+
+Exits non-zero when the refined masks stop matching the reference: IoU of
+alpha >= 128 below --min-iou, mean absolute difference above
+--max-mean-diff levels, or any single pixel differing by more than
+--max-diff levels. test_mask_refinement.py (repository root) checks the
+same bounds on a few seeds at one small size.
+"""
+
+import argparse
+import sys
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from main_simple import refine_mask
+from benchmarks.common import print_table, time_call
+
+
+def refine_mask_reference(mask: np.ndarray, orig_size: tuple) -> np.ndarray:
+    """The original scipy/PIL refinement chain from remove_background_simple"""
+    from scipy.ndimage import binary_fill_holes, binary_dilation, binary_opening, binary_closing, gaussian_filter
+
+    threshold = np.percentile(mask[mask > 0.1], 20)
+    threshold = max(0.15, min(threshold, 0.35))
+    mask = (mask > threshold).astype(np.float32)
+
+    mask_bool = mask > 0.5
+    mask_bool = binary_opening(mask_bool, iterations=1)
+    mask_bool = binary_fill_holes(mask_bool)
+    mask_bool = binary_closing(mask_bool, iterations=2)
+    mask_bool = binary_dilation(mask_bool, iterations=3)
+
+    mask = gaussian_filter(mask_bool.astype(np.float32), sigma=4)
+    mask = (mask * 255).astype(np.uint8)
+    return np.array(Image.fromarray(mask).resize(orig_size, Image.LANCZOS))
+
+
+def synthetic_model_output(seed: int, size: int = 320) -> np.ndarray:
+    """U2Net-like normalized output: a soft blob with holes and speckle noise"""
+    rng = np.random.default_rng(seed)
+    field = cv2.GaussianBlur(rng.standard_normal((size, size)).astype(np.float32), (0, 0), 18)
+    yy, xx = np.mgrid[0:size, 0:size].astype(np.float32)
+    blob = 1.0 - np.hypot((xx - size / 2) / (size * 0.32), (yy - size / 2) / (size * 0.4))
+    logits = 8 * blob + 40 * field + rng.normal(0, 0.8, (size, size))
+    out = 1.0 / (1.0 + np.exp(-logits))
+    return ((out - out.min()) / (out.max() - out.min())).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="640x480,1920x1080,6000x4000", help="Output sizes WxH")
+    parser.add_argument("--seeds", type=int, default=5, help="Synthetic masks per size")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--min-iou", type=float, default=0.99)
+    parser.add_argument("--max-mean-diff", type=float, default=2.0)
+    parser.add_argument("--max-diff", type=int, default=32,
+                        help="Largest per-pixel alpha difference allowed, in levels")
+    args = parser.parse_args()
+
+    rows, failed = [], False
+    for size in args.sizes.split(","):
+        w, h = map(int, size.lower().split("x"))
+        ious, mean_diffs, max_diffs = [], [], []
+        for seed in range(args.seeds):
+            mask = synthetic_model_output(seed)
+            expected = refine_mask_reference(mask, (w, h)).astype(np.int16)
+            actual = refine_mask(mask, (w, h)).astype(np.int16)
+
+            a, b = actual >= 128, expected >= 128
+            union = np.logical_or(a, b).sum()
+            ious.append(np.logical_and(a, b).sum() / union if union else 1.0)
+            diff = np.abs(actual - expected)
+            mean_diffs.append(diff.mean())
+            max_diffs.append(diff.max())
+
+        mask = synthetic_model_output(0)
+        before = time_call(lambda: refine_mask_reference(mask, (w, h)), repeat=args.repeat)
+        after = time_call(lambda: refine_mask(mask, (w, h)), repeat=args.repeat)
+
+        row = {
+            "size": size,
+            "reference_ms": before["median_ms"],
+            "refine_ms": after["median_ms"],
+            "speedup": before["median_ms"] / max(after["median_ms"], 1e-6),
+            "min_iou": float(min(ious)),
+            "mean_diff": float(max(mean_diffs)),
+            "max_diff": int(max(max_diffs)),
+        }
+        rows.append(row)
+        if (row["min_iou"] < args.min_iou or row["mean_diff"] > args.max_mean_diff
+                or row["max_diff"] > args.max_diff):
+            failed = True
+
+    print_table(rows, ["size", "reference_ms", "refine_ms", "speedup", "min_iou", "mean_diff", "max_diff"])
+    if failed:
+        print(f"\n✗ Refined masks diverge from the reference implementation (--min-iou {args.min_iou}, "
+              f"--max-mean-diff {args.max_mean_diff}, --max-diff {args.max_diff})")
+        sys.exit(1)
+    print("\n✓ Refined masks match the reference implementation")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Mask quality and cost of the U2Net model variants
+
+Runs every available variant (FP32 u2net, INT8 quantized, u2netp, silueta)
+over a set of images and compares each mask against the FP32 u2net mask:
+
+    iou          intersection over union of the binarized masks
+    boundary_f   F-score of boundary pixels matched within --tolerance pixels
+    latency_ms   median segmentation time per image
+    load_mb      RSS growth from loading the session
+    size_mb      model file size
+
+Usage (from the backend directory):
+    python -m benchmarks.mask_variants --images ../image
+    python -m benchmarks.mask_variants --variants u2net_int8,u2netp --min-iou 0.95
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from onnx_sessions import U2NET_VARIANTS, create_variant_session
+from warmup import synthetic_image
+from benchmarks.common import print_table, rss_bytes
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def load_images(directory: Path, limit: int) -> List[Image.Image]:
+    """Load evaluation images, falling back to synthetic ones"""
+    if directory is not None and directory.exists():
+        paths = sorted(p for p in directory.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)[:limit]
+        images = [Image.open(p).convert("RGB") for p in paths]
+        if images:
+            return images
+    print("No evaluation images found, using synthetic images")
+    return [synthetic_image(640 + 64 * i, 480 + 48 * i) for i in range(limit)]
+
+
+def mask_iou(mask: np.ndarray, reference: np.ndarray, threshold: int = 128) -> float:
+    """Intersection over union of two binarized uint8 masks"""
+    a = mask >= threshold
+    b = reference >= threshold
+    union = np.logical_or(a, b).sum()
+    if union == 0:
+        return 1.0
+    return float(np.logical_and(a, b).sum() / union)
+
+
+def boundary_f_score(mask: np.ndarray, reference: np.ndarray,
+                     tolerance: int = 3, threshold: int = 128) -> float:
+    """
+    Boundary F-score: precision/recall of boundary pixels within a pixel tolerance
+    """
+    kernel = np.ones((3, 3), np.uint8)
+    tol_kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * tolerance + 1, 2 * tolerance + 1))
+
+    a = (mask >= threshold).astype(np.uint8)
+    b = (reference >= threshold).astype(np.uint8)
+    boundary_a = cv2.morphologyEx(a, cv2.MORPH_GRADIENT, kernel) > 0
+    boundary_b = cv2.morphologyEx(b, cv2.MORPH_GRADIENT, kernel) > 0
+
+    if not boundary_a.any() and not boundary_b.any():
+        return 1.0
+    if not boundary_a.any() or not boundary_b.any():
+        return 0.0
+
+    near_a = cv2.dilate(boundary_a.astype(np.uint8), tol_kernel) > 0
+    near_b = cv2.dilate(boundary_b.astype(np.uint8), tol_kernel) > 0
+    precision = np.logical_and(boundary_a, near_b).sum() / boundary_a.sum()
+    recall = np.logical_and(boundary_b, near_a).sum() / boundary_b.sum()
+    if precision + recall == 0:
+        return 0.0
+    return float(2 * precision * recall / (precision + recall))
+
+
+def evaluate_variant(variant: str, images: List[Image.Image]) -> Dict:
+    """Load one variant and segment every image, returning masks and costs"""
+    rss_before = rss_bytes()
+    session = create_variant_session(variant)
+    load_mb = (rss_bytes() - rss_before) / (1024 * 1024)
+
+    session.predict(images[0])  # warm-up
+
+    masks, latencies = [], []
+    for image in images:
+        start = time.perf_counter()
+        mask = session.predict(image)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        masks.append(np.asarray(mask.convert("L")))
+
+    model_path = U2NET_VARIANTS[variant]["model_path"] or session.download_models()
+    return {
+        "masks": masks,
+        "latency_ms": statistics.median(latencies),
+        "load_mb": load_mb,
+        "size_mb": Path(model_path).stat().st_size / (1024 * 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=Path, default=None, help="Directory of evaluation images")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum images to evaluate")
+    parser.add_argument("--variants", default=",".join(U2NET_VARIANTS), help="Comma-separated variants")
+    parser.add_argument("--tolerance", type=int, default=3, help="Boundary match tolerance in pixels")
+    parser.add_argument("--min-iou", type=float, default=None,
+                        help="Exit non-zero if any variant's mean IoU falls below this")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.limit)
+    variants = [v for v in args.variants.split(",") if v]
+    if "u2net" not in variants:
+        variants.insert(0, "u2net")
+
+    results = {}
+    for variant in variants:
+        try:
+            results[variant] = evaluate_variant(variant, images)
+            print(f"✓ {variant}")
+        except (FileNotFoundError, ValueError) as e:
+            print(f"✗ {variant} skipped: {e}")
+
+    if "u2net" not in results:
+        print("FP32 u2net reference unavailable")
+        sys.exit(1)
+
+    reference = results["u2net"]["masks"]
+    rows, failed = [], False
+    for variant, result in results.items():
+        ious = [mask_iou(m, r) for m, r in zip(result["masks"], reference)]
+        f_scores = [boundary_f_score(m, r, args.tolerance) for m, r in zip(result["masks"], reference)]
+        row = {
+            "variant": variant,
+            "iou": float(np.mean(ious)),
+            "iou_min": float(np.min(ious)),
+            "boundary_f": float(np.mean(f_scores)),
+            "latency_ms": result["latency_ms"],
+            "load_mb": result["load_mb"],
+            "size_mb": result["size_mb"],
+        }
+        rows.append(row)
+        if args.min_iou is not None and row["iou"] < args.min_iou:
+            failed = True
+
+    print()
+    print_table(rows, ["variant", "iou", "iou_min", "boundary_f", "latency_ms", "load_mb", "size_mb"])
+    if failed:
+        print(f"\n✗ A variant fell below --min-iou {args.min_iou}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
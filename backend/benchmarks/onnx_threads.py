@@ -0,0 +1,89 @@
+"""
+ONNX Runtime thread-count sweep for the U2Net session
+
+Measures throughput and latency of U2Net inference for every combination of
+intra-op thread count and request concurrency. Each concurrency level shares
+one session between client threads, the way a worker process serves
+overlapping requests.
+
+Usage (from the backend directory):
+    python -m benchmarks.onnx_threads --model u2net.onnx --threads 1,2,4,8 --concurrency 1,2,4
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+
+from onnx_sessions import build_session_options, session_profile
+from benchmarks.common import percentile, print_table
+
+
+def run_sweep(model_path: Path, thread_counts, concurrency_levels, requests_per_level: int):
+    """Run the sweep and return one result row per (threads, concurrency) pair"""
+    rng = np.random.default_rng(0)
+    rows = []
+
+    for threads in thread_counts:
+        profile = session_profile()
+        profile.update(intra_op_threads=threads, allow_spinning=False)
+        session = ort.InferenceSession(str(model_path), build_session_options(profile),
+                                       providers=["CPUExecutionProvider"])
+        input_name = session.get_inputs()[0].name
+        batch = rng.standard_normal((1, 3, 320, 320)).astype(np.float32)
+        session.run(None, {input_name: batch})  # warm-up
+
+        for concurrency in concurrency_levels:
+            latencies = []
+
+            def infer(_):
+                start = time.perf_counter()
+                session.run(None, {input_name: batch})
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(infer, range(requests_per_level)))
+            elapsed = time.perf_counter() - start
+
+            rows.append({
+                "threads": threads,
+                "concurrency": concurrency,
+                "throughput_rps": requests_per_level / elapsed,
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+            })
+            print(f"threads={threads} concurrency={concurrency}: "
+                  f"{rows[-1]['throughput_rps']:.2f} req/s")
+
+    return rows
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    default_threads = sorted({1, 2, 4, cpu_count // 2 or 1, cpu_count})
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="u2net.onnx", help="Path to the U2Net ONNX model")
+    parser.add_argument("--threads", default=",".join(map(str, default_threads)),
+                        help="Comma-separated intra-op thread counts")
+    parser.add_argument("--concurrency", default="1,2,4", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=16, help="Requests per measurement")
+    args = parser.parse_args()
+
+    rows = run_sweep(
+        Path(args.model),
+        [int(t) for t in args.threads.split(",")],
+        [int(c) for c in args.concurrency.split(",")],
+        args.requests,
+    )
+    print()
+    print_table(rows, ["threads", "concurrency", "throughput_rps", "p50_ms", "p95_ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Real-ESRGAN CPU throughput benchmark
+
+Builds the x2 upsampler under several torch CPU profiles and reports
+images/sec and latency percentiles, plus PSNR of each output against the
+eager fp32 baseline (bf16 trades a little accuracy for speed).
+
+Usage (from the backend directory):
+    python -m benchmarks.realesrgan_cpu
+    python -m benchmarks.realesrgan_cpu --size 256x256 --images 8 --threads 2,4,8
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from api import create_upsampler
+from benchmarks.common import percentile, print_table, psnr, synthetic_rgb
+from torch_inference import bf16_supported, configure_threads, torch_profile
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "models", "RealESRGAN_x2plus.pth")
+
+CONFIGS = {
+    "inference_mode": {"channels_last": False, "compile": "none", "bf16": False},
+    "channels_last": {"channels_last": True, "compile": "none", "bf16": False},
+    "script": {"channels_last": True, "compile": "script", "bf16": False},
+    "compile": {"channels_last": True, "compile": "compile", "bf16": False},
+    "bf16": {"channels_last": True, "compile": "none", "bf16": True},
+}
+
+
+def run(upsampler, images):
+    """Enhance every image once; returns outputs and per-image latency in ms"""
+    outputs, samples = [], []
+    for img in images:
+        start = time.perf_counter()
+        output, _ = upsampler.enhance(img, outscale=2)
+        samples.append((time.perf_counter() - start) * 1000)
+        outputs.append(output)
+    return outputs, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="256x256", help="Input size WxH")
+    parser.add_argument("--images", type=int, default=8, help="Images per configuration")
+    parser.add_argument("--threads", default=None, help="Comma-separated thread counts (default: profile)")
+    parser.add_argument("--configs", default=",".join(CONFIGS), help="Profiles to run besides eager")
+    args = parser.parse_args()
+
+    w, h = map(int, args.size.lower().split("x"))
+    images = [synthetic_rgb(w, h, seed=i) for i in range(args.images)]
+    base_profile = torch_profile()
+    thread_counts = [int(t) for t in args.threads.split(",")] if args.threads else [base_profile["num_threads"]]
+
+    rows = []
+    for threads in thread_counts:
+        profile = dict(base_profile, num_threads=threads)
+        configure_threads(profile)
+
+        eager = create_upsampler(MODEL_PATH, optimize=False)
+        run(eager, images[:1])
+        baseline, samples = run(eager, images)
+        results = {"eager": (baseline, samples)}
+
+        for name in args.configs.split(","):
+            config = dict(profile, **CONFIGS[name])
+            if config["bf16"] and not bf16_supported():
+                print(f"Skipping {name}: CPU has no native bfloat16 support")
+                continue
+            upsampler = create_upsampler(MODEL_PATH, profile=config)
+            run(upsampler, images[:1])
+            results[name] = run(upsampler, images)
+
+        for name, (outputs, samples) in results.items():
+            rows.append({
+                "threads": threads,
+                "profile": name,
+                "images_per_s": len(samples) / (sum(samples) / 1000),
+                "p50_ms": percentile(samples, 50),
+                "p95_ms": percentile(samples, 95),
+                "psnr_vs_eager": float(np.mean([psnr(a, b) for a, b in zip(baseline, outputs)])),
+            })
+
+    print_table(rows, ["threads", "profile", "images_per_s", "p50_ms", "p95_ms", "psnr_vs_eager"])
+
+
+if __name__ == "__main__":
+    main()
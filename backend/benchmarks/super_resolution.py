@@ -0,0 +1,84 @@
+"""
+Super-resolution backend benchmark
+
+Downscales each test image 2x, restores it with every loaded backend and
+reports CPU latency plus PSNR/SSIM against the original. Bicubic resizing is
+included as the zero-cost baseline.
+
+Backends are loaded the way the API loads them (api.load_models), so drop
+models/ESPCN_x2.pb, models/FSRCNN_x2.pb, models/sr_x2.onnx or
+models/RealESRGAN_x2plus.pth in place to include them.
+
+Usage (from the backend directory):
+    python -m benchmarks.super_resolution
+    python -m benchmarks.super_resolution --images ../image --sizes 512x512
+"""
+
+import argparse
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import api
+from benchmarks.common import print_table, psnr, ssim, synthetic_rgb, time_call
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def load_inputs(images_dir, sizes):
+    """Real images from a directory (cropped to even sizes) or synthetic ones"""
+    if images_dir:
+        for path in sorted(Path(images_dir).rglob("*")):
+            if path.suffix.lower() in IMAGE_SUFFIXES:
+                rgb = np.array(Image.open(path).convert("RGB"))
+                h, w = rgb.shape[0] // 2 * 2, rgb.shape[1] // 2 * 2
+                yield path.name, rgb[:h, :w]
+        return
+    for size in sizes.split(","):
+        w, h = map(int, size.lower().split("x"))
+        yield size, synthetic_rgb(w, h)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="256x256,512x512", help="Original sizes WxH (synthetic inputs)")
+    parser.add_argument("--images", default=None, help="Directory of real test images")
+    parser.add_argument("--backends", default=None, help="Comma-separated subset of backends")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per input")
+    args = parser.parse_args()
+
+    api.load_models()
+    names = args.backends.split(",") if args.backends else list(api.sr_backends)
+    print(f"Backends: {', '.join(names)}")
+
+    rows = []
+    for label, original in load_inputs(args.images, args.sizes):
+        low = cv2.resize(original, (original.shape[1] // 2, original.shape[0] // 2),
+                         interpolation=cv2.INTER_AREA)
+        low_image = Image.fromarray(low, "RGB")
+        size = (original.shape[1], original.shape[0])
+
+        candidates = {"bicubic": lambda: cv2.resize(low, size, interpolation=cv2.INTER_CUBIC)}
+        for name in names:
+            backend = api.get_sr_backend(name)
+            candidates[name] = lambda backend=backend: np.array(backend.enhance(low_image))
+
+        for name, fn in candidates.items():
+            timing = time_call(fn, repeat=args.repeat)
+            restored = fn()
+            rows.append({
+                "input": label,
+                "backend": name,
+                "median_ms": timing["median_ms"],
+                "mp_per_s": original.shape[0] * original.shape[1] / 1e6 / max(timing["median_ms"] / 1000, 1e-9),
+                "psnr_db": psnr(original, restored),
+                "ssim": ssim(original, restored),
+            })
+
+    print_table(rows, ["input", "backend", "median_ms", "mp_per_s", "psnr_db", "ssim"])
+
+
+if __name__ == "__main__":
+    main()
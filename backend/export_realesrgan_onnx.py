@@ -0,0 +1,138 @@
+"""
+Real-ESRGAN ONNX Export Tool
+Converts RealESRGAN_x2plus.pth (RRDBNet) to ONNX so the enhancement path can
+run on onnxruntime without torch, basicsr or realesrgan installed.
+
+Usage (from the backend directory, in an environment that has torch):
+    python export_realesrgan_onnx.py
+    python export_realesrgan_onnx.py --verify
+
+--verify checks output parity against the torch model twice: raw model
+outputs on random tensors, then the full enhancement path (the onnxruntime
+backend against RealESRGANer) on synthetic images, including odd sizes that
+need padding. It exits with status 1 when either check falls outside
+tolerance.
+
+The API picks the exported model up automatically (REALESRGAN_RUNTIME=auto)
+or exclusively with REALESRGAN_RUNTIME=onnx.
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+from basicsr.archs.rrdbnet_arch import RRDBNet
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = Path(__file__).parent / "models"
+
+
+def load_rrdbnet(weights_path: Path) -> torch.nn.Module:
+    """Build the x2 RRDBNet and load the released weights"""
+    model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32, scale=2)
+    state = torch.load(str(weights_path), map_location="cpu")
+    key = "params_ema" if "params_ema" in state else "params"
+    model.load_state_dict(state[key], strict=True)
+    return model.eval()
+
+
+def export(model: torch.nn.Module, output_path: Path, opset: int) -> None:
+    """Export with dynamic batch/height/width axes"""
+    dummy = torch.rand(1, 3, 64, 64)
+    dynamic_axes = {
+        "input": {0: "batch", 2: "height", 3: "width"},
+        "output": {0: "batch", 2: "out_height", 3: "out_width"},
+    }
+    with torch.no_grad():
+        torch.onnx.export(model, dummy, str(output_path), opset_version=opset,
+                          input_names=["input"], output_names=["output"],
+                          dynamic_axes=dynamic_axes, do_constant_folding=True)
+
+
+def verify_model(model: torch.nn.Module, output_path: Path, atol: float) -> bool:
+    """Compare raw outputs of the torch and ONNX models on random inputs"""
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(str(output_path), providers=["CPUExecutionProvider"])
+    ok = True
+    for height, width in ((64, 64), (96, 128), (150, 202)):
+        x = torch.rand(1, 3, height, width)
+        with torch.no_grad():
+            expected = model(x).numpy()
+        actual = session.run(None, {"input": x.numpy()})[0]
+        max_diff = float(np.abs(expected - actual).max())
+        passed = max_diff <= atol
+        ok &= passed
+        logger.info(f"{'✓' if passed else '✗'} Model parity {width}x{height}: max abs diff {max_diff:.2e}")
+    return ok
+
+
+def verify_pipeline(weights_path: Path, output_path: Path, min_psnr: float) -> bool:
+    """Compare the onnxruntime backend with RealESRGANer on synthetic images"""
+    from realesrgan import RealESRGANer
+
+    from benchmarks.common import psnr, synthetic_rgb
+    from super_resolution import OnnxSRBackend, RealESRGANBackend
+
+    torch_backend = RealESRGANBackend(RealESRGANer(
+        scale=2, model_path=str(weights_path), model=load_rrdbnet(weights_path),
+        tile=0, tile_pad=10, pre_pad=0, half=False
+    ))
+    onnx_backend = OnnxSRBackend(output_path, tile_size=0, multiple=2, name="realesrgan")
+    # Tiled output differs at tile seams by design; reported, not enforced
+    tiled_backend = OnnxSRBackend(output_path, multiple=2, name="realesrgan")
+
+    ok = True
+    for width, height in ((128, 128), (301, 257), (640, 480)):
+        rgb = synthetic_rgb(width, height)
+        expected = torch_backend.upscale_rgb(rgb)
+        score = psnr(expected, onnx_backend.upscale_rgb(rgb))
+        tiled_score = psnr(expected, tiled_backend.upscale_rgb(rgb))
+        passed = score >= min_psnr
+        ok &= passed
+        logger.info(f"{'✓' if passed else '✗'} Pipeline parity {width}x{height}: PSNR {score:.1f} dB "
+                    f"(tiled: {tiled_score:.1f} dB)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", type=Path, default=MODEL_DIR / "RealESRGAN_x2plus.pth",
+                        help="Real-ESRGAN x2 weights")
+    parser.add_argument("--output", type=Path, default=MODEL_DIR / "RealESRGAN_x2plus.onnx",
+                        help="ONNX output path")
+    parser.add_argument("--opset", type=int, default=17, help="ONNX opset version")
+    parser.add_argument("--verify", action="store_true", help="Check parity against the torch model")
+    parser.add_argument("--atol", type=float, default=1e-3, help="Max abs diff for raw model outputs")
+    parser.add_argument("--min-psnr", type=float, default=45.0,
+                        help="Min PSNR (dB) between torch and onnxruntime enhancement outputs")
+    args = parser.parse_args()
+
+    if not args.weights.exists():
+        logger.error(f"Weights not found at {args.weights}")
+        logger.error("Download from: https://github.com/xinntao/Real-ESRGAN/releases/download/v0.2.1/RealESRGAN_x2plus.pth")
+        sys.exit(1)
+
+    model = load_rrdbnet(args.weights)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    logger.info(f"Exporting {args.weights.name} (opset {args.opset})...")
+    export(model, args.output, args.opset)
+    size_mb = args.output.stat().st_size / (1024 * 1024)
+    logger.info(f"✓ Wrote {args.output} ({size_mb:.1f} MB)")
+
+    if args.verify:
+        model_ok = verify_model(model, args.output, args.atol)
+        pipeline_ok = verify_pipeline(args.weights, args.output, args.min_psnr)
+        if not (model_ok and pipeline_ok):
+            logger.error("✗ Parity check failed")
+            sys.exit(1)
+        logger.info("✓ ONNX export matches the torch model")
+
+
+if __name__ == "__main__":
+    main()
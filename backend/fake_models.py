@@ -0,0 +1,113 @@
+"""
+Fake Model Backends
+Deterministic stand-ins for U2Net and Real-ESRGAN so the servers can be
+load-tested without model weights (FAKE_MODELS=True).
+
+The fakes return plausible outputs (an elliptical subject mask, a Lanczos 2x
+upscale) and spend a configurable amount of time per call. In 'compute' mode
+that time is spent in NumPy matrix products, which release the GIL and occupy
+a core the way onnxruntime/torch inference does, so thread pools, admission
+lanes and model locks behave as they would with real models. 'sleep' mode
+only waits, which isolates scheduling effects from CPU contention.
+"""
+
+import logging
+import threading
+import time
+from types import SimpleNamespace
+from typing import List
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from settings import env_flag, env_float, env_str
+
+logger = logging.getLogger(__name__)
+
+FAKE_MODELS = env_flag("FAKE_MODELS", False)
+# 'compute' (busy NumPy work) or 'sleep'
+FAKE_MODEL_MODE = env_str("FAKE_MODEL_MODE", "compute")
+# U2Net runs at a fixed 320x320, so its cost does not depend on the input size
+FAKE_U2NET_MS = env_float("FAKE_U2NET_MS", 350.0)
+# Real-ESRGAN cost scales with the input area
+FAKE_SR_MS_PER_MP = env_float("FAKE_SR_MS_PER_MP", 1500.0)
+
+_WORK = np.random.default_rng(0).standard_normal((192, 192)).astype(np.float32)
+
+
+def spend(milliseconds: float) -> None:
+    """Occupy the calling thread for about this long (see FAKE_MODEL_MODE)"""
+    deadline = time.perf_counter() + milliseconds / 1000.0
+    if FAKE_MODEL_MODE == "sleep":
+        time.sleep(max(0.0, deadline - time.perf_counter()))
+        return
+    while time.perf_counter() < deadline:
+        _WORK @ _WORK
+
+
+def subject_mask(width: int, height: int) -> np.ndarray:
+    """Soft-edged centred ellipse, the same for every input of a given size"""
+    mask = np.zeros((height, width), dtype=np.uint8)
+    cv2.ellipse(mask, (width // 2, height // 2), (max(1, width * 3 // 8), max(1, height * 5 // 12)),
+                0, 0, 360, 255, -1)
+    sigma = max(1.0, min(width, height) / 200.0)
+    return cv2.GaussianBlur(mask, (0, 0), sigma)
+
+
+class FakeRembgSession:
+    """rembg session stand-in (api.py): predict() returns a subject mask at image size"""
+
+    def __init__(self, model_name: str = "u2net"):
+        self.model_name = model_name
+
+    def predict(self, image: Image.Image, *args, **kwargs) -> List[Image.Image]:
+        spend(FAKE_U2NET_MS)
+        return [Image.fromarray(subject_mask(*image.size), "L")]
+
+
+class FakeOnnxSession:
+    """onnxruntime InferenceSession stand-in for U2Net (main_simple.py)"""
+
+    def __init__(self, model_path=None):
+        self.model_path = model_path
+        self._input = SimpleNamespace(name="input.1", shape=[1, 3, 320, 320], type="tensor(float)")
+
+    def get_inputs(self):
+        return [self._input]
+
+    def run(self, output_names, inputs):
+        batch = next(iter(inputs.values()))
+        height, width = batch.shape[2], batch.shape[3]
+        spend(FAKE_U2NET_MS)
+        mask = subject_mask(width, height).astype(np.float32) / 255.0
+        return [mask[np.newaxis, np.newaxis]]
+
+
+class FakeUpsampler:
+    """RealESRGANer stand-in: Lanczos 2x upscale, one call at a time like the real model"""
+
+    scale = 2
+    tile_size = 0
+
+    def __init__(self):
+        self.device = SimpleNamespace(type="cpu")
+        self._lock = threading.Lock()
+
+    def enhance(self, img: np.ndarray, outscale: float = 2):
+        height, width = img.shape[:2]
+        with self._lock:
+            spend(FAKE_SR_MS_PER_MP * width * height / 1e6)
+        out = cv2.resize(img, (int(width * outscale), int(height * outscale)),
+                         interpolation=cv2.INTER_LANCZOS4)
+        return out, None
+
+
+def describe() -> dict:
+    """Fake model settings (reported by /api/status)"""
+    return {
+        "enabled": FAKE_MODELS,
+        "mode": FAKE_MODEL_MODE,
+        "u2net_ms": FAKE_U2NET_MS,
+        "sr_ms_per_mp": FAKE_SR_MS_PER_MP,
+    }
@@ -12,11 +12,14 @@ from scipy.fft import fft2, ifft2, fftshift, ifftshift
 from typing import Tuple, Optional, Dict, List
 import logging
 
+from metrics import timed
+
 logger = logging.getLogger(__name__)
 
 
 # ==================== HISTOGRAM PROCESSING ====================
 
+@timed()
 def histogram_equalization(image: np.ndarray, method: str = 'global') -> np.ndarray:
     """
     Perform histogram equalization to enhance contrast
@@ -56,6 +59,7 @@ def histogram_equalization(image: np.ndarray, method: str = 'global') -> np.ndar
     return image
 
 
+@timed()
 def histogram_matching(source: np.ndarray, reference: np.ndarray) -> np.ndarray:
     """
     Match histogram of source image to reference image
@@ -99,6 +103,7 @@ def _match_histograms_1d(source: np.ndarray, reference: np.ndarray) -> np.ndarra
     return lookup[source]
 
 
+@timed()
 def adjust_brightness_contrast(image: np.ndarray, brightness: int = 0, 
                                contrast: float = 1.0) -> np.ndarray:
     """
@@ -116,6 +121,7 @@ def adjust_brightness_contrast(image: np.ndarray, brightness: int = 0,
     return adjusted
 
 
+@timed()
 def gamma_correction(image: np.ndarray, gamma: float = 1.0) -> np.ndarray:
     """
     Apply gamma correction for non-linear brightness adjustment
@@ -135,6 +141,7 @@ def gamma_correction(image: np.ndarray, gamma: float = 1.0) -> np.ndarray:
 
 # ==================== SPATIAL FILTERING ====================
 
+@timed()
 def apply_mean_filter(image: np.ndarray, kernel_size: int = 3) -> np.ndarray:
     """
     Apply mean filter for noise reduction (smoothing)
@@ -149,6 +156,7 @@ def apply_mean_filter(image: np.ndarray, kernel_size: int = 3) -> np.ndarray:
     return cv2.blur(image, (kernel_size, kernel_size))
 
 
+@timed()
 def apply_median_filter(image: np.ndarray, kernel_size: int = 3) -> np.ndarray:
     """
     Apply median filter for noise reduction (better for salt-and-pepper noise)
@@ -163,6 +171,7 @@ def apply_median_filter(image: np.ndarray, kernel_size: int = 3) -> np.ndarray:
     return cv2.medianBlur(image, kernel_size)
 
 
+@timed()
 def apply_gaussian_filter(image: np.ndarray, kernel_size: int = 5, 
                          sigma: float = 1.0) -> np.ndarray:
     """
@@ -179,6 +188,7 @@ def apply_gaussian_filter(image: np.ndarray, kernel_size: int = 5,
     return cv2.GaussianBlur(image, (kernel_size, kernel_size), sigma)
 
 
+@timed()
 def apply_bilateral_filter(image: np.ndarray, d: int = 9, 
                           sigma_color: float = 75, 
                           sigma_space: float = 75) -> np.ndarray:
@@ -197,6 +207,7 @@ def apply_bilateral_filter(image: np.ndarray, d: int = 9,
     return cv2.bilateralFilter(image, d, sigma_color, sigma_space)
 
 
+@timed()
 def apply_laplacian_sharpening(image: np.ndarray, strength: float = 1.0) -> np.ndarray:
     """
     Apply Laplacian sharpening to enhance edges
@@ -226,6 +237,7 @@ def apply_laplacian_sharpening(image: np.ndarray, strength: float = 1.0) -> np.n
         return np.clip(result, 0, 255).astype(np.uint8)
 
 
+@timed()
 def apply_unsharp_mask(image: np.ndarray, kernel_size: int = 5, 
                        sigma: float = 1.0, amount: float = 1.5, 
                        threshold: int = 0) -> np.ndarray:
@@ -252,6 +264,7 @@ def apply_unsharp_mask(image: np.ndarray, kernel_size: int = 5,
     return sharpened
 
 
+@timed()
 def apply_highpass_filter(image: np.ndarray, kernel_size: int = 3) -> np.ndarray:
     """
     Apply high-pass filter to enhance edges
@@ -323,6 +336,7 @@ def create_butterworth_lowpass(shape: Tuple[int, int], cutoff: float,
     return mask
 
 
+@timed()
 def apply_frequency_filter(image: np.ndarray, filter_type: str = 'lowpass',
                           cutoff: float = 30, order: int = 2,
                           low_cutoff: float = 20, 
@@ -392,6 +406,7 @@ def apply_frequency_filter(image: np.ndarray, filter_type: str = 'lowpass',
 
 # ==================== EDGE DETECTION ====================
 
+@timed()
 def detect_edges_sobel(image: np.ndarray, ksize: int = 3) -> np.ndarray:
     """
     Detect edges using Sobel operator
@@ -419,6 +434,7 @@ def detect_edges_sobel(image: np.ndarray, ksize: int = 3) -> np.ndarray:
     return magnitude
 
 
+@timed()
 def detect_edges_prewitt(image: np.ndarray) -> np.ndarray:
     """
     Detect edges using Prewitt operator
@@ -449,6 +465,7 @@ def detect_edges_prewitt(image: np.ndarray) -> np.ndarray:
     return magnitude
 
 
+@timed()
 def detect_edges_canny(image: np.ndarray, threshold1: int = 50, 
                        threshold2: int = 150, aperture_size: int = 3) -> np.ndarray:
     """
@@ -472,6 +489,7 @@ def detect_edges_canny(image: np.ndarray, threshold1: int = 50,
     return edges
 
 
+@timed()
 def detect_edges_laplacian(image: np.ndarray, ksize: int = 3) -> np.ndarray:
     """
     Detect edges using Laplacian operator
@@ -494,6 +512,7 @@ def detect_edges_laplacian(image: np.ndarray, ksize: int = 3) -> np.ndarray:
     return laplacian
 
 
+@timed()
 def compare_edge_detectors(image: np.ndarray) -> Dict[str, np.ndarray]:
     """
     Compare different edge detection methods
@@ -514,6 +533,7 @@ def compare_edge_detectors(image: np.ndarray) -> Dict[str, np.ndarray]:
 
 # ==================== IMAGE SEGMENTATION ====================
 
+@timed()
 def segment_otsu_threshold(image: np.ndarray) -> Tuple[np.ndarray, int]:
     """
     Segment image using Otsu's thresholding method
@@ -536,6 +556,7 @@ def segment_otsu_threshold(image: np.ndarray) -> Tuple[np.ndarray, int]:
     return binary, int(threshold_value)
 
 
+@timed()
 def segment_adaptive_threshold(image: np.ndarray, method: str = 'gaussian',
                                block_size: int = 11, C: int = 2) -> np.ndarray:
     """
@@ -563,6 +584,7 @@ def segment_adaptive_threshold(image: np.ndarray, method: str = 'gaussian',
     return binary
 
 
+@timed()
 def segment_region_growing(image: np.ndarray, seed_point: Tuple[int, int],
                           threshold: int = 10) -> np.ndarray:
     """
@@ -601,6 +623,7 @@ def segment_region_growing(image: np.ndarray, seed_point: Tuple[int, int],
     return segmented
 
 
+@timed()
 def segment_watershed(image: np.ndarray) -> np.ndarray:
     """
     Segment image using watershed algorithm
@@ -647,6 +670,7 @@ def segment_watershed(image: np.ndarray) -> np.ndarray:
     return result
 
 
+@timed()
 def segment_color_based(image: np.ndarray, color_space: str = 'hsv',
                         lower_bound: Tuple = None, 
                         upper_bound: Tuple = None) -> np.ndarray:
@@ -683,6 +707,7 @@ def segment_color_based(image: np.ndarray, color_space: str = 'hsv',
     return mask
 
 
+@timed()
 def segment_kmeans(image: np.ndarray, k: int = 3) -> np.ndarray:
     """
     Segment image using K-means clustering
@@ -713,6 +738,7 @@ def segment_kmeans(image: np.ndarray, k: int = 3) -> np.ndarray:
 
 # ==================== MORPHOLOGICAL OPERATIONS ====================
 
+@timed()
 def morphology_dilate(image: np.ndarray, kernel_size: int = 5, 
                      iterations: int = 1) -> np.ndarray:
     """
@@ -732,6 +758,7 @@ def morphology_dilate(image: np.ndarray, kernel_size: int = 5,
     return dilated
 
 
+@timed()
 def morphology_erode(image: np.ndarray, kernel_size: int = 5,
                     iterations: int = 1) -> np.ndarray:
     """
@@ -751,6 +778,7 @@ def morphology_erode(image: np.ndarray, kernel_size: int = 5,
     return eroded
 
 
+@timed()
 def morphology_opening(image: np.ndarray, kernel_size: int = 5) -> np.ndarray:
     """
     Apply morphological opening (erosion followed by dilation)
@@ -769,6 +797,7 @@ def morphology_opening(image: np.ndarray, kernel_size: int = 5) -> np.ndarray:
     return opened
 
 
+@timed()
 def morphology_closing(image: np.ndarray, kernel_size: int = 5) -> np.ndarray:
     """
     Apply morphological closing (dilation followed by erosion)
@@ -787,6 +816,7 @@ def morphology_closing(image: np.ndarray, kernel_size: int = 5) -> np.ndarray:
     return closed
 
 
+@timed()
 def morphology_gradient(image: np.ndarray, kernel_size: int = 5) -> np.ndarray:
     """
     Apply morphological gradient (dilation - erosion)
@@ -805,6 +835,7 @@ def morphology_gradient(image: np.ndarray, kernel_size: int = 5) -> np.ndarray:
     return gradient
 
 
+@timed()
 def morphology_tophat(image: np.ndarray, kernel_size: int = 9) -> np.ndarray:
     """
     Apply morphological top-hat transform
@@ -823,6 +854,7 @@ def morphology_tophat(image: np.ndarray, kernel_size: int = 9) -> np.ndarray:
     return tophat
 
 
+@timed()
 def morphology_blackhat(image: np.ndarray, kernel_size: int = 9) -> np.ndarray:
     """
     Apply morphological black-hat transform
@@ -841,6 +873,7 @@ def morphology_blackhat(image: np.ndarray, kernel_size: int = 9) -> np.ndarray:
     return blackhat
 
 
+@timed()
 def apply_morphological_operations(image: np.ndarray, 
                                   operations: List[Dict]) -> np.ndarray:
     """
@@ -876,3 +909,83 @@ def apply_morphological_operations(image: np.ndarray,
             result = morphology_blackhat(result, kernel_size)
     
     return result
+
+
+# ==================== ALPHA-AWARE ROI PROCESSING ====================
+
+def alpha_bbox(alpha: np.ndarray, padding: int = 0) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Bounding box of the non-transparent pixels of an alpha channel
+    
+    Args:
+        alpha: Alpha channel (2D)
+        padding: Padding added on every side, clipped to the image
+        
+    Returns:
+        (left, top, right, bottom) with exclusive right/bottom, or None if
+        the image is fully transparent
+    """
+    rows = np.any(alpha > 0, axis=1)
+    cols = np.any(alpha > 0, axis=0)
+    
+    if not rows.any() or not cols.any():
+        return None
+    
+    top, bottom = np.where(rows)[0][[0, -1]]
+    left, right = np.where(cols)[0][[0, -1]]
+    
+    h, w = alpha.shape
+    return (max(0, int(left) - padding), max(0, int(top) - padding),
+            min(w, int(right) + 1 + padding), min(h, int(bottom) + 1 + padding))
+
+
+def process_alpha_roi(image: np.ndarray, fn, padding: int = 16, scale: int = 1,
+                      max_fraction: float = 0.9) -> np.ndarray:
+    """
+    Run an expensive operation only on the subject's bounding box
+    
+    The RGBA image is cropped to its alpha bounding box (plus padding so
+    filters see real neighbours at the crop edge), fn runs on the crop, and
+    the result is pasted back into a full-size canvas. Pixels outside the
+    box are fully transparent, so for purely local filters (smoothing,
+    sharpening, alpha morphology) the visible result is unchanged. Stages
+    that use global statistics see only the crop: percentile stretches
+    and contrast means come from the subject region, and CLAHE tiles
+    cover the crop rather than the frame, so their output differs from a
+    whole-frame run.
+    
+    Args:
+        image: RGBA uint8 array
+        fn: Callable taking an RGBA crop and returning it processed,
+            scaled by `scale` in both dimensions
+        padding: Context pixels kept around the subject
+        scale: Output scale factor of fn (e.g. 2 for 2x upscaling)
+        max_fraction: Run fn on the whole image when the box covers more
+            than this fraction of it
+        
+    Returns:
+        Processed RGBA array of size (h * scale, w * scale)
+    """
+    h, w = image.shape[:2]
+    bbox = alpha_bbox(image[:, :, 3], padding)
+    
+    if bbox is None:
+        # Nothing visible: keep the input (RGB included) at 1x, and only
+        # zero-fill a scaled canvas
+        if scale == 1:
+            return image.copy()
+        return np.zeros((h * scale, w * scale, image.shape[2]), dtype=image.dtype)
+    
+    left, top, right, bottom = bbox
+    if (right - left) * (bottom - top) > max_fraction * w * h:
+        return fn(image)
+    
+    result = fn(image[top:bottom, left:right].copy())
+    
+    if scale == 1:
+        canvas = image.copy()
+    else:
+        canvas = np.zeros((h * scale, w * scale, result.shape[2]), dtype=result.dtype)
+    canvas[top * scale:top * scale + result.shape[0],
+           left * scale:left * scale + result.shape[1]] = result
+    return canvas
@@ -0,0 +1,293 @@
+"""
+Background Job Queue
+In-process scheduler for long-running processing (Real-ESRGAN enhancement,
+alpha matting) so clients can submit work, poll or stream its status, and
+fetch the result later instead of holding an HTTP request open.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import QUEUE_WAIT_SECONDS, request_context
+from settings import env_int, env_list
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+JOB_WORKERS = env_int("JOB_WORKERS", 2)
+JOB_RESULT_TTL = env_int("JOB_RESULT_TTL", 600)
+JOB_MAX_QUEUED = env_int("JOB_MAX_QUEUED", 100)
+
+
+def parse_concurrency(items: List[str]) -> Dict[str, int]:
+    """Parse "type=limit" entries (e.g. JOB_CONCURRENCY=process=1,process-advanced=2)"""
+    limits = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        try:
+            limits[name.strip()] = max(1, int(value))
+        except ValueError:
+            continue
+    return limits
+
+
+JOB_CONCURRENCY = parse_concurrency(env_list("JOB_CONCURRENCY", ["process=1", "process-advanced=1"]))
+
+
+class JobQueueFull(Exception):
+    """Raised when JOB_MAX_QUEUED jobs are already waiting"""
+
+
+class JobCancelled(Exception):
+    """Raised by Job.checkpoint() once the job has been cancelled"""
+
+
+@dataclass
+class Job:
+    """A submitted unit of work and its outcome"""
+
+    id: str
+    type: str
+    priority: int
+    fn: Callable[["Job"], Tuple[bytes, str]]
+    filename: Optional[str] = None
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[bytes] = None
+    media_type: Optional[str] = None
+    cancel_requested: bool = False
+    seq: int = 0        # submission order, breaks priority ties
+    version: int = 0    # bumped on every state change (SSE streams watch it)
+
+    def checkpoint(self) -> None:
+        """Called by job functions between stages; stops a cancelled job"""
+        if self.cancel_requested:
+            raise JobCancelled(self.id)
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "type": self.type,
+            "priority": self.priority,
+            "status": self.status,
+            "filename": self.filename,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_seconds": round((self.started_at or time.time()) - self.created_at, 3),
+            "run_seconds": round(self.finished_at - self.started_at, 3)
+            if self.started_at and self.finished_at else None,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    Priority scheduler with bounded concurrency per job type
+
+    Higher priority runs first, FIFO within a priority. A worker takes the
+    first queued job whose type is below its concurrency limit, so a backlog
+    of one type never blocks another. Finished jobs keep their result for
+    JOB_RESULT_TTL seconds.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, concurrency: Optional[Dict[str, int]] = None,
+                 result_ttl: int = JOB_RESULT_TTL, max_queued: int = JOB_MAX_QUEUED):
+        self.workers = max(1, workers)
+        self.concurrency = dict(concurrency or JOB_CONCURRENCY)
+        self.result_ttl = result_ttl
+        self.max_queued = max_queued
+
+        self._jobs: Dict[str, Job] = {}
+        self._heap: List[Tuple[int, int, str]] = []
+        self._running: Dict[str, int] = {}
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+
+    # ---------- lifecycle ----------
+
+    def start(self) -> None:
+        """Start the worker threads"""
+        self._stopping = False
+        for idx in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{idx}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"✓ Job queue started ({self.workers} workers, limits {self.concurrency})")
+
+    def stop(self) -> None:
+        """Stop the workers after their current job"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    # ---------- public API ----------
+
+    def submit(self, job_type: str, fn: Callable[[Job], Tuple[bytes, str]],
+               priority: int = 0, filename: Optional[str] = None) -> Job:
+        """
+        Queue a job
+
+        Args:
+            job_type: Type used for the concurrency limit
+            fn: Callable receiving the Job and returning (content, media_type);
+                it should call job.checkpoint() between stages
+            priority: Higher runs first
+            filename: Original upload name, reported in the status
+
+        Returns:
+            The queued Job
+
+        Raises:
+            JobQueueFull: When max_queued jobs are already waiting
+        """
+        with self._cond:
+            self._purge_expired()
+            if self.queued_count() >= self.max_queued:
+                raise JobQueueFull(f"{self.max_queued} jobs already queued")
+
+            job = Job(id=uuid.uuid4().hex, type=job_type, priority=priority, fn=fn,
+                      filename=filename, seq=next(self._counter))
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (-priority, job.seq, job.id))
+            self._cond.notify_all()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job (None if unknown or expired)"""
+        with self._cond:
+            self._purge_expired()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a job
+
+        Queued jobs are dropped immediately and never run. Running jobs are
+        flagged; the job function stops at its next job.checkpoint() and
+        any result is discarded.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in TERMINAL_STATES:
+                return job
+            job.cancel_requested = True
+            if job.status == QUEUED:
+                self._finish(job, CANCELLED)
+            return job
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Number of queued jobs scheduled ahead of this one (None if not queued)"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return None
+            key = (-job.priority, job.seq)
+            return sum(1 for other in self._jobs.values()
+                       if other.status == QUEUED and (-other.priority, other.seq) < key)
+
+    def queued_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    def stats(self) -> Dict:
+        """Queue depth and running jobs per type (reported by /api/status)"""
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "concurrency": self.concurrency,
+                "queued": self.queued_count(),
+                "running": dict(self._running),
+                "stored": len(self._jobs),
+            }
+
+    # ---------- internals ----------
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished_at = time.time()
+        job.fn = None
+        job.version += 1
+        self._cond.notify_all()
+
+    def _purge_expired(self) -> None:
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.status in TERMINAL_STATES and now - job.finished_at > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _next_runnable(self) -> Optional[Job]:
+        """Pop the highest-priority queued job whose type has a free slot"""
+        skipped = []
+        job = None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            candidate = self._jobs.get(entry[2])
+            if candidate is None or candidate.status != QUEUED:
+                continue    # cancelled or expired: drop the stale heap entry
+            limit = self.concurrency.get(candidate.type, self.workers)
+            if self._running.get(candidate.type, 0) < limit:
+                job = candidate
+                break
+            skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(self._heap, entry)
+        return job
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopping:
+                    job = self._next_runnable()
+                    if job is not None:
+                        break
+                    self._purge_expired()
+                    self._cond.wait(timeout=30)
+                if job is None:
+                    return
+                job.status = RUNNING
+                job.started_at = time.time()
+                job.version += 1
+                self._running[job.type] = self._running.get(job.type, 0) + 1
+
+            QUEUE_WAIT_SECONDS.observe(job.started_at - job.created_at, queue=f"job:{job.type}")
+            status, result, media_type, error = SUCCEEDED, None, None, None
+            try:
+                with request_context(f"job:{job.type}"):
+                    result, media_type = job.fn(job)
+            except JobCancelled:
+                status = CANCELLED
+            except Exception as e:
+                logger.error(f"Job {job.id} ({job.type}) failed: {str(e)}")
+                status, error = FAILED, str(e)
+
+            with self._cond:
+                self._running[job.type] -= 1
+                if job.cancel_requested:
+                    status, result = CANCELLED, None
+                job.result, job.media_type, job.error = result, media_type, error
+                self._finish(job, status)
+            if status == SUCCEEDED:
+                logger.info(f"✓ Job {job.id} ({job.type}) done in {job.finished_at - job.started_at:.2f}s")
@@ -5,11 +5,18 @@ from PIL import Image
 import io
 import logging
 import numpy as np
-import onnxruntime as ort
+import cv2
 from typing import Optional
 import requests
 from pathlib import Path
 
+from fake_models import FAKE_MODELS, FakeOnnxSession
+from fake_models import describe as describe_fake_models
+from onnx_sessions import create_inference_session, session_profile
+from image_processing import process_alpha_roi
+from settings import env_flag, env_int, env_str
+from warmup import WARMUP_ENABLED, run_warmup
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -33,14 +40,31 @@ app.add_middleware(
 MODEL_PATH = Path("u2net.onnx")
 MODEL_URL = "https://github.com/danielgatis/rembg/releases/download/v0.0.0/u2net.onnx"
 
-def download_model():
+# Model variants: (path, download URL). Quantized variants have no URL and are
+# produced locally with quantize_u2net.py.
+MODEL_VARIANTS = {
+    "u2net": (MODEL_PATH, MODEL_URL),
+    "u2net_int8": (Path("models/u2net_int8.onnx"), None),
+    "u2net_int8_static": (Path("models/u2net_int8_static.onnx"), None),
+    "u2netp": (Path("u2netp.onnx"), "https://github.com/danielgatis/rembg/releases/download/v0.0.0/u2netp.onnx"),
+    "silueta": (Path("silueta.onnx"), "https://github.com/danielgatis/rembg/releases/download/v0.0.0/silueta.onnx"),
+}
+MODEL_VARIANT = env_str("U2NET_MODEL", "u2net")
+
+# Alpha-aware processing: finish only the subject's bounding box
+ROI_PROCESSING = env_flag("ROI_PROCESSING", True)
+ROI_PADDING = env_int("ROI_PADDING", 16)
+
+def download_model(model_path: Path = MODEL_PATH, model_url: Optional[str] = MODEL_URL):
     """Download U2Net model if not exists"""
-    if not MODEL_PATH.exists():
-        logger.info("Downloading U2Net model...")
-        response = requests.get(MODEL_URL, stream=True)
+    if not model_path.exists():
+        if model_url is None:
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+        logger.info(f"Downloading {model_path.name} model...")
+        response = requests.get(model_url, stream=True)
         total = int(response.headers.get('content-length', 0))
         
-        with open(MODEL_PATH, 'wb') as f:
+        with open(model_path, 'wb') as f:
             downloaded = 0
             for chunk in response.iter_content(chunk_size=8192):
                 f.write(chunk)
@@ -54,16 +78,43 @@ def download_model():
 
 # Global session
 ort_session = None
+ort_sessions = {}
+warmup_timings = {}
+
+def get_session(model: Optional[str] = None):
+    """Get the ONNX session for a model variant, downloading and loading it on first use"""
+    name = model or MODEL_VARIANT
+    if name not in MODEL_VARIANTS:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown model '{name}'. Available: {', '.join(MODEL_VARIANTS)}")
+    
+    if name not in ort_sessions:
+        model_path, model_url = MODEL_VARIANTS[name]
+        if FAKE_MODELS:
+            ort_sessions[name] = FakeOnnxSession(model_path)
+            logger.warning(f"FAKE_MODELS is set: using a stand-in for {name} (load testing only)")
+            return ort_sessions[name]
+        try:
+            download_model(model_path, model_url)
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        ort_sessions[name] = create_inference_session(model_path)
+        logger.info(f"Model variant loaded: {name}")
+    return ort_sessions[name]
 
 @app.on_event("startup")
 async def startup_event():
     """Load model on startup"""
-    global ort_session
+    global ort_session, warmup_timings
     try:
-        download_model()
-        logger.info("Loading ONNX model...")
-        ort_session = ort.InferenceSession(str(MODEL_PATH))
+        logger.info(f"Loading ONNX model ({MODEL_VARIANT})...")
+        ort_session = get_session(MODEL_VARIANT)
         logger.info("Model loaded successfully!")
+        
+        # Run synthetic inputs through U2Net before serving requests
+        if WARMUP_ENABLED:
+            logger.info("Warming up model...")
+            warmup_timings = run_warmup({"u2net": (remove_background_simple, None)})
     except Exception as e:
         logger.error(f"Error loading model: {e}")
 
@@ -73,8 +124,92 @@ def normalize(img, mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225)):
     img = (img - mean) / std
     return img.astype(np.float32)
 
-def remove_background_simple(image: Image.Image) -> Image.Image:
+# Morphology structuring element matching scipy.ndimage's default (4-connected cross)
+CROSS_KERNEL = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+
+def select_threshold(mask_u8: np.ndarray) -> int:
+    """
+    Pick the binarization level from the mask histogram
+    
+    Equivalent to the 20th percentile of mask values above 0.1, clamped to
+    0.15-0.35, but computed from a 256-bin histogram instead of sorting a
+    filtered copy of the mask.
+    """
+    hist = np.bincount(mask_u8.ravel(), minlength=256)
+    hist[:26] = 0  # values <= 0.1
+    total = hist.sum()
+    if total == 0:
+        return 38
+    level = int(np.searchsorted(np.cumsum(hist), 0.2 * total))
+    return max(38, min(level, 89))  # Clamp between 0.15-0.35
+
+def box_sizes_for_gaussian(sigma: float, passes: int = 3) -> list:
+    """Box filter widths whose repeated application approximates a Gaussian of sigma"""
+    ideal = np.sqrt(12 * sigma * sigma / passes + 1)
+    lower = int(np.floor(ideal))
+    if lower % 2 == 0:
+        lower -= 1
+    upper = lower + 2
+    num_lower = int(round((12 * sigma * sigma - passes * lower * lower - 4 * passes * lower - 3 * passes)
+                          / (-4 * lower - 4)))
+    return [lower if i < num_lower else upper for i in range(passes)]
+
+GAUSSIAN_BOXES = box_sizes_for_gaussian(4)
+
+def fill_holes(mask: np.ndarray) -> np.ndarray:
+    """Fill background regions not connected to the image border (binary_fill_holes)"""
+    h, w = mask.shape
+    padded = np.zeros((h + 2, w + 2), np.uint8)
+    padded[1:-1, 1:-1] = mask
+    flood_mask = np.zeros((h + 4, w + 4), np.uint8)
+    cv2.floodFill(padded, flood_mask, (0, 0), 255, flags=4)
+    # Background reachable from the border is marked in flood_mask;
+    # everything it did not reach is either foreground or an enclosed hole
+    reached = flood_mask[2:-2, 2:-2]
+    return np.where(reached, 0, 255).astype(np.uint8)
+
+def refine_mask(mask: np.ndarray, orig_size: tuple) -> np.ndarray:
+    """
+    Turn the normalized U2Net output into a smooth uint8 alpha mask
+    
+    Args:
+        mask: Model output normalized to 0-1 (model resolution)
+        orig_size: (width, height) of the original image
+        
+    Returns:
+        uint8 alpha mask at the original size
+    """
+    mask_u8 = (mask * 255 + 0.5).astype(np.uint8)
+    
+    # Use dynamic threshold based on percentile for better object detection
+    _, binary = cv2.threshold(mask_u8, select_threshold(mask_u8), 255, cv2.THRESH_BINARY)
+    
+    morph = dict(borderType=cv2.BORDER_CONSTANT, borderValue=0)
+    
+    # Opening: remove small noise
+    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, CROSS_KERNEL, **morph)
+    
+    # Fill holes in the main object
+    binary = fill_holes(binary)
+    
+    # Closing: smooth the boundary
+    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, CROSS_KERNEL, iterations=2, **morph)
+    
+    # Dilate to ensure we keep all object edges (especially important for furniture)
+    binary = cv2.dilate(binary, CROSS_KERNEL, iterations=3, **morph)
+    
+    # Smooth edges: three box passes approximate gaussian_filter(sigma=4)
+    for size in GAUSSIAN_BOXES:
+        binary = cv2.blur(binary, (size, size), borderType=cv2.BORDER_REFLECT)
+    
+    # Resize mask back to original size (already smooth, so bilinear is enough)
+    interpolation = cv2.INTER_LINEAR if orig_size[0] >= binary.shape[1] else cv2.INTER_AREA
+    return cv2.resize(binary, orig_size, interpolation=interpolation)
+
+def remove_background_simple(image: Image.Image, session=None) -> Image.Image:
     """Remove background using U2Net - high quality like professional tools"""
+    session = session or ort_session
+    
     # Store original size
     orig_size = image.size
     
@@ -96,8 +231,8 @@ def remove_background_simple(image: Image.Image) -> Image.Image:
     img_array = np.expand_dims(img_array, 0)
     
     # Run model
-    ort_inputs = {ort_session.get_inputs()[0].name: img_array}
-    ort_outs = ort_session.run(None, ort_inputs)
+    ort_inputs = {session.get_inputs()[0].name: img_array}
+    ort_outs = session.run(None, ort_inputs)
     
     # Get mask - U2Net outputs the main object
     mask = ort_outs[0][0][0]
@@ -107,52 +242,91 @@ def remove_background_simple(image: Image.Image) -> Image.Image:
     if mask_max > mask_min:
         mask = (mask - mask_min) / (mask_max - mask_min)
     
-    # Use dynamic threshold based on percentile for better object detection
-    threshold = np.percentile(mask[mask > 0.1], 20)  # Keep more detail
-    threshold = max(0.15, min(threshold, 0.35))  # Clamp between 0.15-0.35
+    # Threshold, clean up and smooth the mask at model resolution, then upsample
+    mask_img = Image.fromarray(refine_mask(mask, orig_size))
     
-    # Create binary mask
-    mask = (mask > threshold).astype(np.float32)
+    # Create RGBA image with transparent background
+    if image.mode == 'RGBA':
+        result = image.copy()
+    else:
+        result = image_rgb.convert('RGBA')
     
-    # Advanced morphological operations for clean edges
-    from scipy.ndimage import binary_fill_holes, binary_dilation, binary_opening, binary_closing, gaussian_filter
+    # Apply mask as alpha channel (this makes removed areas transparent)
+    result.putalpha(mask_img)
     
-    mask_bool = mask > 0.5
+    return result
+
+# PIL's ImageFilter.SMOOTH kernel, used by ImageEnhance.Sharpness as the degenerate image
+SMOOTH_KERNEL = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=np.float32) / 13.0
+
+def stretch_gamma_lut(channel_hist: np.ndarray, gamma: float = 0.95) -> np.ndarray:
+    """Lookup table combining a 2-98 percentile stretch with gamma correction"""
+    cdf = np.cumsum(channel_hist)
+    total = cdf[-1]
+    p2 = int(np.searchsorted(cdf, 0.02 * total))
+    p98 = int(np.searchsorted(cdf, 0.98 * total))
     
-    # Opening: remove small noise
-    mask_bool = binary_opening(mask_bool, iterations=1)
+    levels = np.arange(256, dtype=np.float32) / 255.0
+    if p98 > p2:
+        levels = np.clip((levels - p2 / 255.0) / ((p98 - p2) / 255.0), 0, 1)
+    return (np.power(levels, gamma) * 255).astype(np.uint8)
+
+def finish_rgb(rgb: np.ndarray) -> np.ndarray:
+    """
+    Professional finishing chain for a cutout, as one fused uint8 stage
     
-    # Fill holes in the main object
-    mask_bool = binary_fill_holes(mask_bool)
+    Median denoise, light Gaussian smoothing, unsharp masking, per-channel
+    2-98 percentile stretch with gamma 0.95, then the PIL-equivalent
+    Sharpness (1.3), Color (1.15) and Contrast (1.08) enhancements. The
+    stretch and gamma are folded into one LUT per channel and every stage
+    writes into one of two reusable buffers.
     
-    # Closing: smooth the boundary
-    mask_bool = binary_closing(mask_bool, iterations=2)
+    Args:
+        rgb: uint8 RGB array, modified in place (may be a view of an RGBA array)
+        
+    Returns:
+        The same array
+    """
+    work = np.ascontiguousarray(rgb)
+    scratch = np.empty_like(work)
     
-    # Dilate to ensure we keep all object edges (especially important for furniture)
-    mask_bool = binary_dilation(mask_bool, iterations=3)
+    # 1. Median filter for salt & pepper noise removal (all channels at once)
+    cv2.medianBlur(work, 3, dst=scratch)
     
-    # Convert back to float for smoothing
-    mask = mask_bool.astype(np.float32)
+    # 2. Light Gaussian smoothing
+    cv2.GaussianBlur(scratch, (0, 0), 0.8, dst=work)
     
-    # Apply stronger Gaussian blur for very smooth edges (professional quality)
-    mask = gaussian_filter(mask, sigma=4)
+    # 3. Unsharp masking: img + 2.5 * (img - blur(img, sigma=2)), saturating
+    cv2.GaussianBlur(work, (0, 0), 2.0, dst=scratch)
+    cv2.addWeighted(work, 3.5, scratch, -2.5, 0, dst=work)
     
-    # Convert to 0-255 range
-    mask = (mask * 255).astype(np.uint8)
+    # 4 + 5. Histogram stretch and gamma as one LUT per channel
+    luts = [stretch_gamma_lut(cv2.calcHist([work], [c], None, [256], [0, 256]).ravel())
+            for c in range(3)]
+    cv2.LUT(work, np.stack(luts, axis=-1).reshape(256, 1, 3), dst=work)
     
-    # Resize mask back to original size with highest quality interpolation
-    mask_img = Image.fromarray(mask).resize(orig_size, Image.LANCZOS)
+    # 6. Sharpness: blend with PIL's SMOOTH-filtered image
+    cv2.filter2D(work, -1, SMOOTH_KERNEL, dst=scratch, borderType=cv2.BORDER_REPLICATE)
+    cv2.addWeighted(work, 1.3, scratch, -0.3, 0, dst=work)
     
-    # Create RGBA image with transparent background
-    if image.mode == 'RGBA':
-        result = image.copy()
-    else:
-        result = image_rgb.convert('RGBA')
+    # 7. Color: blend with the grayscale image
+    gray = cv2.cvtColor(work, cv2.COLOR_RGB2GRAY)
+    cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB, dst=scratch)
+    cv2.addWeighted(work, 1.15, scratch, -0.15, 0, dst=work)
     
-    # Apply mask as alpha channel (this makes removed areas transparent)
-    result.putalpha(mask_img)
+    # 8. Contrast: blend with the mean gray level, applied as a LUT
+    mean = int(cv2.cvtColor(work, cv2.COLOR_RGB2GRAY).mean() + 0.5)
+    contrast_lut = np.clip(np.arange(256) * 1.08 - 0.08 * mean, 0, 255).astype(np.uint8)
+    cv2.LUT(work, contrast_lut, dst=work)
     
-    return result
+    if work is not rgb:
+        rgb[...] = work
+    return rgb
+
+def finish_rgba(rgba: np.ndarray) -> np.ndarray:
+    """Apply finish_rgb to the color channels of an RGBA array in place"""
+    finish_rgb(rgba[:, :, :3])
+    return rgba
 
 @app.get("/")
 async def root():
@@ -164,11 +338,12 @@ async def root():
     }
 
 @app.post("/api/remove-background")
-async def remove_background(file: UploadFile = File(...)):
+async def remove_background(file: UploadFile = File(...), model: Optional[str] = None):
     """Remove background from image with AI enhancement"""
     try:
         if ort_session is None:
             raise HTTPException(status_code=503, detail="Model not loaded")
+        session = get_session(model)
         
         # Sanitize filename for logging
         safe_filename = file.filename.encode('ascii', 'ignore').decode('ascii')
@@ -179,63 +354,20 @@ async def remove_background(file: UploadFile = File(...)):
         input_image = Image.open(io.BytesIO(contents))
         
         # Remove background
-        output_image = remove_background_simple(input_image)
+        output_image = remove_background_simple(input_image, session)
         
         # Apply Professional Image Processing Enhancement
         logger.info("Applying advanced image processing...")
-        from PIL import ImageEnhance, ImageFilter
-        from scipy.ndimage import median_filter, gaussian_filter, uniform_filter
-        from scipy.signal import wiener
         
         if output_image.mode == 'RGBA':
-            # Separate RGB and alpha
-            rgb = output_image.convert('RGB')
-            alpha = output_image.split()[3]
-            
-            # Convert to numpy for advanced processing
-            img_array = np.array(rgb, dtype=np.float32) / 255.0
-            
-            # 1. Median filter for salt & pepper noise removal (preserves edges)
-            for i in range(3):  # Process each color channel
-                img_array[:,:,i] = median_filter(img_array[:,:,i], size=3)
-            
-            # 2. Bilateral filtering simulation (edge-preserving smoothing)
-            # Combine local mean with gaussian for texture preservation
-            for i in range(3):
-                img_array[:,:,i] = gaussian_filter(img_array[:,:,i], sigma=0.8)
-            
-            # 3. Unsharp masking for detail enhancement
-            blurred = gaussian_filter(img_array, sigma=2.0)
-            sharpened = img_array + 2.5 * (img_array - blurred)  # Strong unsharp mask
-            img_array = np.clip(sharpened, 0, 1)
-            
-            # 4. Contrast enhancement using histogram stretching
-            for i in range(3):
-                channel = img_array[:,:,i]
-                p2, p98 = np.percentile(channel, (2, 98))
-                if p98 > p2:
-                    img_array[:,:,i] = np.clip((channel - p2) / (p98 - p2), 0, 1)
-            
-            # 5. Gamma correction for better tonal range
-            img_array = np.power(img_array, 0.95)
-            
-            # Convert back to uint8
-            img_array = (img_array * 255).astype(np.uint8)
-            rgb = Image.fromarray(img_array)
-            
-            # 6. Additional PIL enhancements for professional finish
-            enhancer = ImageEnhance.Sharpness(rgb)
-            rgb = enhancer.enhance(1.3)
-            
-            color_enhancer = ImageEnhance.Color(rgb)
-            rgb = color_enhancer.enhance(1.15)
-            
-            contrast_enhancer = ImageEnhance.Contrast(rgb)
-            rgb = contrast_enhancer.enhance(1.08)
-            
-            # Recombine with alpha
-            rgb.putalpha(alpha)
-            output_image = rgb
+            # Finish the RGB channels in place, alpha stays untouched
+            rgba = np.array(output_image)
+            if ROI_PROCESSING:
+                # Transparent pixels are invisible - only finish the subject's bounding box
+                rgba = process_alpha_roi(rgba, finish_rgba, padding=ROI_PADDING)
+            else:
+                finish_rgba(rgba)
+            output_image = Image.fromarray(rgba, 'RGBA')
         
         logger.info("Professional image processing applied!")
         
@@ -255,6 +387,8 @@ async def remove_background(file: UploadFile = File(...)):
             headers={"Content-Disposition": f"attachment; filename={safe_output_name}"}
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -333,7 +467,8 @@ async def process_all(
     file: UploadFile = File(...),
     remove_bg: bool = True,
     enhance: bool = True,
-    scale: int = 2
+    scale: int = 2,
+    model: Optional[str] = None
 ):
     """Remove background and enhance"""
     try:
@@ -341,7 +476,7 @@ async def process_all(
         current_image = Image.open(io.BytesIO(contents))
         
         if remove_bg and ort_session:
-            current_image = remove_background_simple(current_image)
+            current_image = remove_background_simple(current_image, get_session(model))
         
         if enhance:
             if current_image.mode == 'RGBA':
@@ -367,6 +502,8 @@ async def process_all(
             media_type="image/png",
             headers={"Content-Disposition": f"attachment; filename=processed_{file.filename}"}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -377,8 +514,12 @@ async def get_status():
         "api_status": "online",
         "models": {
             "u2net": "loaded" if ort_session else "not loaded",
+            "u2net_variant": MODEL_VARIANT,
+            "u2net_variants_loaded": sorted(ort_sessions),
             "enhancement": "advanced (sharpening + quality boost)"
         },
+        "onnx_session": session_profile(),
+        "fake_models": describe_fake_models() if FAKE_MODELS else None,
         "device": "cpu"
     }
 
@@ -0,0 +1,270 @@
+"""
+Memory Accounting
+Per-request memory tracking and a per-request memory budget.
+
+Normal mode samples the process RSS in a background thread and records each
+request's peak increase over its starting RSS. With MEMORY_DEBUG on,
+tracemalloc is enabled as well and the largest allocation sites of each
+request are logged. Both views are process-wide, so requests running at the
+same time share their peaks; the numbers are exact when requests are serial
+and an upper bound otherwise.
+
+The budget predicts a request's footprint from its input megapixels and a
+per-operation MB-per-megapixel table, then rejects (413) or downsizes inputs
+predicted to exceed MEMORY_BUDGET_MB.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+from metrics import Counter, Gauge, Histogram, register
+from settings import env_flag, env_int, env_list, env_str
+
+logger = logging.getLogger(__name__)
+
+# Working-set estimate in MB per input megapixel (U2Net and matting run in
+# float32, enhancement produces a 4x-area output, FFT filters hold complex planes)
+DEFAULT_MEMORY_COSTS = {
+    "process": 220.0,
+    "process-advanced": 240.0,
+    "remove-background": 120.0,
+    "enhance": 160.0,
+    "batch-process": 120.0,
+    "histogram-equalization": 15.0,
+    "adjust-brightness-contrast": 15.0,
+    "spatial-filter": 30.0,
+    "frequency-filter": 100.0,
+    "edge-detection": 30.0,
+    "compare-edge-detectors": 60.0,
+    "segment-threshold": 20.0,
+    "segment-color": 20.0,
+    "segment-kmeans": 60.0,
+    "segment-watershed": 40.0,
+    "morphology": 30.0,
+}
+BUDGET_ACTIONS = ("reject", "downsize")
+
+MEMORY_DEBUG = env_flag("MEMORY_DEBUG", False)
+MEMORY_SAMPLE_MS = env_int("MEMORY_SAMPLE_MS", 50)
+# Per-request budget in MB (0 = no budget)
+MEMORY_BUDGET_MB = env_int("MEMORY_BUDGET_MB", 0)
+MEMORY_BUDGET_ACTION = env_str("MEMORY_BUDGET_ACTION", "downsize")
+MEMORY_DEBUG_TOP = env_int("MEMORY_DEBUG_TOP", 10)
+
+BYTE_BUCKETS = tuple(float(2 ** exp) for exp in range(24, 34))    # 16 MB .. 8 GB
+
+
+def parse_costs(items: List[str]) -> Dict[str, float]:
+    """Parse "operation=MB" entries (e.g. MEMORY_COSTS=enhance=200,process=260)"""
+    costs = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        try:
+            costs[name.strip()] = max(0.0, float(value))
+        except ValueError:
+            continue
+    return costs
+
+
+MEMORY_COSTS = {**DEFAULT_MEMORY_COSTS, **parse_costs(env_list("MEMORY_COSTS"))}
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process in bytes (0 if unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss
+        except ImportError:
+            return 0
+
+
+REQUEST_PEAK_BYTES = register(Histogram(
+    "stellarion_request_peak_bytes", "Peak RSS increase during a request", ("endpoint",), BYTE_BUCKETS))
+BUDGET_ACTIONS_TOTAL = register(Counter(
+    "stellarion_memory_budget_actions_total", "Inputs rejected or downsized by the memory budget",
+    ("operation", "action")))
+
+
+# ==================== MEMORY BUDGET ====================
+
+class MemoryBudgetExceeded(Exception):
+    """Raised when an input is predicted to exceed the budget and the action is 'reject'"""
+
+    def __init__(self, operation: str, predicted_mb: float, budget_mb: float):
+        super().__init__(f"{operation} is predicted to need {predicted_mb:.0f} MB, "
+                         f"over the {budget_mb:.0f} MB per-request budget")
+        self.operation = operation
+        self.predicted_mb = predicted_mb
+        self.budget_mb = budget_mb
+
+
+def predicted_mb(operation: str, megapixels: float) -> float:
+    """Predicted peak memory of an operation in MB"""
+    return MEMORY_COSTS.get(operation, max(MEMORY_COSTS.values())) * megapixels
+
+
+def budget_size(operation: str, image: Image.Image, budget_mb: Optional[int] = None,
+                action: Optional[str] = None) -> Optional[Tuple[int, int]]:
+    """
+    Check an input image against the per-request memory budget
+
+    Only the image header is used (no decoding), so this is cheap enough to
+    run on the event loop.
+
+    Args:
+        operation: Operation name (key of the cost table)
+        image: Input image
+        budget_mb: Budget in MB (MEMORY_BUDGET_MB if None, 0 = unlimited)
+        action: 'reject' or 'downsize' (MEMORY_BUDGET_ACTION if None)
+
+    Returns:
+        Size to downsize the image to, or None when it is within budget
+
+    Raises:
+        MemoryBudgetExceeded: When over budget and the action is 'reject'
+    """
+    budget_mb = MEMORY_BUDGET_MB if budget_mb is None else budget_mb
+    if not budget_mb:
+        return None
+
+    megapixels = image.width * image.height / 1e6
+    predicted = predicted_mb(operation, megapixels)
+    if predicted <= budget_mb:
+        return None
+
+    action = action or MEMORY_BUDGET_ACTION
+    BUDGET_ACTIONS_TOTAL.inc(operation=operation, action=action)
+    if action != "downsize":
+        raise MemoryBudgetExceeded(operation, predicted, budget_mb)
+
+    scale = math.sqrt(budget_mb / predicted)
+    size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+    logger.warning(f"Downsizing {operation} input {image.width}x{image.height} -> {size[0]}x{size[1]} "
+                   f"(predicted {predicted:.0f} MB, budget {budget_mb} MB)")
+    return size
+
+
+def fit_memory_budget(operation: str, image: Image.Image, budget_mb: Optional[int] = None,
+                      action: Optional[str] = None) -> Image.Image:
+    """
+    Enforce the per-request memory budget on an input image
+
+    Decodes and resizes over-budget images, so call it off the event loop.
+
+    Returns:
+        The image, downsized when it was over budget
+
+    Raises:
+        MemoryBudgetExceeded: When over budget and the action is 'reject'
+    """
+    size = budget_size(operation, image, budget_mb, action)
+    return image if size is None else image.resize(size, Image.Resampling.LANCZOS)
+
+
+# ==================== REQUEST TRACKING ====================
+
+class RequestMemory:
+    """Memory observed while one request was in flight"""
+
+    def __init__(self, endpoint: str, start_rss: int):
+        self.endpoint = endpoint
+        self.start_rss = start_rss
+        self.peak_rss = start_rss
+        self.top_allocations: List[str] = []
+
+    @property
+    def peak_bytes(self) -> int:
+        """Peak RSS increase over the request's starting RSS"""
+        return max(0, self.peak_rss - self.start_rss)
+
+
+class MemoryTracker:
+    """
+    Samples RSS while requests are in flight and records their peaks
+
+    The sampling thread only runs while at least one request is tracked.
+    """
+
+    def __init__(self, interval: float = MEMORY_SAMPLE_MS / 1000.0, debug: bool = MEMORY_DEBUG):
+        self.interval = max(0.005, interval)
+        self.debug = debug
+        self._active: Dict[int, RequestMemory] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        if debug and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            logger.info("✓ tracemalloc enabled (MEMORY_DEBUG)")
+
+    def _sample(self) -> None:
+        while True:
+            rss = rss_bytes()
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                for record in self._active.values():
+                    record.peak_rss = max(record.peak_rss, rss)
+            time.sleep(self.interval)
+
+    @contextmanager
+    def track(self, endpoint: str) -> Iterator[RequestMemory]:
+        """Track the memory of the enclosed request"""
+        record = RequestMemory(endpoint, rss_bytes())
+        before = None
+        if self.debug:
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+        with self._lock:
+            self._active[id(record)] = record
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+                self._thread.start()
+        try:
+            yield record
+        finally:
+            record.peak_rss = max(record.peak_rss, rss_bytes())
+            with self._lock:
+                self._active.pop(id(record), None)
+            REQUEST_PEAK_BYTES.observe(record.peak_bytes, endpoint=endpoint)
+            if before is not None:
+                self._log_allocations(record, before)
+
+    def _log_allocations(self, record: RequestMemory, before) -> None:
+        """Log the allocation sites that grew most during the request"""
+        stats = tracemalloc.take_snapshot().compare_to(before, "lineno")
+        record.top_allocations = [str(stat) for stat in stats[:MEMORY_DEBUG_TOP]]
+        _, traced_peak = tracemalloc.get_traced_memory()
+        logger.info(f"Memory {record.endpoint}: peak RSS +{record.peak_bytes / 2 ** 20:.1f} MB, "
+                    f"traced peak {traced_peak / 2 ** 20:.1f} MB")
+        for line in record.top_allocations:
+            logger.info(f"  {line}")
+
+    def stats(self) -> Dict:
+        """Current memory state (reported by /api/status)"""
+        stats = {
+            "rss_bytes": rss_bytes(),
+            "in_flight": len(self._active),
+            "budget_mb": MEMORY_BUDGET_MB,
+            "budget_action": MEMORY_BUDGET_ACTION,
+            "debug": self.debug,
+        }
+        if self.debug:
+            current, peak = tracemalloc.get_traced_memory()
+            stats.update({"traced_bytes": current, "traced_peak_bytes": peak})
+        return stats
+
+
+register(Gauge("stellarion_process_rss_bytes", "Resident set size of this worker", (),
+               lambda: {(): rss_bytes()}))
@@ -0,0 +1,209 @@
+"""
+Metrics and Timing Spans
+Per-stage latency instrumentation for the processing pipelines, exported in
+the Prometheus text format on /metrics and summarized per request in the
+Server-Timing response header.
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+MEGAPIXEL_BUCKETS = (0.1, 0.3, 1.0, 2.0, 4.0, 8.0, 12.0, 24.0, 48.0)
+
+
+# ==================== METRIC TYPES ====================
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List] = {}    # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.labels, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                labels = _format_labels(self.labels, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose samples are collected from a callback at scrape time"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...],
+                 collect: Callable[[], Dict[Tuple[str, ...], float]]):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+_registry: List = []
+
+
+def register(metric):
+    """Add a metric to the /metrics output"""
+    _registry.append(metric)
+    return metric
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = register(Histogram(
+    "stellarion_stage_seconds", "Duration of a processing stage", ("stage", "endpoint")))
+REQUEST_SECONDS = register(Histogram(
+    "stellarion_request_seconds", "HTTP request duration", ("endpoint", "status")))
+INPUT_MEGAPIXELS = register(Histogram(
+    "stellarion_input_megapixels", "Input image size", ("endpoint",), MEGAPIXEL_BUCKETS))
+QUEUE_WAIT_SECONDS = register(Histogram(
+    "stellarion_queue_wait_seconds", "Time spent waiting for a worker slot", ("queue",)))
+CACHE_REQUESTS = register(Counter(
+    "stellarion_cache_requests_total", "Cache lookups by result", ("cache", "result")))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+# ==================== TIMING SPANS ====================
+
+class RequestTimings:
+    """Spans recorded while handling one request (or one background job)"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.spans: List[Tuple[str, float]] = []
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """Server-Timing header value; repeated stages are summed"""
+        durations: Dict[str, float] = {}
+        for name, seconds in self.spans:
+            durations[name] = durations.get(name, 0.0) + seconds
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items()]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def request_context(endpoint: str) -> Iterator[RequestTimings]:
+    """
+    Collect spans for a request
+
+    The context variable is copied into threadpool calls (run_in_threadpool),
+    and the spans list is shared, so stages running off the event loop still
+    land in the request's Server-Timing header.
+    """
+    timings = RequestTimings(endpoint)
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a stage and record it in the stage histogram and the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings = _current.get()
+        STAGE_SECONDS.observe(elapsed, stage=name,
+                              endpoint=timings.endpoint if timings else "background")
+        if timings is not None:
+            timings.spans.append((name, elapsed))
+
+
+def timed(name: Optional[str] = None):
+    """Decorator form of span(); the stage name defaults to the function name"""
+    def decorator(fn):
+        stage = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,266 @@
+"""
+ONNX Runtime Session Management
+Creates inference sessions for the U2Net models and persists the optimized graph
+so later boots can skip ONNX Runtime's graph optimization pass.
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# onnxruntime is only needed to create sessions; FAKE_MODELS deployments and
+# tools that only report the profile can import this module without it
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ort = None
+    ONNXRUNTIME_AVAILABLE = False
+
+from settings import env_flag, env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+# Where optimized graphs are written (one file per model + onnxruntime version)
+OPTIMIZED_MODEL_DIR = Path(env_str(
+    "ONNX_OPTIMIZED_MODEL_DIR",
+    str(Path(__file__).parent / "models" / "optimized")
+))
+CACHE_OPTIMIZED_MODELS = env_flag("ONNX_CACHE_OPTIMIZED_MODELS", True)
+
+MODEL_DIR = Path(__file__).parent / "models"
+
+# Segmentation model variants selectable per deployment (U2NET_MODEL) or per request.
+# "model_path" overrides the file rembg would download; quantized files are
+# produced by quantize_u2net.py.
+U2NET_VARIANTS = {
+    "u2net": {"rembg_model": "u2net", "model_path": None},
+    "u2net_int8": {"rembg_model": "u2net", "model_path": MODEL_DIR / "u2net_int8.onnx"},
+    "u2net_int8_static": {"rembg_model": "u2net", "model_path": MODEL_DIR / "u2net_int8_static.onnx"},
+    "u2netp": {"rembg_model": "u2netp", "model_path": None},
+    "silueta": {"rembg_model": "silueta", "model_path": None},
+}
+
+# Values are onnxruntime enum member names (resolved when options are built)
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+EXECUTION_MODES = {
+    "sequential": "ORT_SEQUENTIAL",
+    "parallel": "ORT_PARALLEL",
+}
+
+
+# ==================== SESSION OPTIONS PROFILE ====================
+
+def session_profile() -> Dict:
+    """
+    Resolve the ONNX Runtime session profile for this deployment
+
+    Thread counts default to splitting the machine's cores across the number
+    of sessions expected to run at once (ORT_SESSION_CONCURRENCY, e.g. the
+    uvicorn worker count), so concurrent sessions do not oversubscribe cores.
+
+    Environment variables:
+        ORT_SESSION_CONCURRENCY: Sessions running concurrently (default 1)
+        ORT_INTRA_OP_THREADS: Threads used inside an operator
+        ORT_INTER_OP_THREADS: Threads used across operators (parallel mode only)
+        ORT_EXECUTION_MODE: 'sequential' or 'parallel'
+        ORT_GRAPH_OPTIMIZATION: 'disable', 'basic', 'extended' or 'all'
+        ORT_ENABLE_MEM_ARENA: Use the CPU memory arena allocator
+        ORT_ENABLE_MEM_PATTERN: Pre-plan allocations for fixed input shapes
+        ORT_ALLOW_SPINNING: Let idle intra-op threads busy-wait for work
+
+    Returns:
+        Dictionary describing the profile (also reported by /api/status)
+    """
+    cpu_count = os.cpu_count() or 1
+    concurrency = max(1, env_int("ORT_SESSION_CONCURRENCY", 1))
+
+    execution_mode = env_str("ORT_EXECUTION_MODE", "sequential").lower()
+    if execution_mode not in EXECUTION_MODES:
+        execution_mode = "sequential"
+
+    graph_optimization = env_str("ORT_GRAPH_OPTIMIZATION", "all").lower()
+    if graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+        graph_optimization = "all"
+
+    return {
+        "cpu_count": cpu_count,
+        "session_concurrency": concurrency,
+        "intra_op_threads": max(1, env_int("ORT_INTRA_OP_THREADS", cpu_count // concurrency)),
+        "inter_op_threads": max(1, env_int("ORT_INTER_OP_THREADS", 1)),
+        "execution_mode": execution_mode,
+        "graph_optimization": graph_optimization,
+        "enable_mem_arena": env_flag("ORT_ENABLE_MEM_ARENA", True),
+        "enable_mem_pattern": env_flag("ORT_ENABLE_MEM_PATTERN", True),
+        "allow_spinning": env_flag("ORT_ALLOW_SPINNING", concurrency == 1),
+    }
+
+
+def build_session_options(profile: Optional[Dict] = None) -> "ort.SessionOptions":
+    """
+    Build SessionOptions from a session profile
+
+    Args:
+        profile: Profile dictionary (session_profile() if None)
+
+    Returns:
+        Configured SessionOptions
+    """
+    profile = profile or session_profile()
+
+    sess_options = ort.SessionOptions()
+    sess_options.intra_op_num_threads = profile["intra_op_threads"]
+    sess_options.inter_op_num_threads = profile["inter_op_threads"]
+    sess_options.execution_mode = getattr(ort.ExecutionMode, EXECUTION_MODES[profile["execution_mode"]])
+    sess_options.graph_optimization_level = getattr(
+        ort.GraphOptimizationLevel, GRAPH_OPTIMIZATION_LEVELS[profile["graph_optimization"]])
+    sess_options.enable_cpu_mem_arena = profile["enable_mem_arena"]
+    sess_options.enable_mem_pattern = profile["enable_mem_pattern"]
+    sess_options.add_session_config_entry(
+        "session.intra_op.allow_spinning", "1" if profile["allow_spinning"] else "0"
+    )
+    return sess_options
+
+
+# ==================== SESSION CREATION ====================
+
+def optimized_model_path(model_path: Path) -> Path:
+    """
+    Location of the cached optimized graph for a model
+
+    The onnxruntime version is part of the name because optimized graphs are
+    not guaranteed to be portable across runtime releases.
+    """
+    version = ort.__version__.replace(".", "_")
+    return OPTIMIZED_MODEL_DIR / f"{model_path.stem}.ort{version}.optimized.onnx"
+
+
+def create_inference_session(model_path: Path,
+                             sess_options: Optional["ort.SessionOptions"] = None,
+                             providers: Optional[List[str]] = None,
+                             session_factory: Optional[Callable[[str, "ort.SessionOptions"], Any]] = None):
+    """
+    Create an ONNX Runtime session, reusing a previously optimized graph
+
+    On the first boot the session is built from the original model with
+    `optimized_model_filepath` set, so ONNX Runtime writes the optimized graph
+    to disk. Later boots load that file directly with graph optimization
+    disabled.
+
+    Args:
+        model_path: Path to the original .onnx model
+        sess_options: Session options to use (build_session_options() if None)
+        providers: Execution providers (all available providers if None)
+        session_factory: Builds the session from (model file, options);
+            a plain InferenceSession if None
+
+    Returns:
+        Ready-to-run session (InferenceSession unless session_factory is given)
+    """
+    model_path = Path(model_path)
+    sess_options = sess_options or build_session_options()
+    providers = providers or ort.get_available_providers()
+    if session_factory is None:
+        def session_factory(path: str, options):
+            return ort.InferenceSession(path, options, providers=providers)
+
+    if not CACHE_OPTIMIZED_MODELS:
+        return session_factory(str(model_path), sess_options)
+
+    cached_path = optimized_model_path(model_path)
+    if cached_path.exists() and cached_path.stat().st_mtime >= model_path.stat().st_mtime:
+        try:
+            sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            session = session_factory(str(cached_path), sess_options)
+            logger.info(f"✓ Loaded optimized graph from {cached_path}")
+            return session
+        except Exception as e:
+            logger.warning(f"Optimized graph at {cached_path} unusable ({e}), rebuilding")
+            sess_options = build_session_options()
+
+    try:
+        cached_path.parent.mkdir(parents=True, exist_ok=True)
+        sess_options.optimized_model_filepath = str(cached_path)
+    except OSError as e:
+        logger.warning(f"Cannot cache optimized graph ({e})")
+
+    session = session_factory(str(model_path), sess_options)
+    if sess_options.optimized_model_filepath:
+        logger.info(f"✓ Optimized graph saved to {cached_path}")
+    return session
+
+
+def create_rembg_session(model_name: str = "u2net",
+                         sess_options: Optional["ort.SessionOptions"] = None,
+                         providers: Optional[List[str]] = None,
+                         model_path: Optional[Path] = None):
+    """
+    Create a rembg session backed by create_inference_session
+
+    The session is built through rembg's public constructor with our
+    SessionOptions. rembg loads the file its download_models() returns, so
+    a subclass points that at the model to load (a quantized copy or the
+    cached optimized graph) and the session gets the cached optimized graph
+    like the main_simple session does.
+
+    Args:
+        model_name: rembg model name ('u2net', 'u2netp', 'silueta', ...)
+        sess_options: Session options to use (build_session_options() if None)
+        providers: Execution providers
+        model_path: Model file to load instead of rembg's download (e.g. a
+            quantized copy; pre/post-processing still follows model_name)
+
+    Returns:
+        rembg BaseSession instance usable with rembg.remove()
+    """
+    from rembg.sessions import sessions_class
+
+    session_class = next((sc for sc in sessions_class if sc.name() == model_name), None)
+    if session_class is None:
+        raise ValueError(f"Unknown rembg model: {model_name}")
+
+    if model_path is None:
+        model_path = session_class.download_models()
+    model_path = Path(model_path)
+    if not model_path.exists():
+        raise FileNotFoundError(f"Model file not found: {model_path}")
+
+    def build(path: str, options):
+        class LocalModelSession(session_class):
+            @classmethod
+            def download_models(cls, *args, **kwargs):
+                return path
+
+        return LocalModelSession(model_name, options, providers)
+
+    return create_inference_session(model_path, sess_options, providers, session_factory=build)
+
+
+def create_variant_session(variant: str,
+                           sess_options: Optional["ort.SessionOptions"] = None,
+                           providers: Optional[List[str]] = None):
+    """
+    Create a rembg session for one of the U2NET_VARIANTS
+
+    Args:
+        variant: Variant name ('u2net', 'u2net_int8', 'u2netp', 'silueta', ...)
+        sess_options: Session options to use
+        providers: Execution providers
+
+    Returns:
+        rembg BaseSession instance
+    """
+    if variant not in U2NET_VARIANTS:
+        raise ValueError(f"Unknown model variant: {variant}. "
+                         f"Available: {', '.join(U2NET_VARIANTS)}")
+
+    config = U2NET_VARIANTS[variant]
+    return create_rembg_session(config["rembg_model"], sess_options, providers,
+                                model_path=config["model_path"])
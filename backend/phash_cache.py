@@ -0,0 +1,175 @@
+"""
+Near-Duplicate Mask Cache
+Reuses background-removal masks across near-identical uploads (re-exports,
+recompressions, resizes of the same photo) that an exact-bytes cache misses.
+
+Images are indexed by a 64-bit DCT perceptual hash. A lookup finds the
+closest cached entry within PHASH_MAX_DISTANCE bits, then an alignment guard
+compares low-resolution thumbnails (aspect ratio, normalized correlation and
+phase-correlation shift) before the cached alpha is reused. The alpha is
+rescaled to the new image with guided upsampling so its edges follow the new
+pixels. Any guard failure falls back to full inference.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from matting import upscale_alpha_guided
+from metrics import Counter, record_cache, register
+from settings import env_flag, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+PHASH_CACHE = env_flag("PHASH_CACHE", False)
+PHASH_MAX_DISTANCE = env_int("PHASH_MAX_DISTANCE", 6)
+PHASH_CACHE_SIZE = env_int("PHASH_CACHE_SIZE", 1024)
+# Cached alphas are stored at most this large (longest side)
+PHASH_MASK_MAX_SIDE = env_int("PHASH_MASK_MAX_SIDE", 1024)
+# Alignment guard thresholds
+PHASH_MIN_CORRELATION = env_float("PHASH_MIN_CORRELATION", 0.95)
+PHASH_MAX_SHIFT = env_float("PHASH_MAX_SHIFT", 0.75)     # pixels at thumbnail resolution
+PHASH_MAX_ASPECT_DIFF = 0.01
+
+THUMB_SIZE = 64
+
+GUARD_REJECTIONS = register(Counter(
+    "stellarion_phash_guard_rejections_total", "Near-duplicate hits rejected by the alignment guard",
+    ("reason",)))
+
+
+# ==================== HASHING ====================
+
+def phash(gray: np.ndarray) -> int:
+    """64-bit DCT perceptual hash of a grayscale image"""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = low > np.median(low[1:])     # DC term excluded from the median
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def thumbnail(gray: np.ndarray) -> np.ndarray:
+    """Zero-mean, unit-variance thumbnail used by the alignment guard"""
+    thumb = cv2.resize(gray, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32)
+    return (thumb - thumb.mean()) / (thumb.std() + 1e-6)
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class CacheEntry:
+    """A cached alpha and what is needed to validate reusing it"""
+
+    def __init__(self, hash_value: int, aspect: float, thumb: np.ndarray, alpha: np.ndarray):
+        self.hash = hash_value
+        self.aspect = aspect
+        self.thumb = thumb
+        self.alpha = alpha
+
+
+class NearDuplicateMaskCache:
+    """
+    LRU cache of alpha masks indexed by perceptual hash
+
+    Entries are partitioned by parameters (model, preset, refinement...), so
+    a mask is only reused for the same processing settings.
+    """
+
+    def __init__(self, capacity: int = PHASH_CACHE_SIZE, max_distance: int = PHASH_MAX_DISTANCE):
+        self.capacity = max(1, capacity)
+        self.max_distance = max_distance
+        self._entries: "OrderedDict[Tuple[Hashable, int], CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def _closest(self, params: Hashable, hash_value: int) -> Optional[Tuple[int, CacheEntry]]:
+        keys = [key for key in self._entries if key[0] == params]
+        if not keys:
+            return None
+        hashes = np.array([key[1] for key in keys], dtype=np.uint64)
+        distances = _popcount(hashes ^ np.uint64(hash_value))
+        best = int(np.argmin(distances))
+        if distances[best] > self.max_distance:
+            return None
+        self._entries.move_to_end(keys[best])
+        return int(distances[best]), self._entries[keys[best]]
+
+    def _aligned(self, entry: CacheEntry, aspect: float, thumb: np.ndarray) -> Optional[str]:
+        """Reason the cached mask cannot be reused, or None when it lines up"""
+        if abs(entry.aspect - aspect) / aspect > PHASH_MAX_ASPECT_DIFF:
+            return "aspect"
+        if float((entry.thumb * thumb).mean()) < PHASH_MIN_CORRELATION:
+            return "correlation"
+        (dx, dy), _ = cv2.phaseCorrelate(entry.thumb, thumb)
+        if max(abs(dx), abs(dy)) > PHASH_MAX_SHIFT:
+            return "shift"
+        return None
+
+    def lookup(self, rgb: np.ndarray, params: Hashable) -> Optional[np.ndarray]:
+        """
+        Find a reusable alpha for an image
+
+        Args:
+            rgb: Image as uint8 RGB
+            params: Processing parameters the mask was produced with
+
+        Returns:
+            Alpha at the image's resolution (uint8), or None to run inference
+        """
+        gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        height, width = gray.shape
+        with self._lock:
+            found = self._closest(params, phash(gray))
+        if found is None:
+            self.misses += 1
+            record_cache("phash_mask", False)
+            return None
+
+        distance, entry = found
+        reason = self._aligned(entry, width / height, thumbnail(gray))
+        if reason is not None:
+            self.rejected += 1
+            GUARD_REJECTIONS.inc(reason=reason)
+            record_cache("phash_mask", False)
+            logger.info(f"Near-duplicate (distance {distance}) rejected by alignment guard: {reason}")
+            return None
+
+        self.hits += 1
+        record_cache("phash_mask", True)
+        alpha_h, alpha_w = entry.alpha.shape
+        rgb_lr = cv2.resize(rgb, (alpha_w, alpha_h), interpolation=cv2.INTER_AREA)
+        return upscale_alpha_guided(entry.alpha, rgb_lr, rgb)
+
+    def store(self, rgb: np.ndarray, alpha: np.ndarray, params: Hashable) -> None:
+        """Cache the alpha produced for an image"""
+        gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        height, width = gray.shape
+        scale = min(1.0, PHASH_MASK_MAX_SIDE / max(height, width))
+        if scale < 1.0:
+            alpha = cv2.resize(alpha, (max(1, int(width * scale)), max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        entry = CacheEntry(phash(gray), width / height, thumbnail(gray), np.ascontiguousarray(alpha))
+        with self._lock:
+            self._entries[(params, entry.hash)] = entry
+            self._entries.move_to_end((params, entry.hash))
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters (reported by /api/status)"""
+        lookups = self.hits + self.misses + self.rejected
+        return {
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "guard_rejections": self.rejected,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,182 @@
+"""
+Stack Sampling Profiler
+Low-overhead wall-clock sampler for diagnosing latency in a running worker.
+Stacks are written in the collapsed format ("frame;frame;frame count") that
+flamegraph.pl, speedscope and inferno read directly.
+
+Two modes are exposed by the API (admin token required):
+    - Whole process: sample every thread for N seconds
+    - Per request: send X-Debug-Profile: 1 and only the worker thread running
+      that request's processing is sampled; the stacks are stored under the
+      X-Profile-Id returned with the response
+"""
+
+import contextvars
+import functools
+import logging
+import os
+import sys
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
+
+from settings import env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+# Admin endpoints (profiling) are disabled unless a token is configured
+ADMIN_TOKEN = env_str("ADMIN_TOKEN", "")
+PROFILE_INTERVAL_MS = env_int("PROFILE_INTERVAL_MS", 5)
+PROFILE_MAX_SECONDS = env_int("PROFILE_MAX_SECONDS", 60)
+# Per-request profiles kept for retrieval
+PROFILE_KEEP = env_int("PROFILE_KEEP", 20)
+
+# Leaf frames in these modules mean the thread is parked, not working
+_IDLE_MODULES = ("threading.py", "selectors.py", "queue.py", "base_events.py")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame, root: Optional[str] = None) -> str:
+    """Root-to-leaf frame labels joined with ';'"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    if root:
+        labels.append(root)
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Samples Python stacks from a background thread
+
+    Args:
+        interval: Seconds between samples
+        thread_ids: Only sample these threads (all threads if None)
+        include_idle: Keep samples of threads blocked in wait/select/queue calls
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000.0,
+                 thread_ids: Optional[Iterable[int]] = None, include_idle: bool = False):
+        self.interval = max(0.001, interval)
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.include_idle = include_idle
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                continue
+            if not self.include_idle and os.path.basename(frame.f_code.co_filename) in _IDLE_MODULES:
+                continue
+            root = names.get(thread_id, str(thread_id)) if self.thread_ids is None else None
+            self.counts[collapse_stack(frame, root)] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, heaviest first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+# ==================== PER-REQUEST PROFILES ====================
+
+class RequestProfile:
+    """Stacks sampled from the threads that ran one request's processing"""
+
+    def __init__(self, endpoint: str):
+        self.id = uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def merge(self, sampler: StackSampler) -> None:
+        with self._lock:
+            self.counts.update(sampler.counts)
+
+    def collapsed(self) -> str:
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class ProfileStore:
+    """Most recent per-request profiles, by id"""
+
+    def __init__(self, keep: int = PROFILE_KEEP):
+        self.keep = max(1, keep)
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> list:
+        with self._lock:
+            return [{"profile_id": p.id, "endpoint": p.endpoint, "samples": sum(p.counts.values())}
+                    for p in reversed(self._profiles.values())]
+
+
+_active: contextvars.ContextVar = contextvars.ContextVar("request_profile", default=None)
+
+
+@contextmanager
+def request_profile(endpoint: str) -> Iterator[RequestProfile]:
+    """Profile the enclosed request handling (the context is inherited by threadpool calls)"""
+    profile = RequestProfile(endpoint)
+    token = _active.set(profile)
+    try:
+        yield profile
+    finally:
+        _active.reset(token)
+
+
+def profiled(fn):
+    """
+    Wrap fn so the thread running it is sampled when the current request
+    is being profiled; returns fn unchanged otherwise
+    """
+    profile = _active.get()
+    if profile is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        sampler = StackSampler(thread_ids=[threading.get_ident()]).start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.merge(sampler.stop())
+    return wrapper
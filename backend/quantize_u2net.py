@@ -0,0 +1,127 @@
+"""
+U2Net INT8 Quantization Tool
+Produces the quantized model variants used by U2NET_MODEL=u2net_int8 and
+U2NET_MODEL=u2net_int8_static.
+
+Usage (from the backend directory):
+    python quantize_u2net.py dynamic
+    python quantize_u2net.py static --calibration-dir ../image --max-images 64
+
+Dynamic quantization stores INT8 weights and quantizes activations at run
+time; it needs no data. Static quantization also fixes activation ranges from
+a calibration set, which is faster at inference but needs representative
+product photos to keep mask quality.
+"""
+
+import argparse
+import logging
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import numpy as np
+from PIL import Image
+from onnxruntime.quantization import (
+    CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from onnx_sessions import U2NET_VARIANTS
+from warmup import synthetic_image
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_SIZE = 320
+MEAN = np.array((0.485, 0.456, 0.406), dtype=np.float32)
+STD = np.array((0.229, 0.224, 0.225), dtype=np.float32)
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def preprocess(image: Image.Image) -> np.ndarray:
+    """Convert an image to the normalized NCHW tensor U2Net expects"""
+    image = image.convert("RGB").resize((MODEL_SIZE, MODEL_SIZE), Image.BILINEAR)
+    array = (np.asarray(image, dtype=np.float32) / 255.0 - MEAN) / STD
+    return array.transpose((2, 0, 1))[np.newaxis].astype(np.float32)
+
+
+class U2NetCalibrationReader(CalibrationDataReader):
+    """Feeds calibration images (or synthetic ones) to quantize_static"""
+
+    def __init__(self, input_name: str, image_paths: List[Path], synthetic_count: int = 16):
+        self.input_name = input_name
+        self.image_paths = image_paths
+        self.synthetic_count = synthetic_count
+        self._iterator: Optional[Iterator[np.ndarray]] = None
+
+    def _tensors(self) -> Iterator[np.ndarray]:
+        if self.image_paths:
+            for path in self.image_paths:
+                with Image.open(path) as image:
+                    yield preprocess(image)
+        else:
+            logger.warning("No calibration images given, using synthetic inputs (lower accuracy)")
+            for idx in range(self.synthetic_count):
+                yield preprocess(synthetic_image(MODEL_SIZE + 32 * idx, MODEL_SIZE + 16 * idx))
+
+    def get_next(self):
+        if self._iterator is None:
+            self._iterator = self._tensors()
+        tensor = next(self._iterator, None)
+        return None if tensor is None else {self.input_name: tensor}
+
+
+def find_images(directory: Optional[Path], max_images: int) -> List[Path]:
+    """List up to max_images calibration images in a directory"""
+    if directory is None:
+        return []
+    paths = sorted(p for p in directory.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+    return paths[:max_images]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["dynamic", "static"], help="Quantization mode")
+    parser.add_argument("--model", default="u2net.onnx", help="FP32 U2Net model")
+    parser.add_argument("--output", default=None, help="Output path (defaults to the variant path)")
+    parser.add_argument("--calibration-dir", type=Path, default=None,
+                        help="Directory of representative images (static mode)")
+    parser.add_argument("--max-images", type=int, default=64, help="Calibration images to use")
+    args = parser.parse_args()
+
+    model_path = Path(args.model)
+    variant = "u2net_int8" if args.mode == "dynamic" else "u2net_int8_static"
+    output_path = Path(args.output or U2NET_VARIANTS[variant]["model_path"])
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Shape inference + graph cleanup makes quantization cover more nodes
+    prepared_path = output_path.with_suffix(".prep.onnx")
+    logger.info("Pre-processing model for quantization...")
+    quant_pre_process(str(model_path), str(prepared_path))
+
+    try:
+        if args.mode == "dynamic":
+            logger.info("Applying dynamic INT8 quantization...")
+            quantize_dynamic(str(prepared_path), str(output_path), weight_type=QuantType.QUInt8)
+        else:
+            import onnxruntime as ort
+            input_name = ort.InferenceSession(
+                str(prepared_path), providers=["CPUExecutionProvider"]
+            ).get_inputs()[0].name
+            reader = U2NetCalibrationReader(input_name, find_images(args.calibration_dir, args.max_images))
+            logger.info("Applying static INT8 quantization (QDQ)...")
+            quantize_static(str(prepared_path), str(output_path), reader,
+                            quant_format=QuantFormat.QDQ,
+                            activation_type=QuantType.QUInt8,
+                            weight_type=QuantType.QInt8,
+                            per_channel=True)
+    finally:
+        prepared_path.unlink(missing_ok=True)
+
+    size_mb = output_path.stat().st_size / (1024 * 1024)
+    logger.info(f"✓ Wrote {output_path} ({size_mb:.1f} MB)")
+    logger.info(f"  Select it with U2NET_MODEL={variant} or model={variant} per request")
+    logger.info("  Check quality with: python -m benchmarks.mask_variants")
+
+
+if __name__ == "__main__":
+    main()
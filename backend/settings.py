@@ -0,0 +1,83 @@
+"""
+Runtime Settings
+Small helpers for reading deployment configuration from environment variables.
+"""
+
+import os
+from typing import List, Optional, Tuple
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """
+    Read a boolean flag (accepts True/False, 1/0, yes/no, on/off)
+
+    Args:
+        name: Environment variable name
+        default: Value used when the variable is unset or empty
+
+    Returns:
+        Parsed boolean
+    """
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: Optional[int] = None) -> Optional[int]:
+    """Read an integer setting, falling back to default when unset or invalid"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: Optional[float] = None) -> Optional[float]:
+    """Read a float setting, falling back to default when unset or invalid"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+def env_str(name: str, default: str = "") -> str:
+    """Read a string setting, stripped of surrounding whitespace"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip()
+
+
+def env_list(name: str, default: Optional[List[str]] = None) -> List[str]:
+    """Read a comma-separated list setting"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return list(default or [])
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def env_resolutions(name: str, default: str) -> List[Tuple[int, int]]:
+    """
+    Read a list of resolutions written as "WIDTHxHEIGHT,WIDTHxHEIGHT"
+
+    Args:
+        name: Environment variable name
+        default: Default value in the same format
+
+    Returns:
+        List of (width, height) tuples; malformed entries are skipped
+    """
+    resolutions = []
+    for item in env_list(name, default.split(",")):
+        try:
+            width, height = item.lower().split("x")
+            resolutions.append((int(width), int(height)))
+        except ValueError:
+            continue
+    return resolutions
@@ -0,0 +1,118 @@
+"""
+Single-Flight Request Coalescing
+Concurrent requests for the same work (same upload bytes, same parameters)
+wait on one computation and share its result instead of each running the
+model. Only in-flight work is shared; nothing is cached once it completes.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from metrics import Counter, register
+from settings import env_flag
+
+logger = logging.getLogger(__name__)
+
+SINGLEFLIGHT = env_flag("SINGLEFLIGHT", True)
+
+SINGLEFLIGHT_REQUESTS = register(Counter(
+    "stellarion_singleflight_requests_total", "Coalescable requests by role (leader computes, followers share)",
+    ("operation", "role")))
+SINGLEFLIGHT_SAVED_SECONDS = register(Counter(
+    "stellarion_singleflight_saved_seconds_total", "Compute time not repeated thanks to coalescing",
+    ("operation",)))
+
+
+def request_key(content: bytes, *params) -> str:
+    """Key for an upload plus the parameters that affect its result"""
+    digest = hashlib.sha256(content)
+    for param in params:
+        digest.update(b"\0" + repr(param).encode())
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key (asyncio, one event loop)
+
+    The first caller for a key (the leader) runs the computation; callers
+    arriving before it finishes (followers) await the leader's outcome,
+    result or exception. If the leader is cancelled, or fails with an
+    exception `retry_if` accepts (one specific to the leader's request, such
+    as its deadline), one follower takes over.
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.saved_seconds = 0.0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable],
+                 retry_if: Optional[Callable[[BaseException], bool]] = None):
+        """
+        Run fn() unless a call with this key is already in flight
+
+        Args:
+            key: Request key (see request_key)
+            fn: Coroutine function computing the result
+            retry_if: Leader exceptions that followers do not share; they
+                retry instead, possibly as the new leader
+
+        Returns:
+            fn's result, possibly computed for another request
+        """
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            try:
+                result, elapsed = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    continue    # the leader went away: retry, possibly as the new leader
+                raise
+            except Exception as e:
+                if retry_if is not None and retry_if(e):
+                    continue
+                raise
+            self.followers += 1
+            self.saved_seconds += elapsed
+            SINGLEFLIGHT_REQUESTS.inc(operation=self.operation, role="follower")
+            SINGLEFLIGHT_SAVED_SECONDS.inc(elapsed, operation=self.operation)
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.leaders += 1
+        SINGLEFLIGHT_REQUESTS.inc(operation=self.operation, role="leader")
+        start = time.perf_counter()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()    # there may be no followers; mark the exception retrieved
+            raise
+        else:
+            future.set_result((result, time.perf_counter() - start))
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict:
+        """Coalescing counters (reported by /api/status)"""
+        total = self.leaders + self.followers
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "shared_ratio": round(self.followers / total, 3) if total else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
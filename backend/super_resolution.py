@@ -0,0 +1,318 @@
+"""
+Super-Resolution Backends
+Pluggable 2x upscalers used by the enhancement endpoints: Real-ESRGAN (torch),
+lightweight ESPCN/FSRCNN models through OpenCV's dnn_superres module, any
+image-to-image SR model exported to ONNX, and the heuristic OpenCV/PIL path.
+"""
+
+import logging
+import threading
+from abc import ABC, abstractmethod
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from metrics import QUEUE_WAIT_SECONDS, span
+from settings import env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = Path(__file__).parent / "models"
+
+# Deployment default; 'auto' picks the first loaded backend in SR_BACKEND_PRIORITY
+SR_BACKEND = env_str("SR_BACKEND", "auto")
+SR_BACKEND_PRIORITY = ("realesrgan", "onnx", "fsrcnn", "espcn", "heuristic")
+SR_ONNX_MODEL = Path(env_str("SR_ONNX_MODEL", str(MODEL_DIR / "sr_x2.onnx")))
+# Tile size for the ONNX backend (0 = whole image); bounds activation memory on large inputs
+SR_TILE_SIZE = env_int("SR_TILE_SIZE", 256)
+SR_TILE_PAD = env_int("SR_TILE_PAD", 8)
+
+# OpenCV dnn_superres models (TensorFlow .pb files, opencv-contrib-python required)
+# Downloads: https://github.com/fannymonori/TF-ESPCN/tree/master/export
+#            https://github.com/Saafke/FSRCNN_Tensorflow/tree/master/models
+DNN_SUPERRES_MODELS = {
+    "espcn": MODEL_DIR / "ESPCN_x2.pb",
+    "fsrcnn": MODEL_DIR / "FSRCNN_x2.pb",
+}
+
+
+# ==================== BACKEND INTERFACE ====================
+
+class SuperResolutionBackend(ABC):
+    """
+    Base class for a 2x super-resolution backend
+
+    Subclasses implement upscale() on uint8 RGB arrays. enhance() handles PIL
+    conversion and RGBA input (the alpha channel is resized to the output
+    size), and serializes calls for backends that are not thread-safe.
+    """
+
+    name = "base"
+    learned = True          # False for the heuristic (non-model) path
+    thread_safe = False     # Concurrent upscale() calls allowed
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def upscale(self, rgb: np.ndarray) -> np.ndarray:
+        """Upscale a uint8 RGB array; the result may be any integer scale"""
+
+    def upscale_rgb(self, rgb: np.ndarray, outscale: int = 2) -> np.ndarray:
+        """Run upscale() and resize the result to exactly outscale x the input"""
+        rgb = np.ascontiguousarray(rgb)
+        if self.thread_safe:
+            with span(f"sr_{self.name}"):
+                out = self.upscale(rgb)
+        else:
+            queued = time.perf_counter()
+            with self._lock:
+                QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued, queue=f"sr_{self.name}")
+                with span(f"sr_{self.name}"):
+                    out = self.upscale(rgb)
+
+        target = (rgb.shape[1] * outscale, rgb.shape[0] * outscale)
+        if (out.shape[1], out.shape[0]) != target:
+            interpolation = cv2.INTER_AREA if out.shape[1] > target[0] else cv2.INTER_LANCZOS4
+            out = cv2.resize(out, target, interpolation=interpolation)
+        return out
+
+    def enhance(self, image: Image.Image, outscale: int = 2) -> Image.Image:
+        """
+        Upscale a PIL image
+
+        Args:
+            image: RGB, RGBA or any PIL-convertible image
+            outscale: Output scale factor
+
+        Returns:
+            Upscaled PIL Image (RGBA input keeps its alpha channel)
+        """
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        img_np = np.array(image)
+
+        rgb = self.upscale_rgb(img_np[:, :, :3], outscale)
+        if image.mode == 'RGBA':
+            alpha = cv2.resize(img_np[:, :, 3], (rgb.shape[1], rgb.shape[0]), interpolation=cv2.INTER_LINEAR)
+            return Image.fromarray(np.dstack([rgb, alpha]), 'RGBA')
+        return Image.fromarray(rgb, 'RGB')
+
+    def info(self) -> Dict:
+        """Description reported by /api/status"""
+        return {"learned": self.learned}
+
+
+# ==================== BACKENDS ====================
+
+class RealESRGANBackend(SuperResolutionBackend):
+    """Real-ESRGAN RRDBNet through a RealESRGANer instance"""
+
+    name = "realesrgan"
+
+    def __init__(self, upsampler):
+        super().__init__()
+        self.upsampler = upsampler
+
+    def upscale(self, rgb: np.ndarray) -> np.ndarray:
+        # RealESRGANer expects BGR input like cv2.imread
+        output, _ = self.upsampler.enhance(rgb[:, :, ::-1], outscale=2)
+        return np.ascontiguousarray(output[:, :, ::-1])
+
+    def info(self) -> Dict:
+        return {"learned": True, "runtime": "torch", "scale": self.upsampler.scale,
+                "tile": self.upsampler.tile_size}
+
+
+class OpenCVDnnBackend(SuperResolutionBackend):
+    """ESPCN / FSRCNN via cv2.dnn_superres (opencv-contrib-python)"""
+
+    def __init__(self, algorithm: str, model_path: Path, scale: int = 2):
+        super().__init__()
+        self.name = algorithm
+        self.model_path = Path(model_path)
+        self.scale = scale
+        self.sr = cv2.dnn_superres.DnnSuperResImpl_create()
+        self.sr.readModel(str(self.model_path))
+        self.sr.setModel(algorithm, scale)
+
+    def upscale(self, rgb: np.ndarray) -> np.ndarray:
+        bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+        return cv2.cvtColor(self.sr.upsample(bgr), cv2.COLOR_BGR2RGB)
+
+    def info(self) -> Dict:
+        return {"learned": True, "scale": self.scale, "model": self.model_path.name}
+
+
+class OnnxSRBackend(SuperResolutionBackend):
+    """
+    Any ONNX super-resolution model run through onnxruntime
+
+    Models taking 3 input channels get RGB in [0, 1]; single-channel models
+    (the usual ESPCN/FSRCNN exports) get the Y channel of YCrCb, and the
+    chroma channels are upscaled with bicubic interpolation.
+    """
+
+    name = "onnx"
+    thread_safe = True
+
+    def __init__(self, model_path: Path, tile_size: int = SR_TILE_SIZE, tile_pad: int = SR_TILE_PAD,
+                 multiple: int = 1, name: Optional[str] = None):
+        super().__init__()
+        from onnx_sessions import create_inference_session
+
+        if name:
+            self.name = name
+        self.multiple = multiple
+        self.model_path = Path(model_path)
+        self.session = create_inference_session(self.model_path)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.channels = model_input.shape[1] if isinstance(model_input.shape[1], int) else 3
+        self.tile_size = tile_size
+        self.tile_pad = tile_pad
+        self.scale = None
+
+    def _run(self, planar: np.ndarray) -> np.ndarray:
+        """Run the model on a float32 (C, H, W) array in [0, 1]"""
+        _, height, width = planar.shape
+        # Models with pixel-unshuffle stems (Real-ESRGAN x2) need even sizes
+        pad_h, pad_w = -height % self.multiple, -width % self.multiple
+        if pad_h or pad_w:
+            planar = np.pad(planar, ((0, 0), (0, pad_h), (0, pad_w)), mode="reflect")
+
+        output = self.session.run(None, {self.input_name: np.ascontiguousarray(planar[np.newaxis])})[0][0]
+        if self.scale is None:
+            self.scale = output.shape[1] // planar.shape[1]
+        return output[:, :height * self.scale, :width * self.scale]
+
+    def _run_tiled(self, planar: np.ndarray) -> np.ndarray:
+        """Run the model tile by tile with overlapping padding"""
+        _, height, width = planar.shape
+        tile, pad = self.tile_size, self.tile_pad
+        if not tile or (height <= tile and width <= tile):
+            return self._run(planar)
+
+        output = None
+        for y in range(0, height, tile):
+            for x in range(0, width, tile):
+                y0, x0 = max(y - pad, 0), max(x - pad, 0)
+                y1, x1 = min(y + tile + pad, height), min(x + tile + pad, width)
+                tile_out = self._run(planar[:, y0:y1, x0:x1])
+                s = self.scale
+                if output is None:
+                    output = np.empty((planar.shape[0], height * s, width * s), dtype=np.float32)
+                ty1, tx1 = min(y + tile, height), min(x + tile, width)
+                output[:, y * s:ty1 * s, x * s:tx1 * s] = tile_out[
+                    :, (y - y0) * s:(ty1 - y0) * s, (x - x0) * s:(tx1 - x0) * s
+                ]
+        return output
+
+    def upscale(self, rgb: np.ndarray) -> np.ndarray:
+        if self.channels == 1:
+            ycrcb = cv2.cvtColor(rgb, cv2.COLOR_RGB2YCrCb)
+            y = self._run_tiled((ycrcb[:, :, 0].astype(np.float32) / 255.0)[np.newaxis])[0]
+            size = (y.shape[1], y.shape[0])
+            cr = cv2.resize(ycrcb[:, :, 1], size, interpolation=cv2.INTER_CUBIC)
+            cb = cv2.resize(ycrcb[:, :, 2], size, interpolation=cv2.INTER_CUBIC)
+            y = np.clip(y * 255.0 + 0.5, 0, 255).astype(np.uint8)
+            return cv2.cvtColor(cv2.merge([y, cr, cb]), cv2.COLOR_YCrCb2RGB)
+
+        planar = rgb.transpose(2, 0, 1).astype(np.float32) / 255.0
+        output = self._run_tiled(planar)
+        return np.clip(output.transpose(1, 2, 0) * 255.0 + 0.5, 0, 255).astype(np.uint8)
+
+    def info(self) -> Dict:
+        return {"learned": True, "runtime": "onnxruntime", "model": self.model_path.name,
+                "channels": self.channels, "tile_size": self.tile_size}
+
+
+class HeuristicBackend(SuperResolutionBackend):
+    """OpenCV/PIL enhancement chain (no model); handles RGBA itself"""
+
+    name = "heuristic"
+    learned = False
+    thread_safe = True
+
+    def __init__(self, enhance_fn: Callable[[Image.Image], Image.Image]):
+        super().__init__()
+        self.enhance_fn = enhance_fn
+
+    def upscale(self, rgb: np.ndarray) -> np.ndarray:
+        return np.array(self.enhance_fn(Image.fromarray(rgb, 'RGB')))
+
+    def enhance(self, image: Image.Image, outscale: int = 2) -> Image.Image:
+        return self.enhance_fn(image)
+
+
+# ==================== BACKEND REGISTRY ====================
+
+def load_backends(upsampler=None,
+                  heuristic_fn: Optional[Callable[[Image.Image], Image.Image]] = None,
+                  realesrgan_onnx: Optional[Path] = None) -> Dict[str, SuperResolutionBackend]:
+    """
+    Build every backend whose model and runtime are available
+
+    Args:
+        upsampler: Loaded RealESRGANer (skipped if None)
+        heuristic_fn: Fallback enhancement function (skipped if None)
+        realesrgan_onnx: Exported Real-ESRGAN model served through onnxruntime
+            as the 'realesrgan' backend when no torch upsampler is given
+
+    Returns:
+        Backends keyed by name
+    """
+    backends: Dict[str, SuperResolutionBackend] = {}
+
+    if upsampler is not None:
+        backends["realesrgan"] = RealESRGANBackend(upsampler)
+    elif realesrgan_onnx is not None:
+        try:
+            backends["realesrgan"] = OnnxSRBackend(realesrgan_onnx, multiple=2, name="realesrgan")
+            logger.info(f"✓ Real-ESRGAN served through onnxruntime: {Path(realesrgan_onnx).name}")
+        except Exception as e:
+            logger.warning(f"Real-ESRGAN ONNX model unusable: {str(e)}")
+
+    if SR_ONNX_MODEL.exists():
+        try:
+            backends["onnx"] = OnnxSRBackend(SR_ONNX_MODEL)
+            logger.info(f"✓ ONNX super-resolution model loaded: {SR_ONNX_MODEL.name}")
+        except Exception as e:
+            logger.warning(f"ONNX super-resolution model unusable: {str(e)}")
+
+    for algorithm, model_path in DNN_SUPERRES_MODELS.items():
+        if not model_path.exists():
+            continue
+        if not hasattr(cv2, "dnn_superres"):
+            logger.warning(f"{algorithm.upper()} model found but cv2.dnn_superres is missing "
+                           "(install opencv-contrib-python)")
+            continue
+        try:
+            backends[algorithm] = OpenCVDnnBackend(algorithm, model_path)
+            logger.info(f"✓ {algorithm.upper()} super-resolution model loaded")
+        except Exception as e:
+            logger.warning(f"{algorithm.upper()} model unusable: {str(e)}")
+
+    if heuristic_fn is not None:
+        backends["heuristic"] = HeuristicBackend(heuristic_fn)
+
+    return backends
+
+
+def default_backend_name(backends: Dict[str, SuperResolutionBackend]) -> Optional[str]:
+    """
+    Resolve SR_BACKEND ('auto' = first loaded backend by priority)
+
+    Logs a warning when SR_BACKEND names a backend that is not loaded, so
+    call it once after loading and keep the result.
+    """
+    if SR_BACKEND != "auto" and SR_BACKEND in backends:
+        return SR_BACKEND
+    if SR_BACKEND != "auto":
+        logger.warning(f"SR_BACKEND '{SR_BACKEND}' not loaded, falling back to auto")
+    return next((name for name in SR_BACKEND_PRIORITY if name in backends), None)
+
@@ -0,0 +1,167 @@
+"""
+Torch CPU Inference Profile
+Configures torch threading and prepares the Real-ESRGAN RRDBNet for CPU
+inference: inference mode, channels_last activations, optional TorchScript or
+torch.compile, and bfloat16 autocast on CPUs with native bf16 support.
+"""
+
+import logging
+import os
+from typing import Dict, Optional
+
+import torch
+
+from settings import env_flag, env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+COMPILE_MODES = ("none", "script", "compile")
+
+_threads_configured = False
+
+
+# ==================== PROFILE ====================
+
+def bf16_supported() -> bool:
+    """True when oneDNN reports native bfloat16 support on this CPU"""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def torch_profile() -> Dict:
+    """
+    Resolve the torch CPU profile for this deployment
+
+    Like the ONNX Runtime profile, intra-op threads default to splitting the
+    cores across the workers expected to run inference at once, so several
+    uvicorn workers do not each spawn one thread per core.
+
+    Environment variables:
+        TORCH_CONCURRENCY: Concurrent enhancers (defaults to ORT_SESSION_CONCURRENCY)
+        TORCH_NUM_THREADS: Intra-op threads
+        TORCH_INTEROP_THREADS: Inter-op threads
+        TORCH_CHANNELS_LAST: Run convolutions on NHWC activations
+        TORCH_COMPILE: 'none', 'script' (trace + freeze) or 'compile' (torch.compile)
+        TORCH_BF16: bfloat16 autocast (only applied where the CPU supports it)
+
+    Returns:
+        Dictionary describing the profile (also reported by /api/status)
+    """
+    cpu_count = os.cpu_count() or 1
+    concurrency = max(1, env_int("TORCH_CONCURRENCY", env_int("ORT_SESSION_CONCURRENCY", 1)))
+
+    compile_mode = env_str("TORCH_COMPILE", "none").lower()
+    if compile_mode not in COMPILE_MODES:
+        compile_mode = "none"
+
+    bf16 = env_flag("TORCH_BF16", False) and bf16_supported()
+    if bf16 and compile_mode == "script":
+        # TorchScript does not honour CPU autocast reliably; keep fp32 there
+        bf16 = False
+
+    return {
+        "cpu_count": cpu_count,
+        "concurrency": concurrency,
+        "num_threads": max(1, env_int("TORCH_NUM_THREADS", cpu_count // concurrency)),
+        "interop_threads": max(1, env_int("TORCH_INTEROP_THREADS", 1)),
+        "channels_last": env_flag("TORCH_CHANNELS_LAST", True),
+        "compile": compile_mode,
+        "bf16": bf16,
+        "bf16_supported": bf16_supported(),
+    }
+
+
+def configure_threads(profile: Optional[Dict] = None) -> None:
+    """
+    Apply the profile's thread counts
+
+    torch only accepts the inter-op thread count before any parallel work has
+    run, so that part is applied once per process.
+    """
+    global _threads_configured
+    profile = profile or torch_profile()
+
+    torch.set_num_threads(profile["num_threads"])
+    if not _threads_configured:
+        try:
+            torch.set_num_interop_threads(profile["interop_threads"])
+        except RuntimeError:
+            logger.warning("Inter-op threads already fixed; keeping torch's value")
+        _threads_configured = True
+
+
+# ==================== MODEL PREPARATION ====================
+
+class CPUInferenceModel(torch.nn.Module):
+    """
+    Wraps a model so every forward runs under inference_mode (and bf16
+    autocast when enabled), with channels_last inputs
+    """
+
+    def __init__(self, model: torch.nn.Module, channels_last: bool, bf16: bool):
+        super().__init__()
+        self.model = model
+        self.channels_last = channels_last
+        self.bf16 = bf16
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.bf16):
+            if self.channels_last:
+                x = x.contiguous(memory_format=torch.channels_last)
+            out = self.model(x).float()
+        # Callers post-process in place outside inference mode, which inference
+        # tensors do not allow, so hand back a regular tensor
+        return out.clone()
+
+
+def prepare_model(model: torch.nn.Module, profile: Optional[Dict] = None) -> torch.nn.Module:
+    """
+    Prepare an image-to-image model for CPU inference
+
+    Args:
+        model: Model in eval mode (e.g. RealESRGANer.model)
+        profile: Profile dictionary (torch_profile() if None)
+
+    Returns:
+        Wrapped model with the same call signature
+    """
+    profile = profile or torch_profile()
+    model = model.eval()
+    for param in model.parameters():
+        param.requires_grad_(False)
+
+    if profile["channels_last"]:
+        model = model.to(memory_format=torch.channels_last)
+
+    if profile["compile"] == "script":
+        memory_format = torch.channels_last if profile["channels_last"] else torch.contiguous_format
+        example = torch.rand(1, 3, 64, 64).contiguous(memory_format=memory_format)
+        with torch.no_grad():
+            model = torch.jit.optimize_for_inference(torch.jit.freeze(torch.jit.trace(model, example)))
+    elif profile["compile"] == "compile":
+        model = torch.compile(model, dynamic=True)
+
+    return CPUInferenceModel(model, profile["channels_last"], profile["bf16"])
+
+
+def prepare_upsampler(upsampler, profile: Optional[Dict] = None):
+    """
+    Apply the CPU profile to a RealESRGANer in place
+
+    Args:
+        upsampler: RealESRGANer instance
+        profile: Profile dictionary (torch_profile() if None)
+
+    Returns:
+        The same upsampler
+    """
+    profile = profile or torch_profile()
+    configure_threads(profile)
+    if upsampler.device.type == "cpu":
+        upsampler.model = prepare_model(upsampler.model, profile)
+        logger.info(f"✓ Torch CPU profile: {profile['num_threads']} threads, "
+                    f"channels_last={profile['channels_last']}, compile={profile['compile']}, "
+                    f"bf16={profile['bf16']}")
+    return upsampler
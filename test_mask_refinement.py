@@ -0,0 +1,54 @@
+"""
+Equivalence test for main_simple's mask refinement
+Checks that refine_mask (OpenCV uint8 chain) stays within tolerance of the
+original scipy/PIL implementation on a few synthetic U2Net outputs.
+
+Run with pytest or directly: python test_mask_refinement.py
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from main_simple import refine_mask  # noqa: E402
+from benchmarks.mask_refinement import refine_mask_reference, synthetic_model_output  # noqa: E402
+
+SIZE = (640, 480)
+SEEDS = (0, 1, 2)
+
+# Same bounds as python -m benchmarks.mask_refinement
+MIN_IOU = 0.99
+MAX_MEAN_DIFF = 2.0
+MAX_DIFF = 32
+
+
+def compare(seed):
+    mask = synthetic_model_output(seed)
+    expected = refine_mask_reference(mask, SIZE).astype(np.int16)
+    actual = refine_mask(mask, SIZE).astype(np.int16)
+
+    a, b = actual >= 128, expected >= 128
+    union = np.logical_or(a, b).sum()
+    iou = np.logical_and(a, b).sum() / union if union else 1.0
+    diff = np.abs(actual - expected)
+    return iou, diff.mean(), diff.max()
+
+
+def test_refine_mask_matches_reference():
+    """refine_mask output stays within tolerance of the reference chain"""
+    for seed in SEEDS:
+        iou, mean_diff, max_diff = compare(seed)
+        assert iou >= MIN_IOU, f"seed {seed}: IoU {iou:.4f} < {MIN_IOU}"
+        assert mean_diff <= MAX_MEAN_DIFF, f"seed {seed}: mean diff {mean_diff:.2f} > {MAX_MEAN_DIFF}"
+        assert max_diff <= MAX_DIFF, f"seed {seed}: max diff {max_diff} > {MAX_DIFF}"
+
+
+if __name__ == "__main__":
+    for seed in SEEDS:
+        iou, mean_diff, max_diff = compare(seed)
+        print(f"seed {seed}: IoU {iou:.4f}, mean diff {mean_diff:.2f}, max diff {max_diff}")
+    test_refine_mask_matches_reference()
+    print("✓ refine_mask matches the reference implementation")